@@ -1,6 +1,8 @@
 import os
+import hashlib
 import logging
-from flask import Flask
+import click
+from flask import Flask, request, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
 from sqlalchemy.orm import DeclarativeBase
@@ -21,9 +23,44 @@ def create_app():
     app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # needed for url_for to generate with https
     
     # Configure upload settings
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    # Uploads are streamed to disk in chunks, so the limit no longer bounds memory use
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 50)) * 1024 * 1024
     app.config['UPLOAD_FOLDER'] = 'uploads'
     
+    # Admin and monitoring endpoints are disabled unless a token is configured
+    app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+    
+    # Configure background job processing
+    app.config['JOB_EMBEDDED_WORKERS'] = int(os.environ.get('JOB_EMBEDDED_WORKERS', 1))
+    app.config['JOB_POLL_INTERVAL'] = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+    app.config['JOB_LEASE_SECONDS'] = int(os.environ.get('JOB_LEASE_SECONDS', 600))
+    app.config['JOB_ASYNC_CONCURRENCY'] = int(os.environ.get('JOB_ASYNC_CONCURRENCY', 100))
+    # Streams tasks to open pages as they are saved (one commit per task); an open event
+    # stream holds a worker for the whole generation, so it needs a gevent/gthread worker class
+    app.config['TASK_SSE'] = os.environ.get('TASK_SSE', 'false').lower() in ['true', 'on', '1']
+    app.config['TASK_STREAM_TIMEOUT'] = int(os.environ.get('TASK_STREAM_TIMEOUT', 300))
+    
+    # Configure batch uploads
+    app.config['BATCH_MAX_FILES'] = int(os.environ.get('BATCH_MAX_FILES', 50))
+    app.config['BATCH_EXTRACT_WORKERS'] = int(os.environ.get('BATCH_EXTRACT_WORKERS', 4))
+    app.config['BATCH_GENERATION_CONCURRENCY'] = int(os.environ.get('BATCH_GENERATION_CONCURRENCY', 4))
+    
+    # Configure the worksheets dashboard
+    app.config['DASHBOARD_PAGE_SIZE'] = int(os.environ.get('DASHBOARD_PAGE_SIZE', 24))
+    
+    # Seconds browsers may reuse a task list before revalidating its ETag
+    app.config['TASK_PAYLOAD_MAX_AGE'] = int(os.environ.get('TASK_PAYLOAD_MAX_AGE', 60))
+    
+    # Configure write-behind buffering of student responses
+    app.config['RESPONSE_BUFFER_MAX_ROWS'] = int(os.environ.get('RESPONSE_BUFFER_MAX_ROWS', 200))
+    app.config['RESPONSE_BUFFER_FLUSH_MS'] = int(os.environ.get('RESPONSE_BUFFER_FLUSH_MS', 500))
+    app.config['RESPONSE_SYNC_MAX'] = int(os.environ.get('RESPONSE_SYNC_MAX', 500))
+    
+    # Configure near-duplicate worksheet detection
+    app.config['NEAR_DUPLICATE_DETECTION'] = os.environ.get('NEAR_DUPLICATE_DETECTION', 'true').lower() in ['true', 'on', '1']
+    app.config['NEAR_DUPLICATE_THRESHOLD'] = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.8))
+    app.config['NEAR_DUPLICATE_MIN_SECTION_CHARS'] = int(os.environ.get('NEAR_DUPLICATE_MIN_SECTION_CHARS', 200))
+    
     # Configure Flask-Mail
     app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
@@ -35,6 +72,7 @@ def create_app():
     
     # Configure the database
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///worksheet_converter.db")
+    app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE', 'true').lower() in ['true', 'on', '1']
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
         "pool_recycle": 300,
         "pool_pre_ping": True,
@@ -52,18 +90,27 @@ def create_app():
         import models  # noqa: F401
         db.create_all()
         
+        # Bring databases created by older versions up to the current schema
+        if app.config['AUTO_MIGRATE']:
+            from services.schema_migrations import SchemaMigrations
+            SchemaMigrations.upgrade()
+        
         # Register blueprints
         from routes.upload import upload_bp
         from routes.tasks import tasks_bp
         from routes.subscription import subscription_bp
         from routes.contact import contact_bp
         from routes.verification import verification_bp
+        from routes.jobs import jobs_bp
+        from routes.admin import admin_bp
         
         app.register_blueprint(upload_bp)
         app.register_blueprint(tasks_bp)
         app.register_blueprint(subscription_bp, url_prefix='/subscription')
         app.register_blueprint(contact_bp)
         app.register_blueprint(verification_bp)
+        app.register_blueprint(jobs_bp)
+        app.register_blueprint(admin_bp)
         
         # Error handlers
         @app.errorhandler(404)
@@ -77,11 +124,59 @@ def create_app():
             db.session.rollback()
             return render_template('errors/500.html'), 500
         
+        # Static files referenced by content hash can be cached forever
+        static_hashes = {}
+        
+        def static_url(filename):
+            """URL of a static file with its content hash, for long-lived caching"""
+            if filename not in static_hashes or app.debug:
+                with open(os.path.join(app.static_folder, filename), 'rb') as f:
+                    static_hashes[filename] = hashlib.sha256(f.read()).hexdigest()[:12]
+            return url_for('static', filename=filename, v=static_hashes[filename])
+        
+        app.jinja_env.globals['static_url'] = static_url
+        
+        @app.after_request
+        def cache_hashed_static(response):
+            if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+                response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            return response
+        
         # Main route
         @app.route('/')
         def index():
             from flask import render_template
             return render_template('index.html')
+        
+        # Maintenance commands
+        @app.cli.command('gc-blobs')
+        @click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting it')
+        def gc_blobs(dry_run):
+            """Delete stored uploads that no worksheet references"""
+            from services.blob_store import BlobStore
+            stats = BlobStore.collect_garbage(app.config['UPLOAD_FOLDER'], dry_run=dry_run)
+            click.echo(f"{'Would delete' if dry_run else 'Deleted'} {stats['deleted_blobs']} blobs and "
+                       f"{stats['deleted_files']} files ({stats['freed_bytes'] / (1024 * 1024):.1f} MB), "
+                       f"recounted {stats['recounted']} references")
+        
+        @app.cli.command('migrate')
+        @click.option('--status', is_flag=True, help='List pending migrations without applying them')
+        def migrate(status):
+            """Apply pending schema migrations"""
+            from services.schema_migrations import SchemaMigrations
+            if status:
+                pending = SchemaMigrations.pending()
+                for version, description, _ in pending:
+                    click.echo(f"pending {version}: {description}")
+                click.echo(f"{len(pending)} pending migration(s)")
+                return
+            applied = SchemaMigrations.upgrade()
+            click.echo(f"Applied {len(applied)} migration(s){': ' + ', '.join(map(str, applied)) if applied else ''}")
+    
+    # Start in-process job workers unless dedicated worker processes are used (see worker.py)
+    if app.config['JOB_EMBEDDED_WORKERS'] > 0:
+        from services.job_queue import start_embedded_workers
+        start_embedded_workers(app, app.config['JOB_EMBEDDED_WORKERS'])
     
     return app
 
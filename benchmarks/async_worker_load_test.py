@@ -0,0 +1,145 @@
+"""
+Load test of the threaded and the async job workers against the local mock OpenAI server.
+
+    DATABASE_URL=sqlite:////tmp/load.db python benchmarks/async_worker_load_test.py --jobs 200 --latency 2.0
+
+Enqueues the same number of worksheet jobs for each mode and runs them to
+completion: first with --threads JobWorker threads (one job, and so one LLM
+request, per thread), then with one AsyncJobWorker running up to
+--concurrency jobs on an event loop. Reports wall time, throughput, the most
+requests the mock server saw at once and the threads and memory each mode
+needed; thread counts leave out the mock server's own threads, while maxrss
+is the process peak so far and includes the mock server. Every worksheet text
+is unique, so nothing is answered from the task cache. Point DATABASE_URL at a
+throwaway database.
+"""
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import resource
+import threading
+
+os.environ.setdefault('JOB_EMBEDDED_WORKERS', '0')
+os.environ.setdefault('OPENAI_MAX_RETRIES', '0')
+os.environ.setdefault('TASK_SSE', 'false')
+os.environ.setdefault('NEAR_DUPLICATE_DETECTION', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_openai_server import start_mock_server
+
+def enqueue_jobs(app, db, jobs, num_tasks):
+    """Create worksheets with unique, already extracted text and a job for each"""
+    from models import Worksheet
+    from services.job_queue import JobQueue
+
+    run_id = uuid.uuid4().hex[:8]
+    with app.app_context():
+        worksheets = [
+            Worksheet(
+                filename=f'load-{run_id}-{i}.txt',
+                original_filename=f'load-{i}.txt',
+                file_type='txt',
+                extracted_text=f'Load test worksheet {run_id} number {i}. Photosynthesis turns light into sugar.',
+                processing_status='pending'
+            )
+            for i in range(jobs)
+        ]
+        db.session.add_all(worksheets)
+        db.session.commit()
+
+        job_ids = [JobQueue.enqueue('worksheet', worksheet_id=w.id, payload={'num_tasks': num_tasks}).id
+                   for w in worksheets]
+        db.session.remove()
+    return job_ids
+
+def worker_threads():
+    """Threads in this process other than the ones serving mock API requests"""
+    return sum(1 for thread in threading.enumerate() if 'process_request_thread' not in thread.name)
+
+def wait_for(app, db, job_ids, timeout):
+    """Block until every job finished; returns (completed, failed, peak thread count)"""
+    from models import ProcessingJob
+
+    peak_threads = worker_threads()
+    deadline = time.monotonic() + timeout
+    while True:
+        peak_threads = max(peak_threads, worker_threads())
+        with app.app_context():
+            statuses = [status for (status,) in db.session.query(ProcessingJob.status).filter(
+                ProcessingJob.id.in_(job_ids)
+            )]
+            db.session.remove()
+
+        completed = statuses.count('completed')
+        failed = statuses.count('failed')
+        if completed + failed == len(job_ids) or time.monotonic() > deadline:
+            return completed, failed, peak_threads
+        time.sleep(0.05)
+
+def run_mode(label, app, db, server, start_workers, args):
+    """Enqueue the jobs, run them with the given workers and print the results"""
+    job_ids = enqueue_jobs(app, db, args.jobs, args.num_tasks)
+
+    handler = server.RequestHandlerClass
+    handler.peak_in_flight = 0
+    stop_event = threading.Event()
+
+    started = time.perf_counter()
+    threads = start_workers(stop_event)
+    completed, failed, peak_threads = wait_for(app, db, job_ids, args.timeout)
+    elapsed = time.perf_counter() - started
+
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+
+    maxrss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{label:<24} {elapsed:7.2f}s  {completed / elapsed:7.1f} jobs/s  completed {completed:4d}  "
+          f"failed {failed:3d}  peak in-flight {handler.peak_in_flight:4d}  threads {peak_threads:3d}  "
+          f"maxrss {maxrss_mb:6.1f}MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=2.0, help='mock LLM seconds per completion')
+    parser.add_argument('--threads', type=int, default=4, help='JobWorker threads in the threaded mode')
+    parser.add_argument('--concurrency', type=int, default=200, help='concurrent jobs of the AsyncJobWorker')
+    parser.add_argument('--num-tasks', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    # Per-job logging would dominate the measurement
+    logging.disable(logging.WARNING)
+
+    server, base_url = start_mock_server(latency=args.latency)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'mock-key')
+
+    from app import app, db
+    from services.job_queue import JobWorker, AsyncJobWorker
+
+    def threaded(stop_event):
+        threads = []
+        for i in range(args.threads):
+            worker = JobWorker(app, name=f'load-thread-{i}')
+            thread = threading.Thread(target=worker.run_forever, args=(stop_event,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def async_loop(stop_event):
+        worker = AsyncJobWorker(app, concurrency=args.concurrency, name='load-async')
+        thread = threading.Thread(target=worker.run_forever, args=(stop_event,), daemon=True)
+        thread.start()
+        return [thread]
+
+    run_mode(f'threaded ({args.threads} threads)', app, db, server, threaded, args)
+    run_mode(f'async ({args.concurrency} slots)', app, db, server, async_loop, args)
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Count database round-trips per upload for the old per-row ORM writes and the bulk write path.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/bulk_insert_benchmark.py --uploads 50 --tasks 15
+
+Only statements sent to the application database are counted: creating the
+worksheet and its job, then storing tasks and the final status once generation
+is done. The bulk rows run the real WorksheetPipeline.process_worksheet against
+the local mock OpenAI server, once with the default settings and once with
+TASK_SSE on, where every streamed task is committed as it arrives so open
+pages can show it; their times include the mock API round trip and are not
+comparable with the legacy row. Point DATABASE_URL at a throwaway database; rows are added
+to it.
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+
+os.environ.setdefault('JOB_EMBEDDED_WORKERS', '0')
+os.environ.setdefault('OPENAI_MAX_RETRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import app, db
+from models import Worksheet, Task, User, ProcessingJob
+from services.job_queue import JobQueue
+from services.quota_service import QuotaService
+from services.worksheet_pipeline import WorksheetPipeline
+from benchmarks.mock_openai_server import start_mock_server
+
+WORDS = ['river', 'energy', 'planet', 'fraction', 'verb', 'cell', 'climate', 'history', 'market', 'orbit',
+         'poem', 'angle', 'volcano', 'trade', 'atom', 'novel', 'graph', 'habitat', 'empire', 'circuit']
+
+class RoundTrips:
+    """Counts statements sent to the database and commits"""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine, 'before_cursor_execute', self._statement)
+        event.listen(engine, 'commit', self._commit)
+
+    def _statement(self, *args):
+        self.statements += 1
+
+    def _commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+def make_tasks(count):
+    return [
+        {
+            'task_type': 'multiple_choice',
+            'question': f'Question {i}?',
+            'task_data': {'options': ['a', 'b', 'c', 'd'], 'correct_answer': 0},
+            'order_index': i
+        }
+        for i in range(count)
+    ]
+
+def legacy_upload(user_id, email, tasks_data):
+    """The previous sequence of separate commits and per-row inserts"""
+    worksheet = Worksheet(filename='bench.pdf', original_filename='bench.pdf', file_type='pdf',
+                          processing_status='pending', user_id=user_id)
+    db.session.add(worksheet)
+    db.session.commit()
+    worksheet_id = worksheet.id
+    db.session.add(ProcessingJob(kind='benchmark', worksheet_id=worksheet_id, user_email=email, status='pending', payload={}))
+    db.session.commit()
+
+    db.session.get(Worksheet, worksheet_id).processing_status = 'processing'
+    db.session.commit()
+
+    Task.query.filter_by(worksheet_id=worksheet_id).delete()
+    for task_data in tasks_data:
+        db.session.add(Task(worksheet_id=worksheet_id, **task_data))
+    db.session.commit()
+
+    db.session.get(Worksheet, worksheet_id).processing_status = 'completed'
+    db.session.commit()
+
+    User.query.filter_by(email=email).first().worksheets_processed += 1
+    db.session.commit()
+
+def bulk_upload(user_id, email, tasks_data):
+    """Usage reservation, worksheet and job in one transaction, then the worksheet pipeline
+
+    The pipeline commits the 'processing' status on its own so pages polling the
+    job can show it during generation, then tasks and the final status together.
+    """
+    QuotaService.reserve(email)
+    # Unrelated random texts, so nothing is served from the task cache or a near-duplicate
+    text = ' '.join(random.choice(WORDS) for _ in range(200)) + uuid.uuid4().hex
+    worksheet = Worksheet(filename='bench.pdf', original_filename='bench.pdf', file_type='pdf',
+                          extracted_text=text, processing_status='pending', user_id=user_id)
+    db.session.add(worksheet)
+    db.session.flush()
+    worksheet_id = worksheet.id
+    JobQueue.enqueue('benchmark', worksheet_id=worksheet_id, user_email=email, payload={'quota_reserved': 1})
+
+    WorksheetPipeline.process_worksheet(worksheet_id, num_tasks=len(tasks_data))
+
+def run(label, func, uploads, tasks_data, counter):
+    with app.app_context():
+        user = User.query.filter_by(email='bench@example.com').first()
+        if user is None:
+            user = User(email='bench@example.com', subscription_status='active')
+            db.session.add(user)
+            db.session.commit()
+
+        user_id, email = user.id, user.email
+        counter.reset()
+        started = time.perf_counter()
+        for _ in range(uploads):
+            func(user_id, email, tasks_data)
+            db.session.expire_all()
+        elapsed = time.perf_counter() - started
+
+        print(f"{label:<8} statements/upload {counter.statements / uploads:6.1f}  "
+              f"commits/upload {counter.commits / uploads:4.1f}  {elapsed / uploads * 1000:7.2f}ms/upload")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=50)
+    parser.add_argument('--tasks', type=int, default=15)
+    args = parser.parse_args()
+
+    _, base_url = start_mock_server(latency=0)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'mock-key')
+
+    tasks_data = make_tasks(args.tasks)
+    with app.app_context():
+        counter = RoundTrips(db.engine)
+
+    run('legacy', legacy_upload, args.uploads, tasks_data, counter)
+    app.config['TASK_SSE'] = False
+    run('bulk', bulk_upload, args.uploads, tasks_data, counter)
+    app.config['TASK_SSE'] = True
+    run('sse', bulk_upload, args.uploads, tasks_data, counter)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Report how many extra task-cache hits content normalization buys on the uploads/ corpus.
+
+    python benchmarks/cache_normalization_report.py [--uploads uploads]
+
+Each worksheet is extracted once, then re-"exported" with the kinds of
+differences real re-uploads have (whitespace, re-pagination with page numbers,
+repeated headers, Unicode variants). A variant counts as a hit when its cache
+key equals the original's: raw MD5 keys (the old scheme) vs SHA-256 keys over
+normalized text.
+"""
+import os
+import sys
+import random
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.file_processor import FileProcessor
+from services.text_normalizer import content_hash
+
+def raw_key(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+def whitespace_variant(text, rng):
+    words = text.split(' ')
+    text = ''.join(word + (' ' * rng.choice([1, 1, 2, 3])) for word in words).rstrip()
+    return text.replace('\n', '  \r\n').replace('\r\n\r\n', '\r\n\r\n\r\n')
+
+def repaginated_variant(text, rng):
+    lines = text.split('\n')
+    per_page = max(3, len(lines) // rng.choice([2, 3, 4]))
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)]
+    total = len(pages)
+    return '\f'.join('\n'.join(page + [f"Page {n + 1} of {total}"]) for n, page in enumerate(pages))
+
+def header_variant(text, rng):
+    lines = text.split('\n')
+    per_page = max(3, len(lines) // 3)
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)]
+    header = f"Class 4{rng.choice('ABC')} - printed 2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"
+    return '\f'.join('\n'.join([header] + page + [f"- {n + 1} -"]) for n, page in enumerate(pages))
+
+def unicode_variant(text, rng):
+    return (text.replace(' ', '\u00a0', 5)
+                .replace('fi', '\ufb01')
+                .replace('.', '.\u200b')
+                .replace('\n', '\u00ad\n', 3))
+
+VARIANTS = {
+    'whitespace': whitespace_variant,
+    'repaginated': repaginated_variant,
+    'headers': header_variant,
+    'unicode': unicode_variant,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', default='uploads')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    texts = {}
+    for name in sorted(os.listdir(args.uploads)):
+        if not FileProcessor.is_allowed_file(name):
+            continue
+        try:
+            texts[name] = FileProcessor.extract_text_from_path(
+                os.path.join(args.uploads, name), name.rsplit('.', 1)[1].lower())
+        except Exception as e:
+            print(f"skipping {name}: {e}")
+
+    totals = {variant: [0, 0] for variant in VARIANTS}
+    print(f"{'worksheet':<40} {'variant':<12} {'raw hit':>8} {'normalized hit':>15}")
+    for name, text in texts.items():
+        for variant, make_variant in VARIANTS.items():
+            changed = make_variant(text, rng)
+            raw_hit = raw_key(changed) == raw_key(text)
+            normalized_hit = content_hash(changed) == content_hash(text)
+            totals[variant][0] += raw_hit
+            totals[variant][1] += normalized_hit
+            print(f"{name[:40]:<40} {variant:<12} {str(raw_hit):>8} {str(normalized_hit):>15}")
+
+    print()
+    lookups = len(texts)
+    raw_total = sum(hits[0] for hits in totals.values())
+    normalized_total = sum(hits[1] for hits in totals.values())
+    for variant, (raw_hits, normalized_hits) in totals.items():
+        print(f"{variant:<12} raw {raw_hits}/{lookups}  normalized {normalized_hits}/{lookups}")
+    print(f"{'total':<12} raw {raw_total}/{lookups * len(VARIANTS)}  normalized {normalized_total}/{lookups * len(VARIANTS)}"
+          f"  -> {normalized_total - raw_total} extra cache hits")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark streaming DOCX extraction against the python-docx object model.
+
+    python benchmarks/docx_extraction_benchmark.py                 # uploads/**/*.docx
+    python benchmarks/docx_extraction_benchmark.py --table 400x8   # plus a synthetic merged-cell table
+
+For every document prints the best-of-N time of both paths and whether they
+produced the same words (the streaming path keeps tables in document order and
+does not repeat the text of merged cells, so line layout may differ).
+"""
+import io
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+from services.file_processor import FileProcessor
+from services.docx_extractor import DocxExtractor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def synthetic_table(rows, cols):
+    """DOCX with one large table where every other row merges its first two cells"""
+    document = docx.Document()
+    document.add_paragraph("Vocabulary review")
+    table = document.add_table(rows=rows, cols=cols)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"term {r}-{c}"
+    for r in range(0, rows, 2):
+        table.cell(r, 0).merge(table.cell(r, 1))
+    document.add_paragraph("End of worksheet")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def best_time(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(data)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='DOCX files (default: uploads/**/*.docx)')
+    parser.add_argument('--table', help='also benchmark a generated ROWSxCOLS table, e.g. 400x8')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    documents = []
+    paths = args.files or sorted(glob.glob(os.path.join(ROOT, 'uploads', '**', '*.docx'), recursive=True))
+    for path in paths:
+        with open(path, 'rb') as f:
+            documents.append((os.path.relpath(path, ROOT), f.read()))
+    if args.table:
+        rows, cols = (int(n) for n in args.table.lower().split('x'))
+        documents.append((f"synthetic {rows}x{cols} table", synthetic_table(rows, cols)))
+
+    if not documents:
+        print("No DOCX files found; pass paths or --table ROWSxCOLS")
+        return
+
+    print(f"{'document':<40} {'python-docx':>12} {'streaming':>12} {'speedup':>8}  same words")
+    for name, data in documents:
+        legacy_time, legacy_text = best_time(FileProcessor.extract_text_from_docx_document, data, args.repeat)
+        stream_time, stream_text = best_time(lambda d: DocxExtractor.extract_text(io.BytesIO(d)), data, args.repeat)
+        same = set(legacy_text.split()) == set(stream_text.split())
+        print(f"{name[:40]:<40} {legacy_time * 1000:10.1f}ms {stream_time * 1000:10.1f}ms "
+              f"{legacy_time / stream_time:7.1f}x  {'yes' if same else 'no'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark the task generation path offline against the local mock OpenAI server.
+
+    python benchmarks/generation_benchmark.py --requests 50 --concurrency 8 --latency 0.2
+
+Compares a fresh OpenAI client per generation (the old behaviour) with the
+shared, pooled client from services.openai_client.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+from benchmarks.mock_openai_server import start_mock_server
+from services.ai_task_generator import AITaskGenerator
+from services.openai_client import get_openai_client
+
+class NoCache:
+    """Cache stand-in so every request reaches the (mock) API"""
+
+    def task_cache_key(self, text, num_tasks=5):
+        return f"{hash(text)}_{num_tasks}"
+
+    def get_cached_tasks(self, text, num_tasks=5):
+        return None
+
+    def cache_tasks(self, text, tasks, num_tasks=5):
+        return True
+
+def run(label, make_generator, requests, concurrency):
+    """Run the generations and print latency statistics"""
+    def one(i):
+        started = time.perf_counter()
+        make_generator().generate_tasks_from_text(f"Benchmark worksheet {i}", num_tasks=15)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<20} total {elapsed:6.2f}s  mean {statistics.mean(latencies) * 1000:7.1f}ms  "
+          f"p95 {p95 * 1000:7.1f}ms  {requests / elapsed:6.1f} req/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.2, help='mock completion latency in seconds')
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'mock-key')
+
+    run('client per request',
+        lambda: AITaskGenerator(openai_client=OpenAI(base_url=base_url), cache_service=NoCache()),
+        args.requests, args.concurrency)
+    run('shared client',
+        lambda: AITaskGenerator(openai_client=get_openai_client(), cache_service=NoCache()),
+        args.requests, args.concurrency)
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
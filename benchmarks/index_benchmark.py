@@ -0,0 +1,149 @@
+"""
+Latency of the hot lookup queries before and after the schema migration indexes.
+
+    DATABASE_URL=sqlite:////tmp/index_bench.db python benchmarks/index_benchmark.py --worksheets 20000
+
+Seeds a synthetic dataset (users, worksheets with tasks, verifications,
+responses and finished jobs) if the database is empty, drops the indexes
+declared on the models, times each query, then creates the indexes the way
+the migration does and times them again. Use a throwaway database.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+os.environ.setdefault('JOB_EMBEDDED_WORKERS', '0')
+os.environ.setdefault('AUTO_MIGRATE', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select, func, text
+from sqlalchemy.schema import DropIndex
+from app import app, db
+from models import Worksheet, Task, TaskResponse, EmailVerification, ProcessingJob, User
+from services.schema_migrations import SchemaMigrations
+from services.task_converter import TaskConverter
+from services.email_verification import EmailVerificationService
+from services.worksheet_dashboard import WorksheetDashboard
+
+INDEXED_MODELS = (Task, Worksheet, EmailVerification, TaskResponse, ProcessingJob)
+
+def seed(worksheets, tasks_per_worksheet, users):
+    """Insert the synthetic dataset in large executemany batches"""
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+
+    db.session.execute(insert(User), [{'email': f'user{u}@example.com', 'worksheets_processed': 0} for u in range(users)])
+    user_ids = db.session.execute(select(User.id)).scalars().all()
+
+    rows = [
+        {
+            'filename': f'blobs/{w % 97:02x}/{w:08x}.pdf',
+            'original_filename': f'worksheet-{w}.pdf',
+            'file_type': 'pdf',
+            'extracted_text': 'lorem ipsum ' * 200,
+            'upload_date': start + timedelta(minutes=w),
+            'processing_status': 'completed',
+            'user_id': rng.choice(user_ids)
+        }
+        for w in range(worksheets)
+    ]
+    db.session.execute(insert(Worksheet), rows)
+    worksheet_ids = db.session.execute(select(Worksheet.id)).scalars().all()
+
+    task_rows = [
+        {'worksheet_id': w, 'task_type': 'multiple_choice', 'question': f'Question {i}?',
+         'task_data': {'options': ['a', 'b'], 'correct_answer': 0}, 'order_index': i}
+        for w in worksheet_ids for i in range(tasks_per_worksheet)
+    ]
+    db.session.execute(insert(Task), task_rows)
+    task_ids = db.session.execute(select(Task.id)).scalars().all()
+
+    db.session.execute(insert(TaskResponse), [
+        {'task_id': rng.choice(task_ids), 'student_id': f's{i % 500}', 'response_data': {'answer': 0}, 'is_correct': True}
+        for i in range(len(task_ids) // 3)
+    ])
+    db.session.execute(insert(EmailVerification), [
+        {'email': f'user{i % (users * 2)}@example.com', 'token': f'token-{i}',
+         'expires_at': start, 'verified': i % 3 == 0}
+        for i in range(users * 4)
+    ])
+    db.session.execute(insert(ProcessingJob), [
+        {'kind': 'worksheet', 'worksheet_id': w, 'status': 'completed', 'payload': {}, 'attempts': 1}
+        for w in worksheet_ids
+    ])
+    db.session.commit()
+    return worksheet_ids
+
+def hot_queries(worksheet_ids, users):
+    """The lookups the indexes are meant for, as the app issues them"""
+    rng = random.Random(7)
+    return {
+        'tasks of a worksheet': lambda: TaskConverter.get_tasks_for_worksheet(rng.choice(worksheet_ids)),
+        'dashboard first page': lambda: WorksheetDashboard.get_page(f'user{rng.randrange(users)}@example.com'),
+        'email verified check': lambda: EmailVerificationService.is_email_verified(f'user{rng.randrange(users * 2)}@example.com'),
+        'responses of a task': lambda: db.session.query(func.count(TaskResponse.id)).filter(
+            TaskResponse.task_id == rng.randrange(1, len(worksheet_ids) * 10)).scalar(),
+        'claim next job': lambda: db.session.execute(
+            select(ProcessingJob.id).where(ProcessingJob.status == 'pending').order_by(ProcessingJob.id).limit(1)).first(),
+        'blob text reuse': lambda: db.session.query(Worksheet.id).filter(
+            Worksheet.filename == f'blobs/{rng.randrange(97):02x}/{rng.choice(worksheet_ids):08x}.pdf').first(),
+    }
+
+def measure(queries, repeat):
+    """Median milliseconds per query"""
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - started)
+            db.session.rollback()
+        results[name] = statistics.median(timings) * 1000
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worksheets', type=int, default=20000)
+    parser.add_argument('--tasks', type=int, default=15)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        worksheet_ids = db.session.execute(select(Worksheet.id)).scalars().all()
+        if not worksheet_ids:
+            started = time.perf_counter()
+            worksheet_ids = seed(args.worksheets, args.tasks, args.users)
+            print(f"Seeded {len(worksheet_ids)} worksheets in {time.perf_counter() - started:.1f}s")
+        users = db.session.query(func.count(User.id)).scalar()
+
+        with db.engine.begin() as connection:
+            for model in INDEXED_MODELS:
+                for index in model.__table__.indexes:
+                    connection.execute(DropIndex(index, if_exists=True))
+            if db.engine.dialect.name == 'sqlite':
+                connection.execute(text('ANALYZE'))
+
+        queries = hot_queries(worksheet_ids, users)
+        before = measure(queries, args.repeat)
+
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            SchemaMigrations.MIGRATIONS[0][2](connection)
+            if db.engine.dialect.name == 'sqlite':
+                connection.execute(text('ANALYZE'))
+        print(f"Created indexes in {time.perf_counter() - started:.1f}s")
+
+        after = measure(queries, args.repeat)
+
+    print(f"{'query':<24} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name in queries:
+        print(f"{name:<24} {before[name]:8.2f}ms {after[name]:8.2f}ms {before[name] / after[name]:7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Local mock of the OpenAI chat completions API for offline benchmarking.
+
+    python benchmarks/mock_openai_server.py --port 8765 --latency 2.0
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python worker.py
+
+Returns synthetic tasks in the format AITaskGenerator expects, either as one
+JSON response or as a streamed response, after a configurable delay.
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TASK_TYPES = ['multiple_choice', 'fill_blank', 'short_answer', 'drag_drop']
+
+def make_task(index, seed):
+    """Build one synthetic task of a rotating type"""
+    task_type = TASK_TYPES[index % len(TASK_TYPES)]
+    question = f"Mock question {index + 1} ({seed})"
+
+    if task_type == 'multiple_choice':
+        task_data = {'options': ['A', 'B', 'C', 'D'], 'correct_answer': 0, 'explanation': 'Mock explanation'}
+    elif task_type == 'fill_blank':
+        question += ': ___.'
+        task_data = {'correct_answers': ['mock'], 'case_sensitive': False, 'explanation': 'Mock explanation'}
+    elif task_type == 'short_answer':
+        task_data = {'sample_answer': 'Mock answer', 'key_points': ['mock point'], 'max_length': 300}
+    else:
+        task_data = {'items': ['one', 'two'], 'targets': ['1', '2'], 'correct_matches': {'one': '1', 'two': '2'}}
+
+    return {'task_type': task_type, 'question': question, 'task_data': task_data}
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Serves POST /v1/chat/completions"""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 1.0
+    error_rate = 0.0
+
+    # Requests being answered right now and the most seen at once, shared by all handler threads
+    in_flight = 0
+    peak_in_flight = 0
+    _counter_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        cls = type(self)
+        with cls._counter_lock:
+            cls.in_flight += 1
+            cls.peak_in_flight = max(cls.peak_in_flight, cls.in_flight)
+        try:
+            self._complete(body)
+        finally:
+            with cls._counter_lock:
+                cls.in_flight -= 1
+
+    def _complete(self, body):
+        if random.random() < self.error_rate:
+            self._send_json(random.choice([429, 500, 503]), {'error': {'message': 'Injected failure'}})
+            return
+
+        prompt = body.get('messages', [{}])[-1].get('content', '')
+        match = re.search(r'create (\d+) interactive', prompt)
+        num_tasks = int(match.group(1)) if match else 15
+        seed = abs(hash(prompt)) % 100000
+        content = json.dumps({'tasks': [make_task(i, seed) for i in range(num_tasks)]})
+
+        if body.get('stream'):
+            self._send_stream(content)
+        else:
+            time.sleep(self.latency)
+            self._send_json(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'gpt-4o'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                          'total_tokens': (len(prompt) + len(content)) // 4}
+            })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content):
+        """Stream the content in small pieces spread over the configured latency"""
+        pieces = [content[i:i + 40] for i in range(0, len(content), 40)]
+        delay = self.latency / max(len(pieces), 1)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        for piece in pieces:
+            time.sleep(delay)
+            chunk = {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': 'gpt-4o',
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Threaded server with a listen backlog deep enough for hundreds of simultaneous connects"""
+
+    request_queue_size = 1024
+
+def start_mock_server(port=0, latency=1.0, error_rate=0.0):
+    """Start the mock server on a background thread and return (server, base_url)
+
+    server.RequestHandlerClass.peak_in_flight is the most requests it answered at once.
+    """
+    handler = type('ConfiguredMockOpenAIHandler', (MockOpenAIHandler,),
+                   {'latency': latency, 'error_rate': error_rate, '_counter_lock': threading.Lock()})
+    server = MockOpenAIServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock OpenAI chat completions server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds per completion')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 429/5xx')
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.port, args.latency, args.error_rate)
+    print(f"Mock OpenAI server listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark serial versus page-parallel PDF text extraction on a synthetic PDF.
+
+    python benchmarks/pdf_extraction_benchmark.py --pages 200 --lines 60 --workers 4
+
+Builds a text-only PDF in memory (no PDF writer dependency needed), then times
+FileProcessor.extract_text_from_pdf with the process pool disabled and enabled,
+and how soon the first page is available from FileProcessor.iter_pdf_pages.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.file_processor import FileProcessor
+
+def build_pdf(pages, lines, padding=0):
+    """Minimal PDF with one Helvetica text stream per page, plus roughly padding bytes of comment lines"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        text = [b"BT /F1 9 Tf 11 TL 40 800 Td"]
+        for line in range(lines):
+            text.append(f"(Page {page + 1} line {line + 1}: photosynthesis converts light energy into chemical energy) '".encode())
+        text.append(b"ET")
+        stream = b"\n".join(text)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    out += (b"%" + b"x" * 78 + b"\n") * (padding // 80)
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def timed(label, workers, pdf, repeat):
+    """Time full extraction and first-page latency with the given worker count"""
+    FileProcessor.PDF_EXTRACT_WORKERS = workers
+    FileProcessor.extract_text_from_pdf(pdf)  # warm up the pool
+
+    totals, firsts = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pages = FileProcessor.iter_pdf_pages(pdf)
+        next(pages)
+        firsts.append(time.perf_counter() - started)
+        for _ in pages:
+            pass
+        totals.append(time.perf_counter() - started)
+
+    text = FileProcessor.extract_text_from_pdf(pdf)
+    print(f"{label:<22} total {min(totals):6.2f}s  first page {min(firsts) * 1000:7.1f}ms  chars {len(text)}")
+    return text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=60)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pdf = build_pdf(args.pages, args.lines)
+    print(f"{args.pages} pages, {len(pdf) / 1024:.0f} KiB, {args.workers} workers")
+
+    serial = timed("serial", 1, pdf, args.repeat)
+    parallel = timed(f"parallel ({args.workers})", args.workers, pdf, args.repeat)
+    print("identical output" if serial == parallel else "OUTPUT DIFFERS")
+
+if __name__ == '__main__':
+    main()
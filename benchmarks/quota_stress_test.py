@@ -0,0 +1,121 @@
+"""
+Fire many parallel uploads for one free-tier email and check the quota is never overshot.
+
+    DATABASE_URL=sqlite:////tmp/quota.db python benchmarks/quota_stress_test.py --uploads 40 --concurrency 20
+    DATABASE_URL=sqlite:////tmp/quota.db python benchmarks/quota_stress_test.py --error-rate 1.0
+
+Every upload goes through POST /upload; generation runs against the local mock
+OpenAI server once all uploads are in. The first part replays the old
+check-then-increment logic with the same concurrency for comparison. With
+--error-rate 1.0 every generation fails, so every reserved slot must be
+released again. Point DATABASE_URL at a throwaway database.
+"""
+import io
+import os
+import sys
+import time
+import uuid
+import argparse
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('JOB_EMBEDDED_WORKERS', '0')
+os.environ.setdefault('OPENAI_MAX_RETRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+from benchmarks.mock_openai_server import start_mock_server
+
+def legacy_run(app, db, User, uploads, concurrency, latency):
+    """The old flow: read the counter to check the limit, generate, then increment"""
+    email = f'legacy-{uuid.uuid4().hex[:8]}@example.com'
+    with app.app_context():
+        db.session.add(User(email=email))
+        db.session.commit()
+
+    accepted = []
+    lock = threading.Lock()
+
+    def upload(_):
+        with app.app_context():
+            user = User.query.filter_by(email=email).first()
+            if not user.can_process_worksheet():
+                return
+            time.sleep(latency)  # Generation happens between the check and the increment
+            user = User.query.filter_by(email=email).first()
+            user.worksheets_processed += 1
+            db.session.commit()
+            with lock:
+                accepted.append(1)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(upload, range(uploads)))
+
+    with app.app_context():
+        return len(accepted), User.query.filter_by(email=email).first().worksheets_processed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='mock LLM seconds per completion')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of LLM calls that fail')
+    args = parser.parse_args()
+
+    _, base_url = start_mock_server(latency=args.latency, error_rate=args.error_rate)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'mock-key')
+
+    from app import app, db
+    from models import User, Worksheet, EmailVerification
+    from services.job_queue import JobWorker
+
+    accepted, counter = legacy_run(app, db, User, args.uploads, args.concurrency, args.latency)
+    print(f"legacy   accepted {accepted:3d} of {args.uploads}  worksheets_processed {counter}  "
+          f"(limit {User.FREE_WORKSHEET_LIMIT})")
+
+    email = f'quota-{uuid.uuid4().hex[:8]}@example.com'
+    with app.app_context():
+        db.session.add(EmailVerification(email=email, token=uuid.uuid4().hex, verified=True,
+                                         expires_at=datetime.utcnow() + timedelta(days=1)))
+        db.session.commit()
+
+    def upload(index):
+        client = app.test_client()
+        document = docx.Document()
+        document.add_paragraph(f'Stress test worksheet {email} number {index}. ' * 20)
+        content = io.BytesIO()
+        document.save(content)
+        content.seek(0)
+        data = {'email': email, 'file': (content, f'stress-{index}.docx')}
+        response = client.post('/upload', data=data, content_type='multipart/form-data')
+        return '/tasks/' in response.headers.get('Location', '')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(upload, range(args.uploads)))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        reserved = User.query.filter_by(email=email).first().worksheets_processed
+
+    # Drain the queue: generation succeeds or fails, failures give their slot back
+    worker = JobWorker(app)
+    while worker.run_once():
+        pass
+
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        completed = Worksheet.query.filter_by(user_id=user.id, processing_status='completed').count()
+        final = user.worksheets_processed
+
+    print(f"reserved accepted {sum(results):3d} of {args.uploads}  worksheets_processed {reserved} after uploads, "
+          f"{final} after jobs, {completed} completed  ({elapsed / args.uploads * 1000:.1f}ms/upload)")
+
+    ok = sum(results) <= User.FREE_WORKSHEET_LIMIT and reserved <= User.FREE_WORKSHEET_LIMIT and final == completed
+    print('quota invariant holds' if ok else 'QUOTA INVARIANT VIOLATED')
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Render time of /tasks/<id> for a class of students, with and without the task-list fragment cache.
+
+    DATABASE_URL=sqlite:////tmp/task_page.db python benchmarks/task_page_benchmark.py --worksheets 20 --views 2000
+
+Creates completed worksheets with a mix of all four task types, then replays
+page views spread over them: first rendering the full template every time
+(the old path), then through TaskPageCache. Checks both produce the same task
+markup and prints the fragment cache's hit ratio and render time saved. Use a
+throwaway database.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+os.environ.setdefault('JOB_EMBEDDED_WORKERS', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+from sqlalchemy import event
+from app import app, db
+from models import Worksheet
+from services.task_converter import TaskConverter
+from services.task_page_cache import TaskPageCache
+
+def sample_tasks(count):
+    """Generated-looking tasks cycling through every task type"""
+    tasks = []
+    for i in range(count):
+        kind = ('multiple_choice', 'fill_blank', 'short_answer', 'drag_drop')[i % 4]
+        data = {
+            'multiple_choice': {'options': [f'Option {n} for question {i}' for n in range(4)], 'correct_answer': 2,
+                                'explanation': 'Because of photosynthesis.'},
+            'fill_blank': {'correct_answers': ['chlorophyll'], 'case_sensitive': False},
+            'short_answer': {'key_points': ['light energy', 'carbon dioxide and water'], 'max_length': 400},
+            'drag_drop': {'items': ['Roots', 'Leaves', 'Stem'], 'targets': ['Absorb water', 'Make food', 'Support'],
+                          'correct_matches': {'Roots': 'Absorb water', 'Leaves': 'Make food', 'Stem': 'Support'}}
+        }[kind]
+        tasks.append({'task_type': kind, 'question': f'Question {i}: what happens to <light> & water in a leaf?',
+                      'task_data': data, 'order_index': i})
+    return tasks
+
+def task_markup(html):
+    """The task cards and tasksData of a rendered page, for comparing the two paths"""
+    container = html.split('id="tasksContainer">', 1)[1].split('<!-- Progress Summary -->', 1)[0]
+    data = re.search(r'const tasksData = (.*);', html).group(1)
+    return re.sub(r'\s+', ' ', container).strip(), data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worksheets', type=int, default=20)
+    parser.add_argument('--tasks', type=int, default=15)
+    parser.add_argument('--views', type=int, default=2000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        ids = []
+        for n in range(args.worksheets):
+            worksheet = Worksheet(filename=f'page-{n}.docx', original_filename=f'page-{n}.docx', file_type='docx',
+                                  extracted_text='benchmark', processing_status='processing')
+            db.session.add(worksheet)
+            db.session.commit()
+            ids.append(worksheet.id)
+            TaskConverter.save_tasks_to_database(worksheet.id, sample_tasks(args.tasks), status='completed')
+
+    statements = [0]
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.__setitem__(0, statements[0] + 1))
+
+    rng = random.Random(7)
+    views = [rng.choice(ids) for _ in range(args.views)]
+    client = app.test_client()
+
+    # Old path: query tasks and render every card on every view
+    legacy_pages = {}
+    started, before = time.perf_counter(), statements[0]
+    for worksheet_id in views:
+        with app.test_request_context(f'/tasks/{worksheet_id}'):
+            worksheet = db.session.get(Worksheet, worksheet_id)
+            tasks = TaskConverter.get_tasks_for_worksheet(worksheet_id)
+            legacy_pages[worksheet_id] = render_template('tasks.html', worksheet=worksheet, tasks=tasks)
+            db.session.remove()
+    legacy_ms = (time.perf_counter() - started) * 1000 / args.views
+    legacy_statements = (statements[0] - before) / args.views
+
+    cached_pages = {}
+    started, before = time.perf_counter(), statements[0]
+    for worksheet_id in views:
+        response = client.get(f'/tasks/{worksheet_id}')
+        cached_pages[worksheet_id] = response.get_data(as_text=True)
+    cached_ms = (time.perf_counter() - started) * 1000 / args.views
+    cached_statements = (statements[0] - before) / args.views
+
+    same = all(task_markup(legacy_pages[i]) == task_markup(cached_pages[i]) for i in legacy_pages)
+    stats = TaskPageCache.get_stats()
+    print(f"{args.views} views over {args.worksheets} worksheets of {args.tasks} tasks")
+    print(f"full render    {legacy_ms:6.2f}ms/view  {legacy_statements:.1f} statements/view")
+    print(f"fragment cache {cached_ms:6.2f}ms/view  {cached_statements:.1f} statements/view")
+    print(f"hit ratio {stats['hit_ratio']:.3f}  ({stats['hits']} hits, {stats['misses']} misses), "
+          f"{stats['average_render_ms']}ms per fragment render, {stats['render_ms_saved']}ms saved")
+    print('task markup identical' if same else 'TASK MARKUP DIFFERS')
+    sys.exit(0 if same else 1)
+
+if __name__ == '__main__':
+    main()
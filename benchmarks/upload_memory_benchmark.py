@@ -0,0 +1,69 @@
+"""
+Compare peak Python heap use of buffering an upload in memory versus streaming it to disk.
+
+    python benchmarks/upload_memory_benchmark.py --mb 40
+
+The buffered variant mirrors the old FileProcessor.process_file (read() the whole
+upload, wrap it in BytesIO for the parser, write it out again); the streamed
+variant is the chunked copy BlobStore.save_upload makes with
+FileProcessor.stream_to_disk, followed by extraction from a memory map.
+"""
+import io
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.file_processor import FileProcessor
+from benchmarks.pdf_extraction_benchmark import build_pdf
+
+def buffered(upload_path, folder):
+    """Old behaviour: whole file in memory, copied for the parser and for the write"""
+    with open(upload_path, 'rb') as upload:
+        file_content = upload.read()
+    text = FileProcessor.extract_text_from_pdf(bytes(io.BytesIO(file_content).getbuffer()))
+    with open(os.path.join(folder, 'buffered.pdf'), 'wb') as f:
+        f.write(file_content)
+    return text
+
+def streamed(upload_path, folder):
+    """New behaviour: chunked copy to disk while hashing, then parse from a memory map"""
+    with open(upload_path, 'rb') as upload:
+        file_path, _, _ = FileProcessor.stream_to_disk(upload, folder)
+    return FileProcessor.extract_text_from_path(file_path, 'pdf')
+
+def measure(label, func, upload_path, folder):
+    tracemalloc.start()
+    text = func(upload_path, folder)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} peak heap {peak / (1024 * 1024):7.1f} MiB  chars {len(text)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=int, default=40, help='approximate upload size')
+    args = parser.parse_args()
+
+    # Comment padding is skipped by the parser but makes the upload as large as requested
+    pdf = build_pdf(5, 10, padding=args.mb * 1024 * 1024)
+
+    folder = tempfile.mkdtemp()
+    try:
+        upload_path = os.path.join(folder, 'upload.bin')
+        with open(upload_path, 'wb') as f:
+            f.write(pdf)
+        del pdf
+        print(f"upload size {os.path.getsize(upload_path) / (1024 * 1024):.1f} MiB")
+
+        FileProcessor.PDF_EXTRACT_WORKERS = 1
+        measure('buffered', buffered, upload_path, folder)
+        measure('streamed', streamed, upload_path, folder)
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
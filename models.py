@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime
 from sqlalchemy import Text, JSON, Column, Integer, String, DateTime, Boolean
+from sqlalchemy.orm import deferred
 
 class Worksheet(db.Model):
     """Model for storing uploaded worksheets and their metadata"""
@@ -13,6 +14,11 @@ class Worksheet(db.Model):
     processing_status = db.Column(db.String(20), default='pending')  # pending, processing, completed, failed
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # Link to user
     
+    __table_args__ = (
+        db.Index('ix_worksheet_user_upload_date', 'user_id', 'upload_date'),  # Dashboard pages
+        db.Index('ix_worksheet_filename', 'filename'),  # Text reuse and reference counts of shared blobs
+    )
+    
     # Relationship to tasks
     tasks = db.relationship('Task', backref='worksheet', lazy=True, cascade='all, delete-orphan')
 
@@ -23,9 +29,14 @@ class Task(db.Model):
     task_type = db.Column(db.String(50), nullable=False)  # multiple_choice, fill_blank, short_answer, drag_drop
     question = db.Column(Text, nullable=False)
     task_data = db.Column(JSON)  # Store task-specific data (options, correct answers, etc.)
+    answer_key = deferred(db.Column(JSON))  # Normalized answers compiled by GradingEngine when the task is saved
     order_index = db.Column(db.Integer, default=0)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_task_worksheet_order', 'worksheet_id', 'order_index'),
+    )
+    
     def to_dict(self):
         """Convert task to dictionary for JSON serialization"""
         return {
@@ -37,15 +48,40 @@ class Task(db.Model):
         }
 
 class TaskResponse(db.Model):
-    """Model for storing student responses to tasks (for future use)"""
+    """Model for storing student responses to tasks"""
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
     student_id = db.Column(db.String(100))  # For future user management
     response_data = db.Column(JSON)
     is_correct = db.Column(db.Boolean)
     submitted_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_task_response_task', 'task_id'),
+    )
 
 
+class TaskStats(db.Model):
+    """Running totals of student responses per task, updated as buffered responses are written"""
+    __tablename__ = 'task_stats'
+    
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), primary_key=True)
+    worksheet_id = db.Column(db.Integer, db.ForeignKey('worksheet.id'), nullable=False, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+    score_total = db.Column(db.Float, nullable=False, default=0.0)  # Sum of partial-credit scores
+    last_response_at = db.Column(db.DateTime)
+
+class WorksheetStats(db.Model):
+    """Running totals of student responses per worksheet"""
+    __tablename__ = 'worksheet_stats'
+    
+    worksheet_id = db.Column(db.Integer, db.ForeignKey('worksheet.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+    score_total = db.Column(db.Float, nullable=False, default=0.0)
+    last_response_at = db.Column(db.DateTime)
+
 class User(db.Model):
     """Model for storing user information and subscription status"""
     id = db.Column(db.Integer, primary_key=True)
@@ -59,6 +95,8 @@ class User(db.Model):
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     last_active = db.Column(db.DateTime, default=datetime.utcnow)
     
+    FREE_WORKSHEET_LIMIT = 3  # Worksheets a free account can convert
+    
     def is_premium(self):
         """Check if user has active premium subscription"""
         return self.subscription_status == 'active'
@@ -67,11 +105,12 @@ class User(db.Model):
         """Check if user can process another worksheet"""
         if self.is_premium():
             return True
-        return self.worksheets_processed < 3  # Free users get 3 worksheets
+        return self.worksheets_processed < self.FREE_WORKSHEET_LIMIT
     
     def increment_usage(self):
         """Increment worksheet processing count"""
-        self.worksheets_processed += 1
+        # Evaluated by the database, so concurrent increments are not lost
+        self.worksheets_processed = User.worksheets_processed + 1
         self.last_active = datetime.utcnow()
         db.session.commit()
 
@@ -86,3 +125,66 @@ class EmailVerification(db.Model):
     expires_at = Column(DateTime, nullable=False)
     verified = Column(Boolean, default=False)
     attempts = Column(Integer, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_email_verification_email_verified', 'email', 'verified'),
+    )
+
+class ProcessingJob(db.Model):
+    """Model for queued background work such as worksheet task generation"""
+    __tablename__ = 'processing_job'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False, default='worksheet')
+    worksheet_id = db.Column(db.Integer, db.ForeignKey('worksheet.id'), nullable=True)
+    user_email = db.Column(db.String(255))
+    status = db.Column(db.String(20), default='pending')  # pending, processing, completed, failed
+    payload = db.Column(JSON)  # Job-specific input (num_tasks, etc.)
+    result = db.Column(JSON)  # Job-specific output and progress
+    error_message = db.Column(Text)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=2)
+    claim_token = db.Column(db.String(64), unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_processing_job_status', 'status', 'id'),  # Claiming the oldest pending job
+        db.Index('ix_processing_job_worksheet', 'worksheet_id'),
+    )
+    
+    def to_dict(self):
+        """Convert job to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'worksheet_id': self.worksheet_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error_message,
+            'result': self.result,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class CacheEntry(db.Model):
+    """Model for the optional database tier of the task cache"""
+    __tablename__ = 'cache_entry'
+    
+    namespace = db.Column(db.String(50), primary_key=True)
+    key = db.Column(db.String(128), primary_key=True)
+    value = db.Column(Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class FileBlob(db.Model):
+    """Model for a content-addressed upload shared by every worksheet with identical bytes"""
+    __tablename__ = 'file_blob'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    file_type = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    path = db.Column(db.String(255), nullable=False)  # Relative to UPLOAD_FOLDER, also stored in Worksheet.filename
+    ref_count = db.Column(db.Integer, default=0)  # Number of Worksheet rows using this blob
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,19 +1,37 @@
 """
 Admin routes for cache management and system monitoring
 """
-from flask import Blueprint, render_template, jsonify, flash, redirect, url_for
-from services.cache_service import CacheService
+import hmac
+from flask import Blueprint, render_template, jsonify, flash, redirect, url_for, request, current_app, abort
+from services.cache_service import get_cache_service
+from services.single_flight import get_single_flight
+from services.response_buffer import get_response_buffer
+from services.task_page_cache import TaskPageCache
 import logging
 
 admin_bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
 
+@admin_bp.before_request
+def require_admin_token():
+    """Admin routes answer only requests carrying ADMIN_TOKEN, and do not exist without one configured"""
+    token = current_app.config.get('ADMIN_TOKEN')
+    if not token:
+        abort(404)
+    
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({'error': 'Admin token required'}), 401
+
 @admin_bp.route('/admin/cache/stats')
 def cache_stats():
     """Get cache statistics (for debugging/monitoring)"""
     try:
-        cache_service = CacheService()
+        cache_service = get_cache_service()
         stats = cache_service.get_cache_stats()
+        stats['single_flight'] = get_single_flight().get_stats()
+        stats['response_buffer'] = get_response_buffer().get_stats()
+        stats['task_pages'] = TaskPageCache.get_stats()
         return jsonify(stats)
     except Exception as e:
         logger.error(f"Error getting cache stats: {e}")
@@ -23,7 +41,7 @@ def cache_stats():
 def clear_cache():
     """Clear cache (for debugging/maintenance)"""
     try:
-        cache_service = CacheService()
+        cache_service = get_cache_service()
         cache_service.clear_cache()
         return jsonify({'success': True, 'message': 'Cache cleared successfully'})
     except Exception as e:
@@ -0,0 +1,26 @@
+import logging
+from flask import Blueprint, jsonify
+from services.job_queue import JobQueue
+from models import Task
+
+logger = logging.getLogger(__name__)
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/api/jobs/<int:job_id>')
+def api_job_status(job_id):
+    """API endpoint to poll the status of a background job"""
+    try:
+        job = JobQueue.get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        job_data = job.to_dict()
+        if job.worksheet_id:
+            job_data['tasks_count'] = Task.query.filter_by(worksheet_id=job.worksheet_id).count()
+        
+        return jsonify(job_data)
+        
+    except Exception as e:
+        logger.error(f"Error getting job status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
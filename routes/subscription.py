@@ -1,5 +1,6 @@
 from flask import Blueprint, request, render_template, redirect, url_for, flash, session, jsonify
 from services.subscription_service import SubscriptionService
+from services.entitlements import EntitlementService
 from models import User
 from app import db
 import logging
@@ -111,14 +112,11 @@ def check_limit():
     if not email:
         return jsonify({'can_process': False, 'message': 'Please provide your email'})
     
-    can_process = SubscriptionService.check_usage_limit(email)
-    user = User.query.filter_by(email=email).first()
-    
-    if can_process:
+    if EntitlementService.can_process(email):
         return jsonify({'can_process': True})
     else:
         return jsonify({
             'can_process': False,
-            'worksheets_used': user.worksheets_processed if user else 0,
+            'worksheets_used': EntitlementService.get(email)['worksheets_processed'],
             'message': 'You have reached your free limit of 3 worksheets. Please upgrade to continue.'
         })
\ No newline at end of file
@@ -1,7 +1,16 @@
+import json
+import time
 import logging
-from flask import Blueprint, render_template, jsonify, request, flash, redirect, url_for
-from services.task_converter import TaskConverter
-from models import Worksheet, Task
+from flask import Blueprint, render_template, jsonify, request, flash, redirect, url_for, Response, stream_with_context, current_app, session, abort
+from services.task_payload import TaskPayloadCache
+from services.task_page_cache import TaskPageCache
+from services.task_bundle import TaskBundle
+from services.worksheet_dashboard import WorksheetDashboard
+from services.grading_engine import GradingEngine
+from services.response_buffer import get_response_buffer
+from sqlalchemy.orm import load_only, undefer
+from werkzeug.exceptions import HTTPException
+from models import Worksheet, Task, TaskStats, WorksheetStats, ProcessingJob, db
 
 logger = logging.getLogger(__name__)
 
@@ -14,17 +23,33 @@ def view_tasks(worksheet_id):
         # Get worksheet info
         worksheet = Worksheet.query.get_or_404(worksheet_id)
         
-        # Get tasks for this worksheet
-        tasks_data = TaskConverter.get_tasks_for_worksheet(worksheet_id)
+        # Show a progress page while the background job is still generating tasks
+        if worksheet.processing_status in ('pending', 'processing'):
+            job = ProcessingJob.query.filter_by(worksheet_id=worksheet_id).order_by(ProcessingJob.id.desc()).first()
+            return render_template('tasks.html',
+                                 worksheet=worksheet,
+                                 tasks=[],
+                                 job=job)
         
-        if not tasks_data:
+        # Rendered task cards for this worksheet, shared by every visitor
+        task_list = TaskPageCache.get(worksheet_id)
+        
+        if not task_list['task_count']:
+            if worksheet.processing_status == 'failed':
+                flash('Task generation failed for this worksheet. Please try uploading it again.', 'error')
+                return redirect(url_for('index'))
             flash('No tasks found for this worksheet', 'warning')
             return redirect(url_for('index'))
         
-        logger.info(f"Rendering template with {len(tasks_data)} tasks")
+        logger.info(f"Rendering template with {task_list['task_count']} tasks")
+        bundle = None
+        if worksheet.processing_status == 'completed':
+            bundle = _bundle_urls(worksheet_id, TaskBundle.version_for(task_list['version']))
         return render_template('tasks.html', 
                              worksheet=worksheet, 
-                             tasks=tasks_data)
+                             tasks=[],
+                             task_list=task_list,
+                             bundle=bundle)
         
     except Exception as e:
         logger.error(f"Error viewing tasks: {str(e)}")
@@ -33,57 +58,299 @@ def view_tasks(worksheet_id):
 
 @tasks_bp.route('/api/tasks/<int:worksheet_id>')
 def api_get_tasks(worksheet_id):
-    """API endpoint to get tasks for a worksheet"""
+    """API endpoint to get tasks for a worksheet, served from the precomputed payload with a strong ETag"""
     try:
-        tasks = TaskConverter.get_tasks_for_worksheet(worksheet_id)
-        return jsonify({'tasks': tasks})
+        payload, cacheable = TaskPayloadCache.get(worksheet_id)
+        data, etag, gzipped = TaskPayloadCache.encoded(payload, 'gzip' in request.accept_encodings)
+        
+        response = Response(data, mimetype='application/json')
+        response.set_etag(etag)
+        if cacheable:
+            response.headers['Cache-Control'] = f"public, max-age={current_app.config.get('TASK_PAYLOAD_MAX_AGE', 60)}"
+        else:
+            # Tasks are still being generated; clients revalidate with the ETag on every poll
+            response.headers['Cache-Control'] = 'no-cache'
+        
+        response.vary.add('Accept-Encoding')
+        if gzipped:
+            response.content_encoding = 'gzip'
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"API error getting tasks: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@tasks_bp.route('/api/worksheets/<int:worksheet_id>/tasks/stream')
+def stream_tasks(worksheet_id):
+    """Server-sent events endpoint pushing tasks as the background job saves them"""
+    # Without TASK_SSE pages poll /api/jobs/<id> instead, so a sync worker is never pinned
+    if not current_app.config.get('TASK_SSE', False):
+        abort(404)
+    
+    Worksheet.query.get_or_404(worksheet_id)
+    timeout = current_app.config.get('TASK_STREAM_TIMEOUT', 300)
+    
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    def generate():
+        last_task_id = 0
+        started = time.monotonic()
+        last_message = started
+        
+        while True:
+            status = db.session.query(Worksheet.processing_status).filter_by(id=worksheet_id).scalar()
+            new_tasks = Task.query.filter(
+                Task.worksheet_id == worksheet_id,
+                Task.id > last_task_id
+            ).order_by(Task.id).all()
+            
+            # End the read transaction so the next poll sees the worker's commits
+            db.session.rollback()
+            
+            for task in new_tasks:
+                last_task_id = task.id
+                last_message = time.monotonic()
+                yield sse('task', task.to_dict())
+            
+            if status not in ('pending', 'processing'):
+                yield sse('done', {'status': status})
+                return
+            
+            if time.monotonic() - started > timeout:
+                yield sse('timeout', {'status': status})
+                return
+            
+            # Comment line keeps proxies from closing an idle connection
+            if time.monotonic() - last_message > 15:
+                last_message = time.monotonic()
+                yield ": keep-alive\n\n"
+            
+            time.sleep(0.5)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _student_id(payload):
+    """Optional student identifier sent with an answer"""
+    student_id = payload.get('student_id')
+    return str(student_id)[:100] if student_id else None
+
 @tasks_bp.route('/api/tasks/<int:task_id>/check', methods=['POST'])
 def api_check_answer(task_id):
-    """API endpoint to check student answer (for future use)"""
+    """API endpoint to check a student answer for one task"""
     try:
-        task = Task.query.get_or_404(task_id)
-        student_answer = request.json.get('answer')
+        task = Task.query.options(undefer(Task.answer_key)).filter_by(id=task_id).first_or_404()
+        payload = request.get_json(silent=True) or {}
+        student_answer = payload.get('answer')
         
-        # Basic answer checking logic
-        is_correct = False
-        feedback = ""
+        result = GradingEngine.grade(task, student_answer)
+        get_response_buffer().add(task.id, task.worksheet_id, _student_id(payload), student_answer, result)
+        return jsonify(result)
         
-        if task.task_type == 'multiple_choice':
-            correct_answer = task.task_data.get('correct_answer')
-            is_correct = student_answer == correct_answer
-            feedback = task.task_data.get('explanation', '')
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error checking answer: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@tasks_bp.route('/api/worksheets/<int:worksheet_id>/grade', methods=['POST'])
+def api_grade_worksheet(worksheet_id):
+    """Grade a whole worksheet submission, {"answers": {task_id: answer}}, with one query"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        answers = payload.get('answers')
+        if not isinstance(answers, dict):
+            return jsonify({'error': 'Expected a JSON object {"answers": {task_id: answer}}'}), 400
         
-        elif task.task_type == 'fill_blank':
-            correct_answers = task.task_data.get('correct_answers', [])
-            case_sensitive = task.task_data.get('case_sensitive', False)
-            
-            if case_sensitive:
-                is_correct = student_answer in correct_answers
-            else:
-                is_correct = student_answer.lower() in [ans.lower() for ans in correct_answers]
-            
-            feedback = task.task_data.get('explanation', '')
+        tasks = Task.query.options(
+            load_only(Task.id, Task.task_type, Task.task_data), undefer(Task.answer_key)
+        ).filter_by(worksheet_id=worksheet_id).order_by(Task.order_index).all()
+        if not tasks:
+            return jsonify({'error': 'No tasks found for this worksheet'}), 404
+        
+        results = {}
+        student_id = _student_id(payload)
+        response_buffer = get_response_buffer()
+        for task in tasks:
+            if str(task.id) in answers:
+                results[str(task.id)] = GradingEngine.grade(task, answers[str(task.id)])
+                response_buffer.add(task.id, worksheet_id, student_id, answers[str(task.id)], results[str(task.id)])
         
+        task_ids = {str(task.id) for task in tasks}
         return jsonify({
-            'is_correct': is_correct,
-            'feedback': feedback,
-            'correct_answer': task.task_data.get('correct_answer') if task.task_type == 'multiple_choice' else None
+            'results': results,
+            'answered': len(results),
+            'correct': sum(1 for result in results.values() if result['is_correct']),
+            'total': len(tasks),
+            'score': round(sum(result['score'] for result in results.values()) / len(tasks), 3),
+            'unknown_task_ids': [task_id for task_id in answers if str(task_id) not in task_ids]
         })
         
     except Exception as e:
-        logger.error(f"Error checking answer: {str(e)}")
+        logger.error(f"Error grading worksheet {worksheet_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@tasks_bp.route('/api/worksheets/<int:worksheet_id>/responses', methods=['POST'])
+def api_sync_responses(worksheet_id):
+    """Accept answers graded offline, {"responses": [{"task_id", "answer"}]}; they are re-graded and recorded"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        responses = payload.get('responses')
+        max_responses = current_app.config.get('RESPONSE_SYNC_MAX', 500)
+        if not isinstance(responses, list) or len(responses) > max_responses:
+            return jsonify({'error': f'Expected a JSON object {{"responses": [...]}} with at most {max_responses} entries'}), 400
+        
+        task_ids = set()
+        for item in responses:
+            try:
+                task_ids.add(int(item['task_id']))
+            except (TypeError, KeyError, ValueError):
+                continue
+        tasks = {
+            task.id: task for task in Task.query.options(
+                load_only(Task.id, Task.task_type, Task.task_data), undefer(Task.answer_key)
+            ).filter(Task.worksheet_id == worksheet_id, Task.id.in_(task_ids)).all()
+        } if task_ids else {}
+        
+        # Never trust a client's own grading; grade again against the stored key
+        student_id = _student_id(payload)
+        response_buffer = get_response_buffer()
+        accepted = 0
+        rejected = []
+        for index, item in enumerate(responses):
+            try:
+                task = tasks.get(int(item['task_id']))
+            except (TypeError, KeyError, ValueError):
+                task = None
+            if task is None:
+                rejected.append(index)
+                continue
+            response_buffer.add(task.id, worksheet_id, student_id, item.get('answer'), GradingEngine.grade(task, item.get('answer')))
+            accepted += 1
+        
+        return jsonify({'accepted': accepted, 'rejected': rejected})
+        
+    except Exception as e:
+        logger.error(f"Error syncing responses for worksheet {worksheet_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _immutable(response, version):
+    """Mark a response whose URL contains its content version as cacheable forever"""
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response.make_conditional(request)
+
+def _bundle_urls(worksheet_id, version):
+    return {
+        'version': version,
+        'data_url': url_for('tasks.bundle_data', worksheet_id=worksheet_id, version=version),
+        'page_url': url_for('tasks.bundle_page', worksheet_id=worksheet_id, version=version),
+        'sync_url': url_for('tasks.api_sync_responses', worksheet_id=worksheet_id)
+    }
+
+@tasks_bp.route('/api/worksheets/<int:worksheet_id>/bundle')
+def api_bundle(worksheet_id):
+    """Where the current offline bundle of a worksheet lives"""
+    try:
+        bundle = TaskBundle.get(worksheet_id)
+        if bundle is None:
+            return jsonify({'error': 'No offline bundle for this worksheet'}), 404
+        response = jsonify(_bundle_urls(worksheet_id, bundle['version']))
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        logger.error(f"Error getting bundle of worksheet {worksheet_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@tasks_bp.route('/bundles/<int:worksheet_id>/<version>.json')
+def bundle_data(worksheet_id, version):
+    """Tasks and answer keys of one bundle version"""
+    bundle = TaskBundle.get(worksheet_id)
+    if bundle is None or bundle['version'] != version:
+        return jsonify({'error': 'Bundle not found or superseded', 'current': _bundle_urls(worksheet_id, bundle['version']) if bundle else None}), 404
+    return _immutable(Response(bundle['body'], mimetype='application/json'), version)
+
+@tasks_bp.route('/bundles/<int:worksheet_id>/<version>.html')
+def bundle_page(worksheet_id, version):
+    """Self-contained student page of one bundle version, gradable without the server"""
+    bundle = TaskBundle.get(worksheet_id)
+    if bundle is None or bundle['version'] != version:
+        if bundle is not None:
+            return redirect(url_for('tasks.bundle_page', worksheet_id=worksheet_id, version=bundle['version']))
+        return render_template('errors/404.html'), 404
+    
+    task_list = TaskPageCache.get(worksheet_id)
+    if TaskBundle.version_for(task_list['version']) != version:
+        task_list = None
+    html = render_template('bundle.html',
+                           bundle=bundle['data'],
+                           task_list=task_list,
+                           urls=_bundle_urls(worksheet_id, version))
+    return _immutable(Response(html, mimetype='text/html'), version)
+
+@tasks_bp.route('/sw.js')
+def service_worker():
+    """Service worker caching bundles and task pages, served from the root so it covers the whole site"""
+    response = current_app.send_static_file('js/sw.js')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+@tasks_bp.route('/api/worksheets/<int:worksheet_id>/stats')
+def api_worksheet_stats(worksheet_id):
+    """Response statistics of a worksheet and each of its tasks, read from the running totals"""
+    try:
+        totals = db.session.get(WorksheetStats, worksheet_id)
+        rows = db.session.query(Task.id, Task.order_index, Task.task_type, TaskStats).outerjoin(
+            TaskStats, TaskStats.task_id == Task.id
+        ).filter(Task.worksheet_id == worksheet_id).order_by(Task.order_index).all()
+        if not rows:
+            return jsonify({'error': 'No tasks found for this worksheet'}), 404
+        
+        return jsonify({
+            'worksheet_id': worksheet_id,
+            **_summarize(totals),
+            'tasks': [
+                dict(task_id=task_id, order_index=order_index, task_type=task_type, **_summarize(stats))
+                for task_id, order_index, task_type, stats in rows
+            ],
+            'pending_responses': get_response_buffer().pending()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting stats for worksheet {worksheet_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def _summarize(stats):
+    """Attempts, correct answers, percent correct and average score of a TaskStats/WorksheetStats row"""
+    attempts = stats.attempts if stats else 0
+    return {
+        'attempts': attempts,
+        'correct': stats.correct if stats else 0,
+        'percent_correct': round(100.0 * stats.correct / attempts, 1) if attempts else None,
+        'average_score': round(stats.score_total / attempts, 3) if attempts else None,
+        'last_response_at': stats.last_response_at.isoformat() if stats and stats.last_response_at else None
+    }
+
 @tasks_bp.route('/worksheets')
 def list_worksheets():
-    """List all uploaded worksheets"""
+    """List the current user's worksheets, newest first, one page at a time"""
     try:
-        worksheets = Worksheet.query.order_by(Worksheet.upload_date.desc()).all()
-        return render_template('worksheets.html', worksheets=worksheets)
+        cursor = request.args.get('cursor')
+        page_size = current_app.config.get('DASHBOARD_PAGE_SIZE', WorksheetDashboard.DEFAULT_PAGE_SIZE)
+        try:
+            worksheets, task_counts, next_cursor = WorksheetDashboard.get_page(
+                session.get('user_email'), cursor, page_size
+            )
+        except ValueError:
+            flash('Invalid page link, showing your latest worksheets', 'warning')
+            return redirect(url_for('tasks.list_worksheets'))
+        
+        return render_template('worksheets.html',
+                             worksheets=worksheets,
+                             task_counts=task_counts,
+                             next_cursor=next_cursor,
+                             is_first_page=not cursor)
     except Exception as e:
         logger.error(f"Error listing worksheets: {str(e)}")
         flash(f'Error loading worksheets: {str(e)}', 'error')
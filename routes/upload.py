@@ -1,12 +1,16 @@
 import os
 import logging
+import zipfile
 from flask import Blueprint, request, jsonify, current_app, flash, redirect, url_for, session
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import FileStorage
 from services.file_processor import FileProcessor
-from services.ai_task_generator import AITaskGenerator
-from services.task_converter import TaskConverter
+from services.blob_store import BlobStore
+from services.job_queue import JobQueue
 from services.subscription_service import SubscriptionService
 from services.email_verification import EmailVerificationService
+from services.entitlements import EntitlementService
+from services.quota_service import QuotaService
 from models import Worksheet, db
 
 logger = logging.getLogger(__name__)
@@ -25,11 +29,11 @@ def upload_file():
             return redirect(url_for('index'))
         
         # Check if email is verified
-        if not EmailVerificationService.is_email_verified(user_email):
+        if not EntitlementService.is_verified(user_email):
             # Create verification request and send email
             try:
                 token = EmailVerificationService.create_verification_request(user_email)
-                if EmailVerificationService.send_verification_email(user_email, token):
+                if EmailVerificationService.queue_verification_email(user_email, token):
                     session['pending_verification_email'] = user_email
                     flash('Please verify your email address first. Check your inbox for verification instructions.', 'warning')
                     return redirect(url_for('verification.verification_pending'))
@@ -42,7 +46,7 @@ def upload_file():
                 return redirect(url_for('index'))
         
         # Check usage limits
-        if not SubscriptionService.check_usage_limit(user_email):
+        if not EntitlementService.can_process(user_email):
             flash('You have reached your free limit of 3 worksheets. Please upgrade to Premium for unlimited access.', 'error')
             return redirect(url_for('subscription.pricing'))
         
@@ -63,47 +67,43 @@ def upload_file():
         # Store user email in session
         session['user_email'] = user_email
         
-        # Get or create user and link to worksheet
-        user = SubscriptionService.get_or_create_user(user_email)
+        # Link the worksheet to the user, creating the user on their first upload
+        user_id = EntitlementService.get(user_email)['user_id']
+        if user_id is None:
+            user_id = SubscriptionService.get_or_create_user(user_email).id
         
-        # Process the file
-        file_info = FileProcessor.process_file(file, current_app.config['UPLOAD_FOLDER'])
+        # Store the file by content; extraction and generation run in a background job
+        file_info = BlobStore.save_upload(file, current_app.config['UPLOAD_FOLDER'])
+        
+        # The check above is only a fast path; this reservation is what enforces the limit
+        if QuotaService.reserve(user_email) is None:
+            db.session.rollback()
+            flash('You have reached your free limit of 3 worksheets. Please upgrade to Premium for unlimited access.', 'error')
+            return redirect(url_for('subscription.pricing'))
         
         # Create worksheet record
         worksheet = Worksheet(
             filename=file_info['filename'],
             original_filename=file.filename,
             file_type=file_info['file_type'],
-            extracted_text=file_info['extracted_text'],
-            processing_status='processing',
-            user_id=user.id
+            processing_status='pending',
+            user_id=user_id
         )
         
+        # Reservation, worksheet, blob reference and job are committed together by enqueue()
         db.session.add(worksheet)
-        db.session.commit()
-        
-        logger.info(f"Created worksheet record with ID: {worksheet.id}")
-        
-        # Generate 15 tasks using AI
-        try:
-            ai_generator = AITaskGenerator()
-            tasks_data = ai_generator.generate_tasks_from_text(file_info['extracted_text'], num_tasks=15)
-            
-            # Save tasks to database
-            TaskConverter.save_tasks_to_database(worksheet.id, tasks_data)
-            TaskConverter.update_worksheet_status(worksheet.id, 'completed')
-            
-            # Increment user's usage count
-            SubscriptionService.increment_usage(user_email)
-            
-            flash('Worksheet processed successfully!', 'success')
-            return redirect(url_for('tasks.view_tasks', worksheet_id=worksheet.id))
-            
-        except Exception as e:
-            logger.error(f"Error generating tasks: {str(e)}")
-            TaskConverter.update_worksheet_status(worksheet.id, 'failed')
-            flash(f'Error generating tasks: {str(e)}', 'error')
-            return redirect(url_for('index'))
+        BlobStore.add_reference(file_info)
+        db.session.flush()
+        worksheet_id = worksheet.id
+        
+        logger.info(f"Created worksheet record with ID: {worksheet_id}")
+        
+        # Queue generation of 15 tasks
+        JobQueue.enqueue('worksheet', worksheet_id=worksheet_id, user_email=user_email,
+                         payload={'num_tasks': 15, 'quota_reserved': 1})
+        
+        flash('Worksheet uploaded! Your interactive tasks are being generated.', 'success')
+        return redirect(url_for('tasks.view_tasks', worksheet_id=worksheet_id))
         
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
@@ -124,35 +124,120 @@ def api_upload_file():
         if not FileProcessor.is_allowed_file(file.filename):
             return jsonify({'error': 'File type not allowed'}), 400
         
-        # Process the file
-        file_info = FileProcessor.process_file(file, current_app.config['UPLOAD_FOLDER'])
+        # Store the file by content; extraction and generation run in a background job
+        file_info = BlobStore.save_upload(file, current_app.config['UPLOAD_FOLDER'])
         
         # Create worksheet record
         worksheet = Worksheet(
             filename=file_info['filename'],
             original_filename=file.filename,
             file_type=file_info['file_type'],
-            extracted_text=file_info['extracted_text'],
-            processing_status='processing'
+            processing_status='pending'
         )
         
+        # Worksheet, blob reference and job are committed together by enqueue()
         db.session.add(worksheet)
-        db.session.commit()
+        BlobStore.add_reference(file_info)
+        db.session.flush()
         
-        # Generate 15 tasks using AI
-        ai_generator = AITaskGenerator()
-        tasks_data = ai_generator.generate_tasks_from_text(file_info['extracted_text'], num_tasks=15)
-        
-        # Save tasks to database
-        TaskConverter.save_tasks_to_database(worksheet.id, tasks_data)
-        TaskConverter.update_worksheet_status(worksheet.id, 'completed')
+        # Queue generation of 15 tasks
+        job = JobQueue.enqueue('worksheet', worksheet_id=worksheet.id, payload={'num_tasks': 15})
         
         return jsonify({
-            'message': 'File processed successfully',
+            'message': 'File accepted for processing',
             'worksheet_id': worksheet.id,
-            'tasks_count': len(tasks_data)
-        })
+            'job_id': job.id,
+            'status_url': url_for('jobs.api_job_status', job_id=job.id)
+        }), 202
         
     except Exception as e:
         logger.error(f"API upload error: {str(e)}")
         return jsonify({'error': str(e)}), 500
+
+def _expand_upload(upload, max_file_bytes):
+    """Yield the worksheet files of an upload: the file itself, or every member of a zip archive"""
+    if not upload.filename.lower().endswith('.zip'):
+        yield upload
+        return
+    
+    with zipfile.ZipFile(upload.stream) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+            # Declared sizes bound how much a member can expand to
+            if info.file_size > max_file_bytes:
+                raise ValueError(f"{name} in {upload.filename} is too large")
+            with archive.open(info) as member:
+                yield FileStorage(stream=member, filename=name)
+
+@upload_bp.route('/api/upload/batch', methods=['POST'])
+def api_upload_batch():
+    """API endpoint converting many worksheets (several files and/or zip archives) in one job"""
+    try:
+        uploads = request.files.getlist('files') + request.files.getlist('file')
+        if not uploads:
+            return jsonify({'error': 'No files provided'}), 400
+        
+        # Batches can hold many worksheets, so they always count against a verified user's quota
+        user_email = request.form.get('email') or session.get('user_email')
+        if not user_email:
+            return jsonify({'error': 'Email is required'}), 401
+        if not EntitlementService.is_verified(user_email):
+            return jsonify({'error': 'Email address is not verified'}), 403
+        if not EntitlementService.can_process(user_email):
+            return jsonify({'error': 'You have reached your free limit. Please upgrade to Premium for unlimited access.'}), 403
+        if EntitlementService.get(user_email)['user_id'] is None:
+            SubscriptionService.get_or_create_user(user_email)
+        
+        max_files = current_app.config['BATCH_MAX_FILES']
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        files = []
+        rejected = []
+        
+        # Files are stored by content right away; worksheets are created when the batch finishes
+        for upload in uploads:
+            for file_obj in _expand_upload(upload, current_app.config['MAX_CONTENT_LENGTH']):
+                if not FileProcessor.is_allowed_file(file_obj.filename):
+                    rejected.append(file_obj.filename)
+                    continue
+                if len(files) >= max_files:
+                    return jsonify({'error': f'A batch can contain at most {max_files} worksheets'}), 400
+                
+                file_info = BlobStore.save_upload(file_obj, upload_folder)
+                files.append({
+                    'filename': file_info['filename'],
+                    'original_filename': file_obj.filename,
+                    'file_type': file_info['file_type'],
+                    'sha256': file_info['sha256'],
+                    'size': file_info['size']
+                })
+        
+        if not files:
+            return jsonify({'error': 'No PDF or DOCX files found', 'rejected': rejected}), 400
+        
+        # Reserve every file of the batch at once; failed files are given back when it finishes
+        if QuotaService.reserve(user_email, len(files)) is None:
+            db.session.rollback()
+            remaining = EntitlementService.get(user_email)['remaining']
+            return jsonify({
+                'error': f'Your free plan can convert {remaining} more worksheets. Please upgrade to Premium for unlimited access.'
+            }), 403
+        
+        # Queue generation of 15 tasks per worksheet
+        job = JobQueue.enqueue('batch', user_email=user_email,
+                               payload={'num_tasks': 15, 'files': files, 'quota_reserved': len(files)})
+        
+        return jsonify({
+            'message': f'{len(files)} files accepted for processing',
+            'job_id': job.id,
+            'files': [entry['original_filename'] for entry in files],
+            'rejected': rejected,
+            'status_url': url_for('jobs.api_job_status', job_id=job.id)
+        }), 202
+        
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Batch upload error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -48,7 +48,7 @@ def resend_verification():
         token = EmailVerificationService.create_verification_request(email)
         
         # Send verification email
-        if EmailVerificationService.send_verification_email(email, token):
+        if EmailVerificationService.queue_verification_email(email, token):
             flash('Verification email sent! Please check your inbox.', 'success')
         else:
             flash('Failed to send verification email. Please try again later.', 'error')
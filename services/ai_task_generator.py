@@ -1,19 +1,35 @@
 import json
 import os
+import re
+import asyncio
 import logging
-from openai import OpenAI
-from .cache_service import CacheService
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .cache_service import get_cache_service
+from .openai_client import get_openai_client, create_chat_completion, get_async_openai_client, acreate_chat_completion
+from .single_flight import get_single_flight
+from .task_stream_parser import TaskStreamParser
+from .text_chunker import TextChunker
 
 logger = logging.getLogger(__name__)
 
+# Generations in progress on each event loop, so concurrent async jobs for the same text take the
+# single-flight locks once between them; other threads and processes are coordinated by those locks
+_async_flights = {}
+
 class AITaskGenerator:
     """Service for generating interactive tasks using OpenAI GPT-4"""
     
-    def __init__(self):
-        self.openai_client = OpenAI(
-            api_key=os.environ.get("OPENAI_API_KEY", "your-openai-api-key-here")
-        )
-        self.cache_service = CacheService()
+    def __init__(self, openai_client=None, cache_service=None, single_flight=None):
+        # Shared per process so connections stay pooled between uploads
+        self.openai_client = openai_client or get_openai_client()
+        self.cache_service = cache_service or get_cache_service()
+        
+        # Concurrent requests for the same content wait for one generation
+        self.single_flight = single_flight or get_single_flight()
+        
+        # Long worksheets are split into chunks generated concurrently
+        self.chunk_max_chars = int(os.environ.get("AI_CHUNK_MAX_CHARS", 12000))
+        self.max_concurrency = int(os.environ.get("AI_MAX_CONCURRENCY", 4))
     
     def generate_tasks_from_text(self, text, num_tasks=15):
         """Generate interactive tasks from extracted text using OpenAI with caching"""
@@ -26,34 +42,48 @@ class AITaskGenerator:
                 logger.info(f"Using {len(cached_tasks)} cached tasks")
                 return cached_tasks
             
-            prompt = self._create_task_generation_prompt(text, num_tasks)
-            
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert educational content creator. "
-                                 "Generate interactive learning tasks based on the provided text. "
-                                 "Always respond with valid JSON format."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                response_format={"type": "json_object"},
-                max_tokens=4000,
-                temperature=0.7
-            )
+            cache_key = self.cache_service.task_cache_key(text, num_tasks)
+            with self.single_flight.flight(cache_key, lambda: self.cache_service.get_cached_tasks(text, num_tasks)) as flight:
+                if not flight.is_leader:
+                    logger.info(f"Using {len(flight.result)} tasks from a concurrent generation")
+                    return flight.result
+                
+                if len(text) > self.chunk_max_chars:
+                    tasks = self._generate_chunked_tasks(text, num_tasks)
+                else:
+                    tasks = self._request_tasks(text, num_tasks)
+                
+                # Cache the generated tasks before releasing waiting callers
+                self.cache_service.cache_tasks(text, tasks, num_tasks)
+            
+            logger.info(f"Successfully generated and cached {len(tasks)} tasks")
+            return tasks
+            
+        except Exception as e:
+            logger.error(f"Error generating tasks with OpenAI: {str(e)}")
+            raise Exception(f"Failed to generate tasks: {str(e)}")
+    
+    async def agenerate_tasks_from_text(self, text, num_tasks=15):
+        """Async generate_tasks_from_text for the async job worker; waits on the API without holding a thread"""
+        try:
+            logger.info(f"Generating {num_tasks} tasks from text (length: {len(text)} chars)")
+            
+            cached_tasks = await asyncio.to_thread(self.cache_service.get_cached_tasks, text, num_tasks)
+            if cached_tasks:
+                logger.info(f"Using {len(cached_tasks)} cached tasks")
+                return cached_tasks
             
-            result = json.loads(response.choices[0].message.content)
-            tasks = self._validate_and_format_tasks(result)
+            key = (id(asyncio.get_running_loop()), self.cache_service.task_cache_key(text, num_tasks))
+            flight = _async_flights.get(key)
+            if flight is not None:
+                tasks = await asyncio.shield(flight)
+                logger.info(f"Using {len(tasks)} tasks from a concurrent generation")
+                return tasks
             
-            # Cache the generated tasks
-            self.cache_service.cache_tasks(text, tasks, num_tasks)
+            flight = asyncio.ensure_future(self._agenerate_and_cache(text, num_tasks))
+            _async_flights[key] = flight
+            flight.add_done_callback(lambda _: _async_flights.pop(key, None))
+            tasks = await asyncio.shield(flight)
             
             logger.info(f"Successfully generated and cached {len(tasks)} tasks")
             return tasks
@@ -62,6 +92,241 @@ class AITaskGenerator:
             logger.error(f"Error generating tasks with OpenAI: {str(e)}")
             raise Exception(f"Failed to generate tasks: {str(e)}")
     
+    async def _agenerate_and_cache(self, text, num_tasks):
+        """Generate tasks with the async client under the same single-flight locks as the sync path, and cache them"""
+        # Entering the flight can block on another process's lock, so it runs in a thread
+        cache_key = self.cache_service.task_cache_key(text, num_tasks)
+        flight_context = self.single_flight.flight(cache_key, lambda: self.cache_service.get_cached_tasks(text, num_tasks))
+        flight = await asyncio.to_thread(flight_context.__enter__)
+        try:
+            if not flight.is_leader:
+                logger.info(f"Using {len(flight.result)} tasks from a concurrent generation")
+                return flight.result
+            
+            tasks = await self._agenerate(text, num_tasks)
+            
+            # Cache the generated tasks before releasing waiting callers
+            await asyncio.to_thread(self.cache_service.cache_tasks, text, tasks, num_tasks)
+            return tasks
+        finally:
+            await asyncio.to_thread(flight_context.__exit__, None, None, None)
+    
+    async def _agenerate(self, text, num_tasks):
+        """Generate tasks with the async client, requesting chunks of long texts concurrently"""
+        if len(text) > self.chunk_max_chars:
+            chunks = TextChunker(self.chunk_max_chars).split(text)
+            counts = TextChunker.allocate_tasks(chunks, num_tasks)
+            logger.info(f"Generating tasks from {len(chunks)} chunks with allocation {counts}")
+            
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            
+            async def request_chunk(chunk, count):
+                async with semaphore:
+                    return await self._arequest_tasks(chunk, count)
+            
+            results = await asyncio.gather(
+                *(request_chunk(chunk, count) for chunk, count in zip(chunks, counts) if count > 0),
+                return_exceptions=True
+            )
+            # A missing chunk would leave a section without tasks; fail so the job is retried
+            for index, result in enumerate(results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error generating tasks for chunk {index}: {str(result)}")
+                    raise ValueError(f"Task generation failed for chunk {index}: {str(result)}")
+            
+            # gather keeps document order regardless of completion order
+            return self._merge_tasks(results)
+        
+        return await self._arequest_tasks(text, num_tasks)
+    
+    def stream_tasks_from_text(self, text, num_tasks=15):
+        """Yield formatted tasks one by one as the OpenAI response streams in"""
+        try:
+            logger.info(f"Streaming {num_tasks} tasks from text (length: {len(text)} chars)")
+            
+            # Cached tasks are available immediately
+            cached_tasks = self.cache_service.get_cached_tasks(text, num_tasks)
+            if cached_tasks:
+                logger.info(f"Using {len(cached_tasks)} cached tasks")
+                yield from cached_tasks
+                return
+            
+            cache_key = self.cache_service.task_cache_key(text, num_tasks)
+            with self.single_flight.flight(cache_key, lambda: self.cache_service.get_cached_tasks(text, num_tasks)) as flight:
+                if not flight.is_leader:
+                    logger.info(f"Using {len(flight.result)} tasks from a concurrent generation")
+                    yield from flight.result
+                    return
+                
+                if len(text) > self.chunk_max_chars:
+                    task_stream = self._stream_chunked_tasks(text, num_tasks)
+                else:
+                    task_stream = self._stream_task_request(text, num_tasks)
+                
+                tasks = []
+                for task in task_stream:
+                    tasks.append(task)
+                    yield task
+                
+                if not tasks:
+                    raise ValueError("Invalid response format: no tasks in streamed response")
+                
+                # Cache the complete set once the stream has finished
+                self.cache_service.cache_tasks(text, tasks, num_tasks)
+            
+            logger.info(f"Successfully streamed and cached {len(tasks)} tasks")
+            
+        except Exception as e:
+            logger.error(f"Error streaming tasks with OpenAI: {str(e)}")
+            raise Exception(f"Failed to generate tasks: {str(e)}")
+    
+    def _request_tasks(self, text, num_tasks):
+        """Request tasks for a single piece of text"""
+        response = create_chat_completion(
+            self.openai_client,
+            **self._build_completion_request(text, num_tasks)
+        )
+        
+        result = json.loads(response.choices[0].message.content)
+        return self._validate_and_format_tasks(result)
+    
+    async def _arequest_tasks(self, text, num_tasks):
+        """Async _request_tasks"""
+        response = await acreate_chat_completion(
+            get_async_openai_client(),
+            **self._build_completion_request(text, num_tasks)
+        )
+        
+        result = json.loads(response.choices[0].message.content)
+        return self._validate_and_format_tasks(result)
+    
+    def _stream_task_request(self, text, num_tasks):
+        """Stream tasks for a single piece of text, yielding each as soon as it is complete"""
+        stream = create_chat_completion(
+            self.openai_client,
+            **self._build_completion_request(text, num_tasks),
+            stream=True
+        )
+        
+        parser = TaskStreamParser()
+        raw_index = 0
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            
+            for raw_task in parser.feed(content):
+                task = self._format_task(raw_task, raw_index)
+                raw_index += 1
+                if task:
+                    yield task
+    
+    def _submit_chunks(self, executor, text, num_tasks):
+        """Split text into chunks and submit a proportional share of tasks for each"""
+        chunks = TextChunker(self.chunk_max_chars).split(text)
+        counts = TextChunker.allocate_tasks(chunks, num_tasks)
+        logger.info(f"Generating tasks from {len(chunks)} chunks with allocation {counts}")
+        
+        return {
+            executor.submit(self._request_tasks, chunk, count): index
+            for index, (chunk, count) in enumerate(zip(chunks, counts))
+            if count > 0
+        }
+    
+    def _generate_chunked_tasks(self, text, num_tasks):
+        """Generate tasks for a long text by processing its chunks concurrently"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = self._submit_chunks(executor, text, num_tasks)
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # A missing chunk would leave a section without tasks; fail so the job is retried
+                    logger.error(f"Error generating tasks for chunk {index}: {str(e)}")
+                    for pending in futures:
+                        pending.cancel()
+                    raise ValueError(f"Task generation failed for chunk {index}: {str(e)}")
+        
+        # Merge in document order regardless of completion order
+        return self._merge_tasks(results[index] for index in sorted(results))
+    
+    def _stream_chunked_tasks(self, text, num_tasks):
+        """Yield tasks from concurrently generated chunks in document order
+
+        A chunk that finishes early is held back until every chunk before it is
+        done, so the streamed order matches _generate_chunked_tasks.
+        """
+        seen_questions = set()
+        order_index = 0
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = self._submit_chunks(executor, text, num_tasks)
+            for future in sorted(futures, key=futures.get):
+                try:
+                    chunk_tasks = future.result()
+                except Exception as e:
+                    # Nothing is cached for a partial stream; the job is retried from scratch
+                    logger.error(f"Error generating tasks for chunk {futures[future]}: {str(e)}")
+                    for pending in futures:
+                        pending.cancel()
+                    raise ValueError(f"Task generation failed for chunk {futures[future]}: {str(e)}")
+                
+                for task in chunk_tasks:
+                    key = self._question_key(task)
+                    if key in seen_questions:
+                        continue
+                    seen_questions.add(key)
+                    yield dict(task, order_index=order_index)
+                    order_index += 1
+    
+    def _merge_tasks(self, task_lists):
+        """Merge per-chunk task lists, dropping duplicate questions and re-indexing"""
+        merged = []
+        seen_questions = set()
+        for tasks in task_lists:
+            for task in tasks:
+                key = self._question_key(task)
+                if key in seen_questions:
+                    continue
+                seen_questions.add(key)
+                merged.append(dict(task, order_index=len(merged)))
+        return merged
+    
+    @staticmethod
+    def _question_key(task):
+        """Normalized identity of a task used for de-duplication across chunks"""
+        question = re.sub(r'\W+', ' ', task['question'].lower()).strip()
+        return task['task_type'], question
+    
+    def _build_completion_request(self, text, num_tasks):
+        """Build the chat completion arguments for task generation"""
+        prompt = self._create_task_generation_prompt(text, num_tasks)
+        
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        # do not change this unless explicitly requested by the user
+        return {
+            'model': "gpt-4o",
+            'messages': [
+                {
+                    "role": "system",
+                    "content": "You are an expert educational content creator. "
+                             "Generate interactive learning tasks based on the provided text. "
+                             "Always respond with valid JSON format."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            'response_format': {"type": "json_object"},
+            'max_tokens': 4000,
+            'temperature': 0.7
+        }
+    
     def _create_task_generation_prompt(self, text, num_tasks):
         """Create a detailed prompt for task generation"""
         return f"""
@@ -151,28 +416,32 @@ class AITaskGenerator:
             formatted_tasks = []
             
             for i, task in enumerate(tasks):
-                # Validate required fields
-                if 'task_type' not in task or 'question' not in task or 'task_data' not in task:
-                    logger.warning(f"Skipping invalid task at index {i}: missing required fields")
-                    continue
-                
-                # Validate task type
-                valid_types = ['multiple_choice', 'fill_blank', 'short_answer', 'drag_drop']
-                if task['task_type'] not in valid_types:
-                    logger.warning(f"Skipping task with invalid type: {task['task_type']}")
-                    continue
-                
-                formatted_task = {
-                    'task_type': task['task_type'],
-                    'question': task['question'],
-                    'task_data': task['task_data'],
-                    'order_index': i
-                }
-                
-                formatted_tasks.append(formatted_task)
+                formatted_task = self._format_task(task, i)
+                if formatted_task:
+                    formatted_tasks.append(formatted_task)
             
             return formatted_tasks
             
         except Exception as e:
             logger.error(f"Error validating tasks: {str(e)}")
             raise Exception(f"Failed to validate generated tasks: {str(e)}")
+    
+    def _format_task(self, task, index):
+        """Validate a single AI task and return it formatted, or None if invalid"""
+        # Validate required fields
+        if not isinstance(task, dict) or 'task_type' not in task or 'question' not in task or 'task_data' not in task:
+            logger.warning(f"Skipping invalid task at index {index}: missing required fields")
+            return None
+        
+        # Validate task type
+        valid_types = ['multiple_choice', 'fill_blank', 'short_answer', 'drag_drop']
+        if task['task_type'] not in valid_types:
+            logger.warning(f"Skipping task with invalid type: {task['task_type']}")
+            return None
+        
+        return {
+            'task_type': task['task_type'],
+            'question': task['question'],
+            'task_data': task['task_data'],
+            'order_index': index
+        }
@@ -0,0 +1,176 @@
+"""
+Batch conversion of many worksheets in one job: parallel extraction, bounded generation, one bulk insert.
+"""
+import os
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from flask import current_app
+from sqlalchemy import insert
+from models import Worksheet, User, db
+from .file_processor import FileProcessor
+from .ai_task_generator import AITaskGenerator
+from .cache_service import get_cache_service
+from .blob_store import BlobStore
+from .task_converter import TaskConverter
+from .quota_service import QuotaService
+from .job_queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+class BatchPipeline:
+    """Runs a 'batch' job whose payload lists files already saved to the blob store"""
+
+    @staticmethod
+    def _extract(file_path, file_type, file_hash):
+        """Extract text in a pool thread, consulting the file-hash text cache first"""
+        cache_service = get_cache_service()
+        text = cache_service.get_cached_text(file_hash, file_type, FileProcessor.EXTRACTION_VERSION)
+        if text is None:
+            text = FileProcessor.extract_text_from_path(file_path, file_type)
+            cache_service.cache_text(file_hash, file_type, text, FileProcessor.EXTRACTION_VERSION)
+        return text
+
+    @staticmethod
+    def _report(job, claim_token, files, **summary):
+        """Persist per-file progress on the job so the status endpoint can show it, renewing its lease"""
+        if not JobQueue.renew_lease(job.id, claim_token):
+            db.session.rollback()
+            raise Exception(f"Batch job {job.id} lost its claim to another worker")
+        job.result = dict(
+            summary,
+            files=[dict(entry) for entry in files],
+            completed=sum(1 for entry in files if entry['status'] == 'completed'),
+            failed=sum(1 for entry in files if entry['status'] == 'failed'),
+            total=len(files)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def process_batch(job):
+        """Convert every file of a batch job and store all worksheets and tasks in one transaction"""
+        # Kept from the claim: after the commits below a reload would return whoever holds the job now
+        claim_token = job.claim_token
+        payload = job.payload or {}
+        num_tasks = payload.get('num_tasks', 15)
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+
+        files = [
+            {'name': entry['original_filename'], 'status': 'queued', 'tasks_count': 0, 'error': None}
+            for entry in payload.get('files', [])
+        ]
+        BatchPipeline._report(job, claim_token, files)
+
+        # Text already stored for identical blobs needs no extraction at all
+        filenames = {entry['filename'] for entry in payload.get('files', [])}
+        known_texts = dict(
+            db.session.query(Worksheet.filename, Worksheet.extracted_text)
+            .filter(Worksheet.filename.in_(filenames), Worksheet.extracted_text.isnot(None))
+            .all()
+        ) if filenames else {}
+
+        texts = {}
+        tasks = {}
+        ai_generator = AITaskGenerator()
+        extract_workers = current_app.config.get('BATCH_EXTRACT_WORKERS', 4)
+        generate_workers = current_app.config.get('BATCH_GENERATION_CONCURRENCY', 4)
+
+        with ThreadPoolExecutor(max_workers=extract_workers) as extract_pool, \
+                ThreadPoolExecutor(max_workers=generate_workers) as generate_pool:
+            pending = {}
+
+            def start_generation(index):
+                files[index]['status'] = 'generating'
+                pending[generate_pool.submit(ai_generator.generate_tasks_from_text, texts[index], num_tasks)] = ('generate', index)
+
+            # Identical files in one batch are extracted once
+            extraction_by_hash = {}
+            for index, entry in enumerate(payload.get('files', [])):
+                if entry['filename'] in known_texts:
+                    texts[index] = known_texts[entry['filename']]
+                    start_generation(index)
+                    continue
+                files[index]['status'] = 'extracting'
+                future = extraction_by_hash.get(entry['sha256'])
+                if future is None:
+                    file_path = os.path.join(upload_folder, entry['filename'])
+                    future = extract_pool.submit(BatchPipeline._extract, file_path, entry['file_type'], entry['sha256'])
+                    extraction_by_hash[entry['sha256']] = future
+                    pending[future] = ('extract', [])
+                pending[future][1].append(index)
+            BatchPipeline._report(job, claim_token, files)
+
+            # Generation for a file starts as soon as its own extraction finishes
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, target = pending.pop(future)
+                    indexes = target if stage == 'extract' else [target]
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        logger.error(f"Batch job {job.id}: {stage} failed for {[files[i]['name'] for i in indexes]}: {str(e)}")
+                        for index in indexes:
+                            files[index].update(status='failed', error=str(e))
+                        continue
+
+                    for index in indexes:
+                        if stage == 'extract':
+                            texts[index] = value
+                            start_generation(index)
+                        else:
+                            tasks[index] = value
+                            files[index].update(status='saving', tasks_count=len(value))
+                BatchPipeline._report(job, claim_token, files)
+
+        worksheet_ids = BatchPipeline._persist(job, payload.get('files', []), files, texts, tasks)
+        BatchPipeline._report(job, claim_token, files, worksheet_ids=worksheet_ids)
+        return job.result
+
+    @staticmethod
+    def _persist(job, entries, files, texts, tasks):
+        """Insert all worksheets, their tasks and blob references, and settle the quota, in a single transaction"""
+        user = User.query.filter_by(email=job.user_email).first() if job.user_email else None
+        now = datetime.utcnow()
+
+        worksheet_rows = [
+            {
+                'filename': entry['filename'],
+                'original_filename': entry['original_filename'],
+                'file_type': entry['file_type'],
+                'extracted_text': texts.get(index),
+                'upload_date': now,
+                'processing_status': 'completed' if index in tasks else 'failed',
+                'user_id': user.id if user else None
+            }
+            for index, entry in enumerate(entries)
+        ]
+        if not worksheet_rows:
+            return []
+
+        try:
+            worksheet_ids = db.session.execute(
+                insert(Worksheet).returning(Worksheet.id, sort_by_parameter_order=True),
+                worksheet_rows
+            ).scalars().all()
+
+            TaskConverter.bulk_insert_tasks({worksheet_ids[index]: generated for index, generated in tasks.items()})
+
+            for entry in entries:
+                BlobStore.add_reference(entry)
+
+            # Worksheets were reserved at upload; the ones that failed go back to the user
+            QuotaService.settle_job(job, failed=len(entries) - len(tasks))
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for index, worksheet_id in enumerate(worksheet_ids):
+            files[index]['worksheet_id'] = worksheet_id
+            if files[index]['status'] == 'saving':
+                files[index]['status'] = 'completed'
+
+        logger.info(f"Batch job {job.id}: stored {len(worksheet_ids)} worksheets and {sum(map(len, tasks.values()))} tasks")
+        return list(worksheet_ids)
@@ -0,0 +1,179 @@
+"""
+Content-addressed storage for uploaded files, shared by every worksheet with identical bytes.
+"""
+import os
+import time
+import logging
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from models import FileBlob, ProcessingJob, Worksheet, db
+from .file_processor import FileProcessor
+
+logger = logging.getLogger(__name__)
+
+class BlobStore:
+    """Stores uploads as blobs/<ab>/<cd>/<sha256>.<ext> under the upload folder"""
+
+    BLOB_DIR = 'blobs'
+
+    # Files younger than this are never collected, so in-flight uploads are safe
+    GC_GRACE_SECONDS = 3600
+
+    @staticmethod
+    def blob_path(sha256, file_type):
+        """Relative path of a blob, sharded by the first two bytes of its hash"""
+        return f"{BlobStore.BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{file_type}"
+
+    @staticmethod
+    def hash_of(filename):
+        """Content hash encoded in a blob path, or None for files stored under their upload name"""
+        if not filename.startswith(BlobStore.BLOB_DIR + '/'):
+            return None
+        return os.path.basename(filename).split('.', 1)[0]
+
+    @staticmethod
+    def save_upload(file_obj, upload_folder):
+        """Stream an upload into the blob store; identical files are stored once"""
+        try:
+            filename, file_type = FileProcessor.upload_name(file_obj.filename)
+
+            # Hash while streaming into a temp file, then move it to its content address
+            temp_path, sha256, size = FileProcessor.stream_to_disk(
+                getattr(file_obj, 'stream', file_obj),
+                os.path.join(upload_folder, BlobStore.BLOB_DIR, 'tmp')
+            )
+            try:
+                relative_path = BlobStore.blob_path(sha256, file_type)
+                file_path = os.path.join(upload_folder, relative_path)
+                deduplicated = os.path.exists(file_path)
+                if deduplicated:
+                    os.utime(file_path)
+                else:
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    os.replace(temp_path, file_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+
+            if deduplicated:
+                logger.info(f"Upload {filename} matches stored blob {sha256[:12]}")
+
+            return {
+                'filename': relative_path,
+                'file_type': file_type,
+                'file_path': file_path,
+                'sha256': sha256,
+                'size': size,
+                'deduplicated': deduplicated
+            }
+
+        except Exception as e:
+            logger.error(f"Error saving file: {str(e)}")
+            raise Exception(f"File upload failed: {str(e)}")
+
+    @staticmethod
+    def add_reference(file_info):
+        """Count one more worksheet using a blob, creating its row on first use (not committed)"""
+        updated = FileBlob.query.filter_by(sha256=file_info['sha256']).update(
+            {FileBlob.ref_count: FileBlob.ref_count + 1}, synchronize_session=False
+        )
+        if updated:
+            return
+
+        try:
+            with db.session.begin_nested():
+                db.session.add(FileBlob(
+                    sha256=file_info['sha256'],
+                    file_type=file_info['file_type'],
+                    size=file_info['size'],
+                    path=file_info['filename'],
+                    ref_count=1
+                ))
+        except IntegrityError:
+            # Another upload of the same file created the row first
+            FileBlob.query.filter_by(sha256=file_info['sha256']).update(
+                {FileBlob.ref_count: FileBlob.ref_count + 1}, synchronize_session=False
+            )
+
+    @staticmethod
+    def find_extracted_text(worksheet):
+        """Extracted text of another worksheet stored as the same blob, if any"""
+        if not worksheet.filename.startswith(BlobStore.BLOB_DIR + '/'):
+            return None
+
+        row = db.session.query(Worksheet.extracted_text).filter(
+            Worksheet.filename == worksheet.filename,
+            Worksheet.id != worksheet.id,
+            Worksheet.extracted_text.isnot(None)
+        ).first()
+        return row[0] if row else None
+
+    @staticmethod
+    def collect_garbage(upload_folder, dry_run=False):
+        """Recount references from worksheets and delete blobs and temp files nothing uses"""
+        try:
+            now = time.time()
+            counts = dict(
+                db.session.query(Worksheet.filename, func.count(Worksheet.id))
+                .filter(Worksheet.filename.like(BlobStore.BLOB_DIR + '/%'))
+                .group_by(Worksheet.filename)
+                .all()
+            )
+
+            stats = {'recounted': 0, 'deleted_blobs': 0, 'deleted_files': 0, 'freed_bytes': 0}
+
+            # Batch uploads only create their worksheets once the whole batch is converted
+            kept = set()
+            for (payload,) in db.session.query(ProcessingJob.payload).filter(
+                ProcessingJob.kind == 'batch', ProcessingJob.status.in_(['pending', 'processing'])
+            ):
+                kept.update(entry['filename'] for entry in (payload or {}).get('files', []))
+
+            for blob in FileBlob.query.all():
+                ref_count = counts.get(blob.path, 0)
+                if blob.ref_count != ref_count:
+                    blob.ref_count = ref_count
+                    stats['recounted'] += 1
+
+                age = (datetime.utcnow() - blob.created_at).total_seconds() if blob.created_at else None
+                if ref_count == 0 and blob.path not in kept and (age is None or age >= BlobStore.GC_GRACE_SECONDS):
+                    stats['deleted_blobs'] += 1
+                    if not dry_run:
+                        db.session.delete(blob)
+                else:
+                    kept.add(blob.path)
+
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+
+            # Files of deleted blobs, plus files with no row at all (crashed uploads, stray temp files).
+            # Re-uploads touch their blob, so a file being attached right now is never removed.
+            root = os.path.join(upload_folder, BlobStore.BLOB_DIR)
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    file_path = os.path.join(dirpath, name)
+                    relative_path = os.path.relpath(file_path, upload_folder).replace(os.sep, '/')
+                    if relative_path in kept:
+                        continue
+                    if now - os.path.getmtime(file_path) < BlobStore.GC_GRACE_SECONDS:
+                        continue
+                    stats['deleted_files'] += 1
+                    stats['freed_bytes'] += os.path.getsize(file_path)
+                    if not dry_run:
+                        os.unlink(file_path)
+
+            if not dry_run:
+                for dirpath, _, _ in os.walk(root, topdown=False):
+                    if dirpath != root and os.path.basename(dirpath) != 'tmp' and not os.listdir(dirpath):
+                        os.rmdir(dirpath)
+
+            logger.info(f"Blob garbage collection{' (dry run)' if dry_run else ''}: {stats}")
+            return stats
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error collecting blob garbage: {str(e)}")
+            raise Exception(f"Failed to collect blob garbage: {str(e)}")
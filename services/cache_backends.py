@@ -0,0 +1,374 @@
+"""
+Cache tiers used by CacheService: in-process LRU, on-disk SQLite store and the app database.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional, Tuple, Any, Dict
+from sqlalchemy import select, insert, delete, func
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend:
+    """Interface implemented by every cache tier
+
+    Entries are addressed by (namespace, key); values must be JSON-serializable.
+    get() returns (value, expires_at) so upper tiers can be back-filled with the
+    remaining lifetime, or None on a miss.
+    """
+
+    name = 'backend'
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    def size_bytes(self) -> int:
+        return 0
+
+    def _record(self, hit: bool, evicted: int = 0):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': self.count(),
+            'size_mb': round(self.size_bytes() / (1024 * 1024), 2)
+        }
+
+
+class MemoryLRUBackend(CacheBackend):
+    """Bounded in-process LRU front tier, limited by entry count and approximate size"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size_of(value):
+        if isinstance(value, str):
+            return len(value)
+        return len(json.dumps(value, separators=(',', ':')))
+
+    def _pop(self, entry_key):
+        del self._entries[entry_key]
+        self._total_bytes -= self._sizes.pop(entry_key, 0)
+
+    def get(self, namespace, key):
+        entry_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[1] <= time.time():
+                self._pop(entry_key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(entry_key)
+        self._record(entry is not None)
+        return entry
+
+    def set(self, namespace, key, value, expires_at):
+        entry_key = (namespace, key)
+        size = self._size_of(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes // 4:
+            # Very large values would flush most of the tier; leave them to the disk tier
+            self.delete(namespace, key)
+            return
+
+        evicted = 0
+        with self._lock:
+            if entry_key in self._entries:
+                self._pop(entry_key)
+            self._entries[entry_key] = (value, expires_at)
+            self._sizes[entry_key] = size
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._total_bytes > self.max_bytes):
+                self._pop(next(iter(self._entries)))
+                evicted += 1
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def delete(self, namespace, key):
+        with self._lock:
+            if (namespace, key) in self._entries:
+                self._pop((namespace, key))
+
+    def clear(self, namespace=None):
+        with self._lock:
+            for entry_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                self._pop(entry_key)
+
+    def count(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                return len(self._entries)
+            return sum(1 for k in self._entries if k[0] == namespace)
+
+    def size_bytes(self):
+        return self._total_bytes
+
+
+class SQLiteDiskBackend(CacheBackend):
+    """Single-file SQLite store with size-bounded LRU eviction, shared by all local processes"""
+
+    name = 'disk'
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes_since_check = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed ON cache_entries (accessed_at)")
+        conn.commit()
+
+    def _connection(self):
+        """One connection per thread, reopened after fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace, key):
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+
+        if row is None or row[1] <= now:
+            self._record(False)
+            return None
+
+        # Access time drives LRU eviction; a failed touch is harmless
+        try:
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key)
+            )
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+
+        self._record(True)
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace, key, value, expires_at):
+        data = json.dumps(value, separators=(',', ':'))
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, size, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, data, len(data), expires_at, time.time())
+        )
+        conn.commit()
+
+        self._writes_since_check += 1
+        if self._writes_since_check >= 20 or len(data) > self.max_bytes // 100:
+            self._writes_since_check = 0
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Drop expired entries, then least recently used ones until under the size budget"""
+        now = time.time()
+        evicted = conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,)).rowcount
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.9)
+            rows = conn.execute("SELECT namespace, key, size FROM cache_entries ORDER BY accessed_at").fetchall()
+            doomed = []
+            for namespace, key, size in rows:
+                if total <= target:
+                    break
+                doomed.append((namespace, key))
+                total -= size
+            conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", doomed)
+            evicted += len(doomed)
+
+        conn.commit()
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+            logger.debug(f"Evicted {evicted} disk cache entries")
+
+    def delete(self, namespace, key):
+        conn = self._connection()
+        conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+        conn.commit()
+
+    def clear(self, namespace=None):
+        conn = self._connection()
+        if namespace is None:
+            conn.execute("DELETE FROM cache_entries")
+        else:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+        conn.commit()
+
+    def count(self, namespace=None):
+        conn = self._connection()
+        if namespace is None:
+            return conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    def size_bytes(self):
+        conn = self._connection()
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+
+
+class DatabaseBackend(CacheBackend):
+    """Optional tier in the application database, shared by every host
+
+    Reads and writes run on their own connection and transaction, never on
+    db.session, so caching can neither commit nor roll back a caller's pending
+    work. SQLite databases are skipped: they only serve one host, where the disk
+    tier already shares entries, and a second connection would wait on the
+    session's write lock.
+    """
+
+    name = 'database'
+
+    def _engine(self):
+        """The app's engine, or None outside an app context or on SQLite"""
+        from flask import has_app_context
+        if not has_app_context():
+            return None
+        from models import db
+
+        engine = db.engine
+        return None if engine.dialect.name == 'sqlite' else engine
+
+    @staticmethod
+    def _table():
+        from models import CacheEntry
+        return CacheEntry.__table__
+
+    def get(self, namespace, key):
+        engine = self._engine()
+        if engine is None:
+            return None
+        table = self._table()
+
+        with engine.connect() as conn:
+            entry = conn.execute(
+                select(table.c.value, table.c.expires_at)
+                .where(table.c.namespace == namespace, table.c.key == key)
+            ).first()
+
+        if entry is None or entry.expires_at <= datetime.utcnow():
+            self._record(False)
+            return None
+
+        self._record(True)
+        return json.loads(entry.value), entry.expires_at.replace(tzinfo=timezone.utc).timestamp()
+
+    def set(self, namespace, key, value, expires_at):
+        engine = self._engine()
+        if engine is None:
+            return
+        table = self._table()
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(delete(table).where(table.c.namespace == namespace, table.c.key == key))
+                conn.execute(insert(table).values(
+                    namespace=namespace,
+                    key=key,
+                    value=json.dumps(value, separators=(',', ':')),
+                    expires_at=datetime.utcfromtimestamp(expires_at),
+                    created_at=datetime.utcnow()
+                ))
+        except Exception as e:
+            logger.error(f"Error writing database cache entry: {e}")
+
+    def delete(self, namespace, key):
+        engine = self._engine()
+        if engine is None:
+            return
+        table = self._table()
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(delete(table).where(table.c.namespace == namespace, table.c.key == key))
+        except Exception as e:
+            logger.error(f"Error deleting database cache entry: {e}")
+
+    def clear(self, namespace=None):
+        engine = self._engine()
+        if engine is None:
+            return
+        table = self._table()
+
+        statement = delete(table)
+        if namespace is not None:
+            statement = statement.where(table.c.namespace == namespace)
+        with engine.begin() as conn:
+            conn.execute(statement)
+
+    def count(self, namespace=None):
+        engine = self._engine()
+        if engine is None:
+            return 0
+        table = self._table()
+
+        statement = select(func.count()).select_from(table)
+        if namespace is not None:
+            statement = statement.where(table.c.namespace == namespace)
+        with engine.connect() as conn:
+            return conn.execute(statement).scalar()
@@ -1,169 +1,220 @@
 """
 Cache service for improving performance by caching generated tasks and user data.
 """
-import json
 import os
+import time
 import hashlib
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, List, Dict, Any
 import logging
+import threading
+from .cache_backends import MemoryLRUBackend, SQLiteDiskBackend, DatabaseBackend
+from .text_normalizer import content_hash
 
 logger = logging.getLogger(__name__)
 
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_cache_service():
+    """Get the cache service shared by the whole process"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = CacheService()
+    return _shared_cache
+
 class CacheService:
-    """Simple file-based cache for tasks and user data"""
-    
-    def __init__(self, cache_dir='cache'):
-        self.cache_dir = cache_dir
-        self.tasks_cache_dir = os.path.join(cache_dir, 'tasks')
-        self.user_cache_dir = os.path.join(cache_dir, 'users')
-        
-        # Create cache directories
-        os.makedirs(self.tasks_cache_dir, exist_ok=True)
-        os.makedirs(self.user_cache_dir, exist_ok=True)
-    
+    """Multi-tier cache for tasks and user data
+
+    Lookups go through an in-process LRU, then a size-bounded SQLite file shared by
+    local processes, then (optionally) the application database. Hits in a lower
+    tier are copied into the tiers above it.
+    """
+
+    # Default lifetime per namespace, in seconds
+    TTLS = {
+        'tasks': 24 * 3600,
+        'users': 3600,  # Shorter cache for user data
+        'extracted_text': 7 * 24 * 3600,  # Keyed by file bytes, so it never goes stale
+        'task_payloads': 7 * 24 * 3600,  # Refreshed whenever a worksheet's tasks are saved
+        'task_pages': 7 * 24 * 3600,  # Checked against the payload version on every hit
+    }
+    DEFAULT_TTL = 24 * 3600
+
+    def __init__(self, cache_dir=None, memory_max_entries=None, disk_max_mb=None, use_database=None,
+                 memory_max_mb=None):
+        self.cache_dir = cache_dir or os.environ.get('CACHE_DIR', 'cache')
+
+        if memory_max_entries is None:
+            memory_max_entries = int(os.environ.get('CACHE_MEMORY_MAX_ENTRIES', 1024))
+        if memory_max_mb is None:
+            memory_max_mb = int(os.environ.get('CACHE_MEMORY_MAX_MB', 64))
+        if disk_max_mb is None:
+            disk_max_mb = int(os.environ.get('CACHE_DISK_MAX_MB', 256))
+        if use_database is None:
+            use_database = os.environ.get('CACHE_DATABASE_TIER', 'false').lower() in ['true', 'on', '1']
+
+        self.tiers = [
+            MemoryLRUBackend(max_entries=memory_max_entries, max_bytes=memory_max_mb * 1024 * 1024),
+            SQLiteDiskBackend(os.path.join(self.cache_dir, 'cache.db'), max_bytes=disk_max_mb * 1024 * 1024),
+        ]
+        if use_database:
+            self.tiers.append(DatabaseBackend())
+
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
     def _get_cache_key(self, text: str) -> str:
         """Generate a cache key from text content"""
         return hashlib.md5(text.encode()).hexdigest()
-    
-    def _get_cache_path(self, cache_type: str, key: str) -> str:
-        """Get the file path for a cache entry"""
-        if cache_type == 'tasks':
-            return os.path.join(self.tasks_cache_dir, f"{key}.json")
-        elif cache_type == 'users':
-            return os.path.join(self.user_cache_dir, f"{key}.json")
-        else:
-            raise ValueError(f"Unknown cache type: {cache_type}")
-    
-    def _is_cache_valid(self, cache_path: str, max_age_hours: int = 24) -> bool:
-        """Check if cache file exists and is not expired"""
-        if not os.path.exists(cache_path):
-            return False
-        
-        file_time = datetime.fromtimestamp(os.path.getmtime(cache_path))
-        expiry_time = file_time + timedelta(hours=max_age_hours)
-        
-        return datetime.now() < expiry_time
-    
+
+    def _get_content_key(self, text: str) -> str:
+        """Generate a cache key from normalized text so re-exported worksheets share entries"""
+        return content_hash(text)
+
+    def task_cache_key(self, text: str, num_tasks: int = 5) -> str:
+        """Key under which tasks generated for this text are cached"""
+        return f"{self._get_content_key(text)}_{num_tasks}"
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Look up a value, back-filling faster tiers on a lower-tier hit"""
+        for index, tier in enumerate(self.tiers):
+            try:
+                entry = tier.get(namespace, key)
+            except Exception as e:
+                logger.error(f"Error reading {tier.name} cache: {e}")
+                continue
+
+            if entry is not None:
+                value, expires_at = entry
+                for upper_tier in self.tiers[:index]:
+                    try:
+                        upper_tier.set(namespace, key, value, expires_at)
+                    except Exception as e:
+                        logger.error(f"Error back-filling {upper_tier.name} cache: {e}")
+                with self._stats_lock:
+                    self.hits += 1
+                return value
+
+        with self._stats_lock:
+            self.misses += 1
+        return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Store a value in every tier"""
+        expires_at = time.time() + (ttl or self.TTLS.get(namespace, self.DEFAULT_TTL))
+        stored = False
+        for tier in self.tiers:
+            try:
+                tier.set(namespace, key, value, expires_at)
+                stored = True
+            except Exception as e:
+                logger.error(f"Error writing {tier.name} cache: {e}")
+        return stored
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove a value from every tier"""
+        for tier in self.tiers:
+            try:
+                tier.delete(namespace, key)
+            except Exception as e:
+                logger.error(f"Error deleting from {tier.name} cache: {e}")
+
     def get_cached_tasks(self, text: str, num_tasks: int = 5) -> Optional[List[Dict[str, Any]]]:
         """Get cached tasks for given text content"""
-        try:
-            cache_key = f"{self._get_cache_key(text)}_{num_tasks}"
-            cache_path = self._get_cache_path('tasks', cache_key)
-            
-            if self._is_cache_valid(cache_path, max_age_hours=24):
-                with open(cache_path, 'r') as f:
-                    data = json.load(f)
-                    logger.info(f"Retrieved {len(data['tasks'])} tasks from cache")
-                    return data['tasks']
-            
-        except Exception as e:
-            logger.error(f"Error reading task cache: {e}")
-        
+        data = self.get('tasks', self.task_cache_key(text, num_tasks))
+        if data:
+            logger.info(f"Retrieved {len(data['tasks'])} tasks from cache")
+            return data['tasks']
         return None
-    
+
     def cache_tasks(self, text: str, tasks: List[Dict[str, Any]], num_tasks: int = 5) -> bool:
         """Cache generated tasks for given text content"""
-        try:
-            cache_key = f"{self._get_cache_key(text)}_{num_tasks}"
-            cache_path = self._get_cache_path('tasks', cache_key)
-            
-            cache_data = {
-                'text_hash': self._get_cache_key(text),
-                'num_tasks': num_tasks,
-                'tasks': tasks,
-                'cached_at': datetime.now().isoformat(),
-                'text_preview': text[:100] + '...' if len(text) > 100 else text
-            }
-            
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f, indent=2)
-            
+        text_hash = self._get_content_key(text)
+        cache_key = f"{text_hash}_{num_tasks}"
+        cache_data = {
+            'text_hash': text_hash,
+            'num_tasks': num_tasks,
+            'tasks': tasks,
+            'cached_at': datetime.now().isoformat(),
+            'text_preview': text[:100] + '...' if len(text) > 100 else text
+        }
+
+        if self.set('tasks', cache_key, cache_data):
             logger.info(f"Cached {len(tasks)} tasks")
             return True
-            
-        except Exception as e:
-            logger.error(f"Error caching tasks: {e}")
-            return False
-    
+        return False
+
+    def get_cached_text(self, file_hash: str, file_type: str, version: int = 1) -> Optional[str]:
+        """Get extracted text for a file, keyed by the SHA-256 of its bytes"""
+        text = self.get('extracted_text', f"{file_hash}_{file_type}_v{version}")
+        if text is not None:
+            logger.info(f"Retrieved extracted text for {file_hash[:12]} from cache")
+        return text
+
+    def cache_text(self, file_hash: str, file_type: str, text: str, version: int = 1) -> bool:
+        """Cache extracted text for a file, keyed by the SHA-256 of its bytes"""
+        return self.set('extracted_text', f"{file_hash}_{file_type}_v{version}", text)
+
     def get_cached_user_data(self, email: str) -> Optional[Dict[str, Any]]:
-        """Get cached user data for given email"""
-        try:
-            cache_key = self._get_cache_key(email.lower())
-            cache_path = self._get_cache_path('users', cache_key)
-            
-            if self._is_cache_valid(cache_path, max_age_hours=1):  # Shorter cache for user data
-                with open(cache_path, 'r') as f:
-                    data = json.load(f)
-                    logger.debug(f"Retrieved user data from cache for {email}")
-                    return data
-            
-        except Exception as e:
-            logger.error(f"Error reading user cache: {e}")
-        
+        """Get cached user data for given email (matched exactly, as users and verifications are)"""
+        data = self.get('users', self._get_cache_key(email))
+        if data:
+            logger.debug(f"Retrieved user data from cache for {email}")
+            return data
         return None
-    
-    def cache_user_data(self, email: str, user_data: Dict[str, Any]) -> bool:
+
+    def cache_user_data(self, email: str, user_data: Dict[str, Any], ttl: Optional[int] = None) -> bool:
         """Cache user data for given email"""
-        try:
-            cache_key = self._get_cache_key(email.lower())
-            cache_path = self._get_cache_path('users', cache_key)
-            
-            cache_data = {
-                'email': email,
-                'data': user_data,
-                'cached_at': datetime.now().isoformat()
-            }
-            
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f, indent=2)
-            
+        cache_data = {
+            'email': email,
+            'data': user_data,
+            'cached_at': datetime.now().isoformat()
+        }
+
+        if self.set('users', self._get_cache_key(email), cache_data, ttl):
             logger.debug(f"Cached user data for {email}")
             return True
-            
-        except Exception as e:
-            logger.error(f"Error caching user data: {e}")
-            return False
-    
+        return False
+
+    def invalidate_user_data(self, email: str) -> None:
+        """Drop cached user data for given email after the user's row changes"""
+        self.delete('users', self._get_cache_key(email))
+
     def clear_cache(self, cache_type: Optional[str] = None) -> bool:
-        """Clear cache files. If cache_type is None, clears all caches"""
+        """Clear cached entries. If cache_type is None, clears all caches"""
         try:
-            if cache_type == 'tasks' or cache_type is None:
-                for file in os.listdir(self.tasks_cache_dir):
-                    os.remove(os.path.join(self.tasks_cache_dir, file))
-                logger.info("Cleared task cache")
-            
-            if cache_type == 'users' or cache_type is None:
-                for file in os.listdir(self.user_cache_dir):
-                    os.remove(os.path.join(self.user_cache_dir, file))
-                logger.info("Cleared user cache")
-            
+            for tier in self.tiers:
+                tier.clear(cache_type)
+            logger.info(f"Cleared {cache_type or 'all'} cache")
             return True
-            
+
         except Exception as e:
             logger.error(f"Error clearing cache: {e}")
             return False
-    
+
     def get_cache_stats(self) -> Dict[str, Any]:
-        """Get cache statistics"""
+        """Get cache statistics, including per-tier hit/miss/eviction counters"""
         try:
-            tasks_count = len(os.listdir(self.tasks_cache_dir))
-            users_count = len(os.listdir(self.user_cache_dir))
-            
-            # Calculate total cache size
-            total_size = 0
-            for dir_path in [self.tasks_cache_dir, self.user_cache_dir]:
-                for file in os.listdir(dir_path):
-                    file_path = os.path.join(dir_path, file)
-                    total_size += os.path.getsize(file_path)
-            
+            tiers = {tier.name: tier.stats() for tier in self.tiers}
+            disk = self.tiers[1]
+
             return {
-                'tasks_cached': tasks_count,
-                'users_cached': users_count,
-                'total_size_mb': round(total_size / (1024 * 1024), 2),
+                'tasks_cached': disk.count('tasks'),
+                'users_cached': disk.count('users'),
+                'texts_cached': disk.count('extracted_text'),
+                'task_payloads_cached': disk.count('task_payloads'),
+                'total_size_mb': tiers['disk']['size_mb'],
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': sum(t['evictions'] for t in tiers.values()),
+                'tiers': tiers,
                 'cache_dir': self.cache_dir
             }
-            
+
         except Exception as e:
             logger.error(f"Error getting cache stats: {e}")
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
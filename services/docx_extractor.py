@@ -0,0 +1,119 @@
+"""
+Streaming DOCX text extraction straight from word/document.xml, without the python-docx object model.
+"""
+import zipfile
+import logging
+from typing import Iterator, List
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC = '{http://schemas.openxmlformats.org/markup-compatibility/2006}'
+
+BODY = W + 'body'
+P = W + 'p'
+TBL = W + 'tbl'
+TR = W + 'tr'
+TC = W + 'tc'
+T = W + 't'
+TAB = W + 'tab'
+BR = W + 'br'
+CR = W + 'cr'
+FALLBACK = MC + 'Fallback'
+
+# Content controls and custom XML wrap paragraphs, tables, rows and cells without adding text
+WRAPPERS = {W + 'sdt', W + 'sdtContent', W + 'customXml', W + 'smartTag'}
+
+class DocxExtractor:
+    """Iterparses the main document part block by block, in document order
+
+    Each top-level paragraph or table is turned into text as soon as its end tag
+    is parsed and then dropped, so memory stays bounded by the largest single
+    block rather than the whole document, and tables are walked once per cell
+    instead of python-docx's per-row grid recomputation for merged cells.
+    """
+
+    DOCUMENT_PART = 'word/document.xml'
+
+    @staticmethod
+    def iter_blocks(stream) -> Iterator[str]:
+        """Yield the text of each top-level paragraph and table row of a DOCX stream"""
+        with zipfile.ZipFile(stream) as archive:
+            with archive.open(DocxExtractor.DOCUMENT_PART) as part:
+                context = etree.iterparse(part, events=('end',), tag=(P, TBL, W + 'sdt'),
+                                          resolve_entities=False, no_network=True)
+                for _, element in context:
+                    parent = element.getparent()
+                    if parent is None or parent.tag != BODY:
+                        continue
+
+                    yield from DocxExtractor._block_lines(element)
+
+                    # Free what has been processed so far
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del parent[0]
+
+    @staticmethod
+    def extract_text(stream) -> str:
+        """Text of a DOCX stream: one line per paragraph and per table row"""
+        return '\n'.join(DocxExtractor.iter_blocks(stream)).strip()
+
+    @staticmethod
+    def _block_lines(element) -> List[str]:
+        """Lines of a paragraph, table or content control"""
+        if element.tag == P:
+            return [DocxExtractor._paragraph_text(element)]
+        if element.tag == TBL:
+            return DocxExtractor._table_lines(element)
+
+        lines = []
+        for child in DocxExtractor._children(element, (P, TBL)):
+            lines.extend(DocxExtractor._block_lines(child))
+        return lines
+
+    @staticmethod
+    def _children(element, tags):
+        """Direct children with the given tags, looking through content-control wrappers"""
+        for child in element:
+            if child.tag in tags:
+                yield child
+            elif child.tag in WRAPPERS:
+                yield from DocxExtractor._children(child, tags)
+
+    @staticmethod
+    def _paragraph_text(paragraph) -> str:
+        """Run text of a paragraph, with tabs and breaks, as python-docx reports it"""
+        # Alternate content carries the same text box twice; keep only the preferred choice
+        for fallback in list(paragraph.iter(FALLBACK)):
+            fallback.getparent().remove(fallback)
+
+        parts = []
+        for node in paragraph.iter(T, TAB, BR, CR):
+            if node.tag == T:
+                parts.append(node.text or '')
+            elif node.tag == TAB:
+                parts.append('\t')
+            else:
+                parts.append('\n')
+        return ''.join(parts)
+
+    @staticmethod
+    def _table_lines(table) -> List[str]:
+        """One line per row with the cells separated by spaces; nested tables follow their row"""
+        lines = []
+        for row in DocxExtractor._children(table, (TR,)):
+            cells = []
+            nested = []
+            for cell in DocxExtractor._children(row, (TC,)):
+                paragraphs = []
+                for block in DocxExtractor._children(cell, (P, TBL)):
+                    if block.tag == P:
+                        paragraphs.append(DocxExtractor._paragraph_text(block))
+                    else:
+                        nested.extend(DocxExtractor._table_lines(block))
+                cells.append('\n'.join(paragraphs))
+            lines.append(' '.join(cells))
+            lines.extend(nested)
+        return lines
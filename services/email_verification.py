@@ -95,6 +95,22 @@ AI Worksheet Converter Team
             logger.error(f"Error sending verification email to {email}: {e}")
             return False
     
+    @staticmethod
+    def queue_verification_email(email, token):
+        """Hand a verification email to the job queue so SMTP never blocks a web worker"""
+        # Without SMTP credentials the email is only logged, so there is nothing to wait for
+        if not current_app.config.get('MAIL_USERNAME'):
+            return EmailVerificationService.send_verification_email(email, token)
+        
+        try:
+            from services.job_queue import JobQueue
+            JobQueue.enqueue('verification_email', user_email=email, payload={'email': email, 'token': token}, max_attempts=3)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error queueing verification email to {email}: {e}")
+            return False
+    
     @staticmethod
     def verify_email_token(token):
         """Verify an email token and return the email if valid"""
@@ -117,6 +133,9 @@ AI Worksheet Converter Team
             verification.verified = True
             db.session.commit()
             
+            from services.entitlements import EntitlementService
+            EntitlementService.invalidate(verification.email)
+            
             logger.info(f"Email verified successfully: {verification.email}")
             return verification.email, None
             
@@ -0,0 +1,103 @@
+"""
+Cached per-user entitlements (verification, plan, remaining quota) for the upload hot path.
+"""
+import os
+import logging
+from flask import g, has_request_context
+from sqlalchemy import select, exists, literal, true
+from models import User, EmailVerification, db
+from .cache_service import get_cache_service
+
+logger = logging.getLogger(__name__)
+
+class EntitlementService:
+    """Answers "may this email upload?" from a request memo, then the shared cache, then the database
+
+    Cached answers that allow something are trusted until they expire or are
+    invalidated; answers that deny something (not verified, quota used up) are
+    always re-read from the database first. A stale entry in another process can
+    therefore delay a limit by at most ENTITLEMENT_CACHE_TTL, never wrongly block
+    a user who just verified or upgraded.
+    """
+
+    CACHE_TTL = int(os.environ.get('ENTITLEMENT_CACHE_TTL', 60))
+
+    @staticmethod
+    def _memo():
+        """Entitlements already looked up during this request"""
+        if not has_request_context():
+            return None
+        if 'entitlements' not in g:
+            g.entitlements = {}
+        return g.entitlements
+
+    @staticmethod
+    def _load(email):
+        """Read an email's entitlement from the database in one query, without creating anything"""
+        user = select(User.id, User.subscription_status, User.worksheets_processed).where(User.email == email).subquery()
+        verified = exists().where(EmailVerification.email == email, EmailVerification.verified.is_(True))
+
+        # Outer join from a one-row select so an email without a user still returns its verified flag
+        row = db.session.execute(
+            select(user.c.id, user.c.subscription_status, user.c.worksheets_processed, verified.label('verified'))
+            .select_from(select(literal(1)).subquery().outerjoin(user, true()))
+        ).one()
+
+        premium = row.subscription_status == 'active'
+        used = row.worksheets_processed or 0
+        return {
+            'user_id': row.id,
+            'verified': bool(row.verified),
+            'plan': 'premium' if premium else 'free',
+            'worksheets_processed': used,
+            'remaining': None if premium else max(0, User.FREE_WORKSHEET_LIMIT - used)
+        }
+
+    @staticmethod
+    def get(email, fresh=False):
+        """Entitlement of an email: user_id, verified, plan, worksheets_processed and remaining (None = unlimited)"""
+        # Emails are stored and matched case-sensitively, so the exact string is the key
+        memo = EntitlementService._memo()
+        if not fresh and memo is not None and email in memo:
+            return memo[email]
+
+        cache_service = get_cache_service()
+        entitlement = None
+        if not fresh:
+            cached = cache_service.get_cached_user_data(email)
+            entitlement = cached['data'] if cached else None
+
+        if entitlement is None:
+            entitlement = EntitlementService._load(email)
+            cache_service.cache_user_data(email, entitlement, ttl=EntitlementService.CACHE_TTL)
+
+        if memo is not None:
+            memo[email] = entitlement
+        return entitlement
+
+    @staticmethod
+    def is_verified(email):
+        """Whether the email has been verified; a negative answer is confirmed against the database"""
+        if EntitlementService.get(email)['verified']:
+            return True
+        return EntitlementService.get(email, fresh=True)['verified']
+
+    @staticmethod
+    def can_process(email, count=1):
+        """Whether the email may convert `count` more worksheets; a refusal is confirmed against the database"""
+        def allowed(entitlement):
+            return entitlement['remaining'] is None or entitlement['remaining'] >= count
+
+        if allowed(EntitlementService.get(email)):
+            return True
+        return allowed(EntitlementService.get(email, fresh=True))
+
+    @staticmethod
+    def invalidate(email):
+        """Forget an email's entitlement after its user, plan, verification or usage changes"""
+        if not email:
+            return
+        memo = EntitlementService._memo()
+        if memo is not None:
+            memo.pop(email, None)
+        get_cache_service().invalidate_user_data(email)
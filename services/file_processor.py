@@ -1,17 +1,101 @@
+import io
 import os
+import mmap
+import hashlib
+import multiprocessing
 import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from werkzeug.utils import secure_filename
 import PyPDF2
 import docx
 from io import BytesIO
+from .text_normalizer import PAGE_BREAK
+from .docx_extractor import DocxExtractor
 
 logger = logging.getLogger(__name__)
 
+_pdf_pool = None
+_pdf_pool_pid = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool(max_workers):
+    """Process pool for PDF page extraction, shared by the whole process and recreated after fork"""
+    global _pdf_pool, _pdf_pool_pid
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool_pid != os.getpid():
+            # Forking a threaded web or worker process can copy a held lock into the child,
+            # so workers start from a clean forkserver (or spawned) interpreter instead
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pdf_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+            _pdf_pool_pid = os.getpid()
+        return _pdf_pool
+
+class _MappedStream(io.RawIOBase):
+    """Seekable file-like view of a memory map (mmap itself lacks seekable() before 3.13)"""
+
+    def __init__(self, mapped):
+        self._mapped = mapped
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self):
+        return self._mapped.tell()
+
+@contextmanager
+def _mapped_file(file_path):
+    """Read-only memory map of a saved file, so parsers page it in instead of copying it"""
+    if os.path.getsize(file_path) == 0:
+        raise ValueError("File is empty")
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield _MappedStream(mapped)
+
+def _as_stream(file_content):
+    """Parsers accept raw bytes or any seekable file-like object (e.g. a memory map)"""
+    if isinstance(file_content, (bytes, bytearray)):
+        return BytesIO(file_content)
+    file_content.seek(0)
+    return file_content
+
+def _extract_pdf_page_range(source, start, stop):
+    """Extract the text of pages [start, stop) in a pool worker; source is a file path or bytes"""
+    if isinstance(source, str):
+        with _mapped_file(source) as mapped:
+            return _extract_pdf_page_range(mapped, start, stop)
+    pdf_reader = PyPDF2.PdfReader(_as_stream(source))
+    return [pdf_reader.pages[page_num].extract_text() or "" for page_num in range(start, stop)]
+
 class FileProcessor:
     """Service for processing uploaded files and extracting text content"""
     
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'doc'}
     
+    # PDFs with fewer pages are parsed on the calling thread
+    PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 8))
+    PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+    
+    # Uploads are copied to disk in pieces of this size
+    UPLOAD_CHUNK_SIZE = 1024 * 1024
+    
+    # Bump when extraction output changes so texts cached by file hash are re-extracted
+    EXTRACTION_VERSION = 2
+    
     @staticmethod
     def is_allowed_file(filename):
         """Check if file extension is allowed"""
@@ -19,83 +103,136 @@ class FileProcessor:
                filename.rsplit('.', 1)[1].lower() in FileProcessor.ALLOWED_EXTENSIONS
     
     @staticmethod
-    def extract_text_from_pdf(file_content):
-        """Extract text from PDF file content"""
+    def iter_pdf_pages(file_content, file_path=None):
+        """Yield the text of each PDF page in order, parsing page ranges in parallel for large files
+
+        file_content is the PDF as bytes, or a stream over the file saved at file_path.
+        """
+        pdf_reader = PyPDF2.PdfReader(_as_stream(file_content))
+        page_count = len(pdf_reader.pages)
+        workers = min(FileProcessor.PDF_EXTRACT_WORKERS, page_count)
+        
+        if page_count < FileProcessor.PDF_PARALLEL_MIN_PAGES or workers <= 1:
+            for page in pdf_reader.pages:
+                yield page.extract_text() or ""
+            return
+        
+        # A few ranges per worker keeps cores busy when some pages are heavier than others
+        batch_size = max(1, -(-page_count // (workers * 2)))
+        pool = _get_pdf_pool(FileProcessor.PDF_EXTRACT_WORKERS)
+        # Workers map the saved file themselves rather than receiving a copy of its bytes
+        source = file_path or bytes(file_content)
+        futures = [
+            pool.submit(_extract_pdf_page_range, source, start, min(start + batch_size, page_count))
+            for start in range(0, page_count, batch_size)
+        ]
+        try:
+            # Ranges are consumed in order, so early pages are yielded while later ones are parsed
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    @staticmethod
+    def extract_text_from_pdf(file_content, file_path=None):
+        """Extract text from PDF file content, pages separated by form feeds"""
         try:
-            pdf_reader = PyPDF2.PdfReader(BytesIO(file_content))
-            text = ""
-            
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-            
-            return text.strip()
+            pages = FileProcessor.iter_pdf_pages(file_content, file_path=file_path)
+            return PAGE_BREAK.join(page.strip() for page in pages).strip()
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
     @staticmethod
     def extract_text_from_docx(file_content):
-        """Extract text from DOCX file content"""
+        """Extract text from DOCX file content, streaming document.xml in document order"""
+        try:
+            return DocxExtractor.extract_text(_as_stream(file_content))
+        except Exception as e:
+            # Unusual packages (e.g. a relocated main part) still open with python-docx
+            logger.warning(f"Streaming DOCX extraction failed, using python-docx: {str(e)}")
+        
         try:
-            doc = docx.Document(BytesIO(file_content))
-            text = ""
-            
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            
-            # Also extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        text += cell.text + " "
-                    text += "\n"
-            
-            return text.strip()
+            return FileProcessor.extract_text_from_docx_document(file_content)
         except Exception as e:
             logger.error(f"Error extracting text from DOCX: {str(e)}")
             raise Exception(f"Failed to extract text from DOCX: {str(e)}")
     
     @staticmethod
-    def process_file(file_obj, upload_folder):
-        """Process uploaded file and extract text"""
+    def extract_text_from_docx_document(file_content):
+        """Extract text from DOCX file content through the python-docx object model"""
+        doc = docx.Document(_as_stream(file_content))
+        lines = [paragraph.text for paragraph in doc.paragraphs]
+        
+        # Also extract text from tables
+        for table in doc.tables:
+            for row in table.rows:
+                lines.append(' '.join(cell.text for cell in row.cells))
+        
+        return '\n'.join(lines).strip()
+    
+    @staticmethod
+    def extract_text(file_content, file_extension, file_path=None):
+        """Extract text from file content (bytes or a file-like object) based on its extension"""
+        if file_extension == 'pdf':
+            return FileProcessor.extract_text_from_pdf(file_content, file_path=file_path)
+        elif file_extension in ['docx', 'doc']:
+            return FileProcessor.extract_text_from_docx(file_content)
+        else:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+    
+    @staticmethod
+    def extract_text_from_path(file_path, file_extension):
+        """Extract text from a file previously saved to disk, reading it through a memory map"""
+        with _mapped_file(file_path) as mapped:
+            return FileProcessor.extract_text(mapped, file_extension, file_path=file_path)
+    
+    @staticmethod
+    def file_sha256(file_path):
+        """SHA-256 of a saved file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(FileProcessor.UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def upload_name(filename):
+        """Secure an uploaded filename and check its type; returns (filename, file_type)"""
+        filename = secure_filename(filename or '')
+        if not filename:
+            raise ValueError("Invalid filename")
+        
+        if not FileProcessor.is_allowed_file(filename):
+            raise ValueError("File type not allowed")
+        
+        return filename, filename.rsplit('.', 1)[1].lower()
+    
+    @staticmethod
+    def stream_to_disk(stream, directory, chunk_size=None):
+        """Copy a stream to a new temp file in directory in fixed-size chunks, hashing it on the way
+        
+        Returns (temp_path, sha256, size); the caller moves the file to its final name,
+        so readers never see a partial file.
+        """
+        chunk_size = chunk_size or FileProcessor.UPLOAD_CHUNK_SIZE
+        digest = hashlib.sha256()
+        size = 0
+        
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
         try:
-            # Secure the filename
-            filename = secure_filename(file_obj.filename)
-            if not filename:
-                raise ValueError("Invalid filename")
-            
-            # Check if file is allowed
-            if not FileProcessor.is_allowed_file(filename):
-                raise ValueError("File type not allowed")
-            
-            # Read file content
-            file_content = file_obj.read()
-            file_obj.seek(0)  # Reset file pointer
-            
-            # Get file extension
-            file_extension = filename.rsplit('.', 1)[1].lower()
-            
-            # Extract text based on file type
-            if file_extension == 'pdf':
-                extracted_text = FileProcessor.extract_text_from_pdf(file_content)
-            elif file_extension in ['docx', 'doc']:
-                extracted_text = FileProcessor.extract_text_from_docx(file_content)
-            else:
-                raise ValueError(f"Unsupported file type: {file_extension}")
-            
-            # Save file to uploads folder
-            file_path = os.path.join(upload_folder, filename)
-            with open(file_path, 'wb') as f:
-                f.write(file_content)
-            
-            return {
-                'filename': filename,
-                'file_type': file_extension,
-                'extracted_text': extracted_text,
-                'file_path': file_path
-            }
-            
-        except Exception as e:
-            logger.error(f"Error processing file: {str(e)}")
-            raise Exception(f"File processing failed: {str(e)}")
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        
+        return temp_path, digest.hexdigest(), size
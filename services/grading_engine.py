@@ -0,0 +1,172 @@
+"""
+Answer checking against answer keys compiled once, when tasks are saved.
+"""
+import re
+import math
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[\w']+")
+_SPACES = re.compile(r'\s+')
+
+# Words that carry no meaning on their own when matching short-answer key points
+STOPWORDS = frozenset("""
+a an and are as at be been but by can do does for from has have how in into is it its of on or
+that the their them then there these they this to was were what when where which while who why
+will with would your you also more most other such than very
+""".split())
+
+class GradingEngine:
+    """Compiles task_data into normalized answer keys and grades answers against them
+
+    Keys are plain JSON so they can be stored on Task.answer_key and shipped in
+    offline bundles:
+      multiple_choice  {'correct': index}
+      fill_blank       {'answers': [normalized answers], 'case_sensitive': bool}
+      short_answer     {'points': [[keywords of each key point]], 'required': n, 'min_length': n}
+      drag_drop        {'matches': {normalized item: normalized target}}
+    """
+
+    KEY_VERSION = 1
+
+    # A short answer must be at least this long to be considered at all
+    SHORT_ANSWER_MIN_LENGTH = 10
+
+    @staticmethod
+    def normalize(value, case_sensitive=False) -> str:
+        """Canonical form of a typed answer: trimmed, single-spaced, without trailing punctuation"""
+        text = _SPACES.sub(' ', str(value)).strip().rstrip('.!?;:,').strip()
+        return text if case_sensitive else text.casefold()
+
+    @staticmethod
+    def keywords(text) -> list:
+        """Meaningful words of a phrase, lowercased and with a plural 's' removed"""
+        words = []
+        for word in _WORD.findall(str(text).casefold()):
+            if len(word) < 3 or word in STOPWORDS:
+                continue
+            if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+                word = word[:-1]
+            if word not in words:
+                words.append(word)
+        return words
+
+    @staticmethod
+    def compile(task_type: str, task_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Answer key for a task, or None if its type cannot be graded"""
+        data = task_data or {}
+        key = None
+
+        if task_type == 'multiple_choice':
+            key = {'correct': data.get('correct_answer')}
+
+        elif task_type == 'fill_blank':
+            case_sensitive = bool(data.get('case_sensitive', False))
+            answers = []
+            for answer in data.get('correct_answers') or []:
+                normalized = GradingEngine.normalize(answer, case_sensitive)
+                if normalized and normalized not in answers:
+                    answers.append(normalized)
+            key = {'answers': answers, 'case_sensitive': case_sensitive}
+
+        elif task_type == 'short_answer':
+            points = [words for words in map(GradingEngine.keywords, data.get('key_points') or []) if words]
+            key = {
+                'points': points,
+                'required': math.ceil(len(points) / 2),
+                'min_length': GradingEngine.SHORT_ANSWER_MIN_LENGTH
+            }
+
+        elif task_type == 'drag_drop':
+            key = {'matches': {
+                GradingEngine.normalize(item): GradingEngine.normalize(target)
+                for item, target in (data.get('correct_matches') or {}).items()
+            }}
+
+        if key is not None:
+            key['version'] = GradingEngine.KEY_VERSION
+        return key
+
+    @staticmethod
+    def key_for(task) -> Optional[Dict[str, Any]]:
+        """Stored answer key of a task, compiled on the fly for tasks saved before keys existed"""
+        key = task.answer_key
+        if key and key.get('version') == GradingEngine.KEY_VERSION:
+            return key
+        return GradingEngine.compile(task.task_type, task.task_data)
+
+    @staticmethod
+    def grade(task, answer) -> Dict[str, Any]:
+        """Grade one answer; returns is_correct, score (0-1), feedback and what the right answer was"""
+        key = GradingEngine.key_for(task)
+        data = task.task_data or {}
+        if key is None:
+            return {'is_correct': False, 'score': 0.0, 'feedback': 'This task type cannot be checked automatically.'}
+
+        grader = getattr(GradingEngine, f'_grade_{task.task_type}')
+        try:
+            result = grader(key, answer, data)
+        except (TypeError, ValueError, AttributeError):
+            result = {'is_correct': False, 'score': 0.0, 'feedback': 'Answer could not be read.'}
+        result['score'] = round(result['score'], 3)
+        return result
+
+    @staticmethod
+    def _grade_multiple_choice(key, answer, data):
+        if isinstance(answer, float) and not answer.is_integer():
+            raise ValueError("Not an option index")
+        is_correct = answer is not None and int(answer) == key['correct']
+        return {
+            'is_correct': is_correct,
+            'score': 1.0 if is_correct else 0.0,
+            'feedback': data.get('explanation', ''),
+            'correct_answer': key['correct']
+        }
+
+    @staticmethod
+    def _grade_fill_blank(key, answer, data):
+        is_correct = answer is not None and GradingEngine.normalize(answer, key['case_sensitive']) in key['answers']
+        return {
+            'is_correct': is_correct,
+            'score': 1.0 if is_correct else 0.0,
+            'feedback': data.get('explanation', ''),
+            'correct_answers': data.get('correct_answers', [])
+        }
+
+    @staticmethod
+    def _grade_short_answer(key, answer, data):
+        text = str(answer or '').strip()
+        if len(text) < key['min_length']:
+            return {'is_correct': False, 'score': 0.0, 'feedback': 'Please provide a more detailed answer.',
+                    'sample_answer': data.get('sample_answer')}
+
+        # A key point counts as covered when at least half of its keywords appear in the answer
+        words = set(GradingEngine.keywords(text))
+        covered = sum(1 for point in key['points'] if len(words.intersection(point)) * 2 >= len(point))
+        total = len(key['points'])
+        if total == 0:
+            return {'is_correct': True, 'score': 1.0, 'feedback': 'Good answer! Remember to check with your teacher.',
+                    'sample_answer': data.get('sample_answer')}
+
+        is_correct = covered >= key['required']
+        return {
+            'is_correct': is_correct,
+            'score': covered / total,
+            'feedback': f"Your answer covers {covered} of {total} key points.",
+            'sample_answer': data.get('sample_answer')
+        }
+
+    @staticmethod
+    def _grade_drag_drop(key, answer, data):
+        given = {GradingEngine.normalize(item): GradingEngine.normalize(target) for item, target in (answer or {}).items()}
+        total = len(key['matches'])
+        correct = sum(1 for item, target in key['matches'].items() if given.get(item) == target)
+        is_correct = total > 0 and correct == total
+        return {
+            'is_correct': is_correct,
+            'score': correct / total if total else 0.0,
+            'feedback': 'Perfect! All matches are correct.' if is_correct else f"{correct} out of {total} matches are correct.",
+            'correct_matches': data.get('correct_matches', {})
+        }
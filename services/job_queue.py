@@ -0,0 +1,485 @@
+"""
+Database-backed job queue so uploads return immediately while workers generate tasks.
+"""
+import os
+import time
+import asyncio
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from models import ProcessingJob, db
+from .task_converter import TaskConverter
+from .quota_service import QuotaService
+
+logger = logging.getLogger(__name__)
+
+def run_in_app_context(app, func, *args):
+    """Call func inside a fresh application context with its own database session"""
+    with app.app_context():
+        try:
+            return func(*args)
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+class JobQueue:
+    """Persistent job queue stored in the processing_job table"""
+
+    # Handlers keyed by job kind; each receives the claimed job and returns a result dict
+    HANDLERS = {}
+
+    # Coroutine handlers used by AsyncJobWorker; each receives (app, worksheet_id, payload)
+    ASYNC_HANDLERS = {}
+
+    # Wakes up in-process workers as soon as a job is enqueued
+    _wakeup = threading.Event()
+
+    @staticmethod
+    def register_handler(kind):
+        """Decorator registering the function that processes jobs of the given kind"""
+        def decorator(func):
+            JobQueue.HANDLERS[kind] = func
+            return func
+        return decorator
+
+    @staticmethod
+    def register_async_handler(kind):
+        """Decorator registering the coroutine AsyncJobWorker awaits for jobs of the given kind"""
+        def decorator(func):
+            JobQueue.ASYNC_HANDLERS[kind] = func
+            return func
+        return decorator
+
+    @staticmethod
+    def enqueue(kind, worksheet_id=None, user_email=None, payload=None, max_attempts=2):
+        """Add a new pending job and return it, committing it with anything else pending in the session"""
+        try:
+            job = ProcessingJob(
+                kind=kind,
+                worksheet_id=worksheet_id,
+                user_email=user_email,
+                status='pending',
+                payload=payload or {},
+                max_attempts=max_attempts
+            )
+            db.session.add(job)
+            db.session.flush()
+            job_id = job.id
+            db.session.commit()
+
+            JobQueue._wakeup.set()
+            logger.info(f"Enqueued {kind} job {job_id} (worksheet {worksheet_id})")
+            return job
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error enqueuing job: {str(e)}")
+            raise Exception(f"Failed to enqueue job: {str(e)}")
+
+    @staticmethod
+    def get_job(job_id):
+        """Get a job by id"""
+        return ProcessingJob.query.get(job_id)
+
+    @staticmethod
+    def claim_next():
+        """Atomically claim the oldest pending job, or return None if the queue is empty"""
+        token = uuid.uuid4().hex
+        now = datetime.utcnow()
+
+        next_id = (
+            select(ProcessingJob.id)
+            .where(ProcessingJob.status == 'pending')
+            .order_by(ProcessingJob.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+
+        # The status check in the WHERE clause makes the claim a compare-and-set,
+        # so two workers racing for the same row cannot both win it.
+        result = db.session.execute(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == next_id, ProcessingJob.status == 'pending')
+            .values(
+                status='processing',
+                claim_token=token,
+                locked_at=now,
+                attempts=ProcessingJob.attempts + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        if result.rowcount == 0:
+            return None
+
+        return ProcessingJob.query.filter_by(claim_token=token).first()
+
+    @staticmethod
+    def _update_claimed(job_id, claim_token, values, conditions=()):
+        """Update a job only while the given claim still holds it; returns whether a row matched"""
+        result = db.session.execute(
+            update(ProcessingJob)
+            .where(
+                ProcessingJob.id == job_id,
+                ProcessingJob.claim_token == claim_token,
+                ProcessingJob.status == 'processing',
+                *conditions
+            )
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    @staticmethod
+    def renew_lease(job_id, claim_token):
+        """Push back the lease of a running job in the caller's transaction; False once the claim is lost"""
+        return JobQueue._update_claimed(job_id, claim_token, {'locked_at': datetime.utcnow()})
+
+    @staticmethod
+    def heartbeat(job_id, claim_token):
+        """Renew and commit a lease from a heartbeat thread"""
+        renewed = JobQueue.renew_lease(job_id, claim_token)
+        db.session.commit()
+        return renewed
+
+    @staticmethod
+    def mark_completed(job, claim_token, result=None):
+        """Mark a claimed job as completed, dropping the result if the claim was lost"""
+        completed = JobQueue._update_claimed(job.id, claim_token, {
+            'status': 'completed',
+            'result': result,
+            'error_message': None,
+            'finished_at': datetime.utcnow()
+        })
+        db.session.commit()
+
+        if not completed:
+            logger.warning(f"Job {job.id} lost its claim before completing, dropping the result")
+            return False
+
+        logger.info(f"Job {job.id} completed")
+        return True
+
+    @staticmethod
+    def mark_failed(job, claim_token, error, stale_before=None):
+        """Record a job failure, re-queueing it while attempts remain; does nothing if the claim was lost"""
+        db.session.rollback()
+
+        will_retry = (job.attempts or 0) < (job.max_attempts or 1)
+        status = 'pending' if will_retry else 'failed'
+        conditions = [] if stale_before is None else [ProcessingJob.locked_at < stale_before]
+        failed = JobQueue._update_claimed(job.id, claim_token, {
+            'status': status,
+            'error_message': error,
+            'claim_token': None,
+            'finished_at': None if will_retry else datetime.utcnow()
+        }, conditions)
+        if not failed:
+            db.session.rollback()
+            logger.warning(f"Job {job.id} lost its claim before failing, dropping the error: {error}")
+            return False
+
+        if not will_retry:
+            # Nothing was converted, so the worksheets reserved at upload go back to the user
+            QuotaService.settle_job(job)
+        db.session.commit()
+
+        if job.worksheet_id:
+            TaskConverter.update_worksheet_status(job.worksheet_id, status)
+
+        if will_retry:
+            logger.warning(f"Job {job.id} failed (attempt {job.attempts}), retrying: {error}")
+            JobQueue._wakeup.set()
+        else:
+            logger.error(f"Job {job.id} failed permanently: {error}")
+        return True
+
+    @staticmethod
+    def requeue_stale_jobs(lease_seconds):
+        """Return jobs whose worker died mid-processing to the queue"""
+        cutoff = datetime.utcnow() - timedelta(seconds=lease_seconds)
+
+        stale_jobs = ProcessingJob.query.filter(
+            ProcessingJob.status == 'processing',
+            ProcessingJob.locked_at < cutoff
+        ).all()
+
+        # A lease renewed since the query is no longer stale, so the update re-checks the cutoff
+        return sum(
+            1 for job in stale_jobs
+            if JobQueue.mark_failed(job, job.claim_token, 'Worker lease expired', stale_before=cutoff)
+        )
+
+    @staticmethod
+    def run_job(job):
+        """Run the handler for a claimed job and record the outcome"""
+        # Read before the handler runs: once its commits expire the job, a reload
+        # would return the token of whichever worker holds the job by then
+        claim_token = job.claim_token
+
+        handler = JobQueue.HANDLERS.get(job.kind)
+        if handler is None:
+            job.max_attempts = job.attempts
+            JobQueue.mark_failed(job, claim_token, f"No handler registered for job kind '{job.kind}'")
+            return
+
+        try:
+            result = handler(job)
+            JobQueue.mark_completed(job, claim_token, result)
+        except Exception as e:
+            logger.error(f"Error running job {job.id}: {str(e)}")
+            JobQueue.mark_failed(job, claim_token, str(e))
+
+
+class LeaseHeartbeat:
+    """Renews a running job's lease from a background thread so requeue_stale_jobs leaves it alone"""
+
+    def __init__(self, app, job_id, claim_token, interval):
+        self.app = app
+        self.job_id = job_id
+        self.claim_token = claim_token
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"lease-{job_id}", daemon=True)
+
+    def _beat(self):
+        """Renew the lease every interval until stopped or the claim is lost"""
+        while not self._stop.wait(self.interval):
+            try:
+                if not run_in_app_context(self.app, JobQueue.heartbeat, self.job_id, self.claim_token):
+                    logger.warning(f"Job {self.job_id} lost its claim, stopping lease renewal")
+                    return
+            except Exception as e:
+                logger.error(f"Error renewing lease of job {self.job_id}: {str(e)}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+@JobQueue.register_handler('worksheet')
+def process_worksheet_job(job):
+    """Generate tasks for an uploaded worksheet"""
+    from .worksheet_pipeline import WorksheetPipeline
+
+    payload = job.payload or {}
+    return WorksheetPipeline.process_worksheet(
+        job.worksheet_id,
+        num_tasks=payload.get('num_tasks', 15)
+    )
+
+
+@JobQueue.register_async_handler('worksheet')
+async def aprocess_worksheet_job(app, worksheet_id, payload):
+    """Generate tasks for an uploaded worksheet without holding a thread during the API call"""
+    from .worksheet_pipeline import WorksheetPipeline
+
+    return await WorksheetPipeline.aprocess_worksheet(
+        app,
+        worksheet_id,
+        num_tasks=payload.get('num_tasks', 15)
+    )
+
+
+@JobQueue.register_handler('batch')
+def process_batch_job(job):
+    """Convert every file of a batch upload"""
+    from .batch_pipeline import BatchPipeline
+
+    return BatchPipeline.process_batch(job)
+
+
+@JobQueue.register_handler('verification_email')
+def send_verification_email_job(job):
+    """Send a verification email; failures are retried by the queue"""
+    from .email_verification import EmailVerificationService
+
+    payload = job.payload or {}
+    if not EmailVerificationService.send_verification_email(payload['email'], payload['token']):
+        raise Exception(f"Failed to send verification email to {payload['email']}")
+    return {'email': payload['email']}
+
+
+class JobWorker:
+    """Polls the job queue and runs jobs inside an application context"""
+
+    def __init__(self, app, name=None):
+        self.app = app
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', 1.0)
+        self.lease_seconds = app.config.get('JOB_LEASE_SECONDS', 600)
+        self._last_stale_check = 0
+
+    def run_once(self):
+        """Claim and run a single job; returns False when the queue was empty"""
+        with self.app.app_context():
+            try:
+                if time.monotonic() - self._last_stale_check > self.lease_seconds / 2:
+                    self._last_stale_check = time.monotonic()
+                    JobQueue.requeue_stale_jobs(self.lease_seconds)
+
+                job = JobQueue.claim_next()
+                if job is None:
+                    return False
+
+                logger.info(f"Worker {self.name} running job {job.id} ({job.kind})")
+                with LeaseHeartbeat(self.app, job.id, job.claim_token, self.lease_seconds / 3):
+                    JobQueue.run_job(job)
+                return True
+
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Worker {self.name} error: {str(e)}")
+                return False
+            finally:
+                db.session.remove()
+
+    def run_forever(self, stop_event=None):
+        """Process jobs until the stop event is set"""
+        logger.info(f"Job worker {self.name} started")
+        stop_event = stop_event or threading.Event()
+
+        while not stop_event.is_set():
+            if not self.run_once():
+                JobQueue._wakeup.wait(self.poll_interval)
+                JobQueue._wakeup.clear()
+
+        logger.info(f"Job worker {self.name} stopped")
+
+
+class AsyncJobWorker:
+    """Runs many jobs at once on one event loop so a single process keeps hundreds of LLM requests open
+
+    Jobs with an async handler await the OpenAI API without holding a thread; the
+    database work around them, and jobs of kinds without an async handler, run in
+    the loop's default thread pool.
+    """
+
+    def __init__(self, app, concurrency=None, name=None):
+        self.app = app
+        self.concurrency = concurrency or app.config.get('JOB_ASYNC_CONCURRENCY', 100)
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-async"
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', 1.0)
+        self.lease_seconds = app.config.get('JOB_LEASE_SECONDS', 600)
+        self._last_stale_check = 0
+
+    def _claim(self):
+        """Claim the next job, returning (id, claim_token, kind, worksheet_id, payload) so nothing ORM-bound leaves the thread"""
+        if time.monotonic() - self._last_stale_check > self.lease_seconds / 2:
+            self._last_stale_check = time.monotonic()
+            JobQueue.requeue_stale_jobs(self.lease_seconds)
+
+        job = JobQueue.claim_next()
+        if job is None:
+            return None
+        return job.id, job.claim_token, job.kind, job.worksheet_id, dict(job.payload or {})
+
+    @staticmethod
+    def _run_sync(job_id, claim_token):
+        """Run a job of a kind without an async handler"""
+        job = JobQueue.get_job(job_id)
+        if job.claim_token != claim_token:
+            logger.warning(f"Job {job_id} lost its claim before it started")
+            return
+        JobQueue.run_job(job)
+
+    @staticmethod
+    def _finish(job_id, claim_token, result, error):
+        """Record the outcome of an async handler"""
+        job = JobQueue.get_job(job_id)
+        if error is None:
+            JobQueue.mark_completed(job, claim_token, result)
+        else:
+            JobQueue.mark_failed(job, claim_token, error)
+
+    async def _heartbeat(self, job_id, claim_token):
+        """Renew a running job's lease until cancelled or the claim is lost"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(run_in_app_context, self.app, JobQueue.heartbeat, job_id, claim_token)
+            except Exception as e:
+                logger.error(f"Error renewing lease of job {job_id}: {str(e)}")
+                continue
+            if not renewed:
+                logger.warning(f"Job {job_id} lost its claim, stopping lease renewal")
+                return
+
+    async def _run(self, claimed, slots):
+        """Run one claimed job and free its slot"""
+        job_id, claim_token, kind, worksheet_id, payload = claimed
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, claim_token))
+        try:
+            logger.info(f"Worker {self.name} running job {job_id} ({kind})")
+            handler = JobQueue.ASYNC_HANDLERS.get(kind)
+            if handler is None:
+                await asyncio.to_thread(run_in_app_context, self.app, self._run_sync, job_id, claim_token)
+                return
+
+            try:
+                result, error = await handler(self.app, worksheet_id, payload), None
+            except Exception as e:
+                logger.error(f"Error running job {job_id}: {str(e)}")
+                result, error = None, str(e)
+
+            await asyncio.to_thread(run_in_app_context, self.app, self._finish, job_id, claim_token, result, error)
+
+        except Exception as e:
+            logger.error(f"Worker {self.name} error: {str(e)}")
+        finally:
+            heartbeat.cancel()
+            slots.release()
+
+    async def _run_forever(self, stop_event):
+        """Claim jobs while slots are free until the stop event is set, then let running jobs finish"""
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+
+        while not stop_event.is_set():
+            await slots.acquire()
+            try:
+                claimed = await asyncio.to_thread(run_in_app_context, self.app, self._claim)
+            except Exception as e:
+                logger.error(f"Worker {self.name} error: {str(e)}")
+                claimed = None
+
+            if claimed is None:
+                slots.release()
+                await asyncio.to_thread(JobQueue._wakeup.wait, self.poll_interval)
+                JobQueue._wakeup.clear()
+                continue
+
+            task = asyncio.create_task(self._run(claimed, slots))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    def run_forever(self, stop_event=None):
+        """Process jobs until the stop event is set"""
+        logger.info(f"Async job worker {self.name} started ({self.concurrency} concurrent jobs)")
+        asyncio.run(self._run_forever(stop_event or threading.Event()))
+        logger.info(f"Async job worker {self.name} stopped")
+
+
+def start_embedded_workers(app, count):
+    """Start background worker threads inside the web process"""
+    threads = []
+    for i in range(count):
+        worker = JobWorker(app, name=f"embedded-{os.getpid()}-{i}")
+        thread = threading.Thread(target=worker.run_forever, name=worker.name, daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
@@ -0,0 +1,149 @@
+"""
+MinHash/LSH index over worksheet text for finding near-duplicate uploads.
+"""
+import os
+import re
+import array
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Tuple, Optional, Iterable
+from .text_normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+def get_near_duplicate_index():
+    """Get the near-duplicate index shared by the whole process"""
+    global _shared_index
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                cache_dir = os.environ.get('CACHE_DIR', 'cache')
+                _shared_index = MinHashLSHIndex(os.path.join(cache_dir, 'near_duplicates.db'))
+    return _shared_index
+
+class MinHashLSHIndex:
+    """Persistent MinHash signatures with banded LSH buckets in a SQLite file
+
+    Documents whose estimated Jaccard similarity (over word 5-gram shingles of the
+    normalized text) is high are very likely to share at least one band bucket,
+    so a query only compares signatures of the few documents in matching buckets.
+    """
+
+    def __init__(self, path: str, num_perm: int = 128, bands: int = 32, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._local = threading.local()
+
+        # Fixed seed: signatures must stay comparable across processes and restarts
+        rng = random.Random(20240706)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS signatures (doc_id INTEGER PRIMARY KEY, signature BLOB NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (band INTEGER NOT NULL, bucket TEXT NOT NULL, doc_id INTEGER NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_buckets_band_bucket ON buckets (band, bucket)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_buckets_doc ON buckets (doc_id)")
+        conn.commit()
+
+    def _connection(self):
+        """One connection per thread, reopened after fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _shingles(self, text: str) -> set:
+        """Hashes of overlapping word n-grams of the normalized text"""
+        words = re.findall(r'\w+', normalize_text(text).lower())
+        if len(words) < self.shingle_size:
+            grams = [' '.join(words)] if words else []
+        else:
+            grams = (' '.join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1))
+        return {
+            int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=4).digest(), 'little')
+            for gram in grams
+        }
+
+    def signature(self, text: str) -> List[int]:
+        """MinHash signature of a text"""
+        shingles = self._shingles(text)
+        if not shingles:
+            return [_MAX_HASH] * self.num_perm
+        return [
+            min((a * x + b) % _MERSENNE_PRIME for x in shingles) & _MAX_HASH
+            for a, b in self._perms
+        ]
+
+    def _band_buckets(self, signature: List[int]) -> Iterable[Tuple[int, str]]:
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            yield band, hashlib.blake2b(array.array('I', rows).tobytes(), digest_size=8).hexdigest()
+
+    @staticmethod
+    def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+    def insert(self, doc_id: int, text: str, signature: Optional[List[int]] = None) -> None:
+        """Add or replace a document in the index"""
+        signature = signature or self.signature(text)
+        conn = self._connection()
+        conn.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+        conn.execute("INSERT OR REPLACE INTO signatures (doc_id, signature) VALUES (?, ?)",
+                     (doc_id, array.array('I', signature).tobytes()))
+        conn.executemany("INSERT INTO buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+                         [(band, bucket, doc_id) for band, bucket in self._band_buckets(signature)])
+        conn.commit()
+
+    def remove(self, doc_id: int) -> None:
+        """Remove a document from the index"""
+        conn = self._connection()
+        conn.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+        conn.execute("DELETE FROM signatures WHERE doc_id = ?", (doc_id,))
+        conn.commit()
+
+    def query(self, text: str, threshold: float = 0.8, exclude: Optional[int] = None,
+              signature: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """Documents with estimated similarity >= threshold, most similar first"""
+        signature = signature or self.signature(text)
+        conn = self._connection()
+
+        candidates = set()
+        for band, bucket in self._band_buckets(signature):
+            rows = conn.execute("SELECT doc_id FROM buckets WHERE band = ? AND bucket = ?", (band, bucket))
+            candidates.update(row[0] for row in rows)
+        candidates.discard(exclude)
+
+        matches = []
+        for doc_id in candidates:
+            row = conn.execute("SELECT signature FROM signatures WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            score = self.similarity(signature, array.array('I', row[0]).tolist())
+            if score >= threshold:
+                matches.append((doc_id, score))
+
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
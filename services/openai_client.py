@@ -0,0 +1,148 @@
+"""
+Process-wide OpenAI client registry with pooled connections and retry with backoff.
+"""
+import os
+import time
+import asyncio
+import random
+import logging
+import threading
+import httpx
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _client_settings():
+    """Read client settings from the environment"""
+    return {
+        'api_key': os.environ.get("OPENAI_API_KEY", "your-openai-api-key-here"),
+        'base_url': os.environ.get("OPENAI_BASE_URL") or None,
+        'timeout': float(os.environ.get("OPENAI_TIMEOUT", 120)),
+        'connect_timeout': float(os.environ.get("OPENAI_CONNECT_TIMEOUT", 10)),
+        'max_connections': int(os.environ.get("OPENAI_MAX_CONNECTIONS", 20)),
+        'keepalive_expiry': float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", 60)),
+        'async_max_connections': int(os.environ.get("OPENAI_ASYNC_MAX_CONNECTIONS", 200)),
+    }
+
+def get_openai_client():
+    """Get the shared OpenAI client for this process, creating it on first use"""
+    settings = _client_settings()
+    # Keyed by pid so forked workers never share a connection pool with their parent
+    key = (os.getpid(), settings['api_key'], settings['base_url'])
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(settings['timeout'], connect=settings['connect_timeout']),
+                limits=httpx.Limits(
+                    max_connections=settings['max_connections'],
+                    max_keepalive_connections=settings['max_connections'],
+                    keepalive_expiry=settings['keepalive_expiry']
+                )
+            )
+            # Retries are handled by create_chat_completion so backoff is configurable
+            client = OpenAI(
+                api_key=settings['api_key'],
+                base_url=settings['base_url'],
+                http_client=http_client,
+                max_retries=0
+            )
+            _clients[key] = client
+            logger.info(f"Created shared OpenAI client (base_url={settings['base_url'] or 'default'})")
+
+    return client
+
+def get_async_openai_client():
+    """Get the AsyncOpenAI client of the running event loop, creating it on first use"""
+    settings = _client_settings()
+    # An async connection pool belongs to the loop that created it
+    key = (os.getpid(), id(asyncio.get_running_loop()), settings['api_key'], settings['base_url'])
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings['timeout'], connect=settings['connect_timeout']),
+                limits=httpx.Limits(
+                    max_connections=settings['async_max_connections'],
+                    max_keepalive_connections=settings['async_max_connections'],
+                    keepalive_expiry=settings['keepalive_expiry']
+                )
+            )
+            client = AsyncOpenAI(
+                api_key=settings['api_key'],
+                base_url=settings['base_url'],
+                http_client=http_client,
+                max_retries=0
+            )
+            _clients[key] = client
+            logger.info(f"Created async OpenAI client (base_url={settings['base_url'] or 'default'})")
+
+    return client
+
+def _is_retryable(error):
+    """Rate limits, server errors and connection failures are worth retrying"""
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+def _retry_delay(error, attempt):
+    """Exponential backoff with jitter, honouring Retry-After when the API sends one"""
+    base = float(os.environ.get("OPENAI_BACKOFF_BASE", 1.0))
+    cap = float(os.environ.get("OPENAI_BACKOFF_MAX", 30.0))
+
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), cap)
+        except ValueError:
+            pass
+
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+def create_chat_completion(client, **kwargs):
+    """Create a chat completion, retrying 429/5xx and connection errors with backoff"""
+    max_retries = int(os.environ.get("OPENAI_MAX_RETRIES", 3))
+
+    attempt = 0
+    while True:
+        try:
+            return client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            attempt += 1
+            logger.warning(f"OpenAI request failed ({e.__class__.__name__}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+async def acreate_chat_completion(client, **kwargs):
+    """Async create_chat_completion: same retries and backoff, without holding a thread while waiting"""
+    max_retries = int(os.environ.get("OPENAI_MAX_RETRIES", 3))
+
+    attempt = 0
+    while True:
+        try:
+            return await client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            attempt += 1
+            logger.warning(f"OpenAI request failed ({e.__class__.__name__}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,68 @@
+"""
+Free-tier quota enforced with single conditional UPDATEs instead of read-modify-write.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import update, or_, func
+from models import User, db
+from .entitlements import EntitlementService
+
+logger = logging.getLogger(__name__)
+
+class QuotaService:
+    """Reserves worksheet slots when a job is queued and gives them back if the job fails for good
+
+    User.worksheets_processed counts reserved plus completed worksheets. The limit
+    check and the increment are one statement, so parallel uploads for the same
+    email cannot both take the last slot, and the row is only locked for the
+    duration of that statement rather than across generation.
+    """
+
+    @staticmethod
+    def reserve(email, count=1):
+        """Take `count` slots of the user's quota (not committed); returns the new usage, or None if refused"""
+        used = func.coalesce(User.worksheets_processed, 0)
+        statement = (
+            update(User)
+            .where(User.email == email, or_(
+                User.subscription_status == 'active',
+                used + count <= User.FREE_WORKSHEET_LIMIT
+            ))
+            .values(worksheets_processed=used + count, last_active=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+        if db.engine.dialect.update_returning:
+            usage = db.session.execute(statement.returning(User.worksheets_processed)).scalar()
+        else:
+            result = db.session.execute(statement)
+            usage = db.session.query(User.worksheets_processed).filter_by(email=email).scalar() if result.rowcount else None
+
+        EntitlementService.invalidate(email)
+        if usage is None:
+            logger.info(f"Quota refused {count} worksheet(s) for {email}")
+        return usage
+
+    @staticmethod
+    def release(email, count=1):
+        """Give back `count` reserved slots (not committed)"""
+        if not email or count <= 0:
+            return
+        db.session.execute(
+            update(User)
+            .where(User.email == email, User.worksheets_processed >= count)
+            .values(worksheets_processed=User.worksheets_processed - count)
+            .execution_options(synchronize_session=False)
+        )
+        EntitlementService.invalidate(email)
+        logger.info(f"Released {count} reserved worksheet(s) for {email}")
+
+    @staticmethod
+    def settle_job(job, failed=None):
+        """Release a job's reserved slots for its failed worksheets (all if None) and mark the reservation settled (not committed)"""
+        payload = job.payload or {}
+        reserved = payload.get('quota_reserved', 0)
+        if not reserved:
+            return
+        QuotaService.release(job.user_email, reserved if failed is None else min(failed, reserved))
+        job.payload = dict(payload, quota_reserved=0)
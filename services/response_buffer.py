@@ -0,0 +1,201 @@
+"""
+Write-behind buffer for graded student responses and their running aggregates.
+"""
+import os
+import atexit
+import logging
+import threading
+from datetime import datetime
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import insert, update, select, bindparam
+from sqlalchemy.exc import IntegrityError
+from models import Task, TaskResponse, TaskStats, WorksheetStats, db
+
+logger = logging.getLogger(__name__)
+
+_shared_buffer = None
+_shared_buffer_lock = threading.Lock()
+
+def get_response_buffer():
+    """Get the response buffer of this process, bound to the current app"""
+    global _shared_buffer
+    if _shared_buffer is None or _shared_buffer.pid != os.getpid():
+        with _shared_buffer_lock:
+            if _shared_buffer is None or _shared_buffer.pid != os.getpid():
+                config = current_app.config
+                _shared_buffer = ResponseBuffer(
+                    current_app._get_current_object(),
+                    max_rows=config.get('RESPONSE_BUFFER_MAX_ROWS', 200),
+                    flush_interval=config.get('RESPONSE_BUFFER_FLUSH_MS', 500) / 1000
+                )
+                atexit.register(_shared_buffer.flush)
+    return _shared_buffer
+
+class ResponseBuffer:
+    """Collects responses in memory and writes them, with their aggregates, in one transaction per batch
+
+    A background thread flushes every flush_interval seconds, or as soon as
+    max_rows responses are waiting, so a classroom burst of answer checks costs
+    one commit per batch instead of one per click. Responses accepted since the
+    last flush are lost if the process dies; aggregates always match what was
+    written, because both go in the same transaction.
+    """
+
+    # Failed writes are retried, but no more than this many batches are kept in memory
+    MAX_PENDING_BATCHES = 10
+
+    def __init__(self, app, max_rows=200, flush_interval=0.5):
+        self.app = app
+        self.pid = os.getpid()
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.stats = {'buffered': 0, 'written': 0, 'flushes': 0, 'failed_flushes': 0, 'dropped': 0}
+
+    def add(self, task_id, worksheet_id, student_id, answer, result):
+        """Queue one graded response"""
+        row = {
+            'task_id': task_id,
+            'worksheet_id': worksheet_id,
+            'student_id': student_id,
+            'response_data': {'answer': answer, 'score': result['score']},
+            'is_correct': result['is_correct'],
+            'score': result['score'],
+            'submitted_date': datetime.utcnow()
+        }
+        with self._lock:
+            self._rows.append(row)
+            self.stats['buffered'] += 1
+            pending = len(self._rows)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='response-buffer', daemon=True)
+                self._thread.start()
+        if pending >= self.max_rows:
+            self._wakeup.set()
+
+    def pending(self):
+        """Responses accepted but not written yet"""
+        with self._lock:
+            return len(self._rows)
+
+    def get_stats(self):
+        stats = dict(self.stats, pending=self.pending(), max_rows=self.max_rows,
+                     flush_interval_ms=int(self.flush_interval * 1000))
+        stats['rows_per_flush'] = round(stats['written'] / stats['flushes'], 1) if stats['flushes'] else 0
+        return stats
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing response buffer: {str(e)}")
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of responses written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            try:
+                with self.app.app_context():
+                    try:
+                        written = ResponseBuffer._write(rows)
+                    except IntegrityError:
+                        # Another process created the same aggregate row first, or a task was
+                        # deleted meanwhile; the retry updates that row and skips the task
+                        db.session.rollback()
+                        written = ResponseBuffer._write(rows)
+            except Exception:
+                self.stats['failed_flushes'] += 1
+                with self._lock:
+                    self._rows = rows + self._rows
+                    overflow = len(self._rows) - self.max_rows * self.MAX_PENDING_BATCHES
+                    if overflow > 0:
+                        del self._rows[:overflow]
+                        self.stats['dropped'] += overflow
+                        logger.error(f"Response buffer full, dropped {overflow} oldest responses")
+                raise
+
+            if written < len(rows):
+                self.stats['dropped'] += len(rows) - written
+                logger.warning(f"Dropped {len(rows) - written} buffered responses for deleted tasks")
+            self.stats['written'] += written
+            self.stats['flushes'] += 1
+            logger.debug(f"Wrote {written} buffered responses")
+            return written
+
+    @staticmethod
+    def _write(rows):
+        """Insert responses and add them to the per-task and per-worksheet totals in one transaction; returns the number written"""
+        try:
+            # A task deleted since its response was graded would fail the whole batch on its foreign key
+            worksheet_of = dict(db.session.execute(
+                select(Task.id, Task.worksheet_id).where(Task.id.in_({row['task_id'] for row in rows}))
+            ).all())
+            rows = [row for row in rows if row['task_id'] in worksheet_of]
+            if not rows:
+                return 0
+
+            db.session.execute(insert(TaskResponse), [
+                {key: row[key] for key in ('task_id', 'student_id', 'response_data', 'is_correct', 'submitted_date')}
+                for row in rows
+            ])
+
+            by_task = defaultdict(lambda: {'attempts': 0, 'correct': 0, 'score_total': 0.0, 'last_response_at': None})
+            by_worksheet = defaultdict(lambda: {'attempts': 0, 'correct': 0, 'score_total': 0.0, 'last_response_at': None})
+            for row in rows:
+                for totals in (by_task[row['task_id']], by_worksheet[worksheet_of[row['task_id']]]):
+                    totals['attempts'] += 1
+                    totals['correct'] += 1 if row['is_correct'] else 0
+                    totals['score_total'] += row['score']
+                    totals['last_response_at'] = max(filter(None, (totals['last_response_at'], row['submitted_date'])))
+
+            ResponseBuffer._add_totals(TaskStats, TaskStats.task_id, by_task,
+                                       lambda task_id: {'worksheet_id': worksheet_of[task_id]})
+            ResponseBuffer._add_totals(WorksheetStats, WorksheetStats.worksheet_id, by_worksheet)
+            db.session.commit()
+            return len(rows)
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def _add_totals(model, key_column, totals, extra=None):
+        """Increment existing aggregate rows with one executemany UPDATE and insert the missing ones"""
+        existing = set(db.session.execute(select(key_column).where(key_column.in_(list(totals)))).scalars())
+        table = model.__table__
+        key = table.c[key_column.key]
+
+        if existing:
+            db.session.connection().execute(
+                update(table)
+                .where(key == bindparam('row_key'))
+                .values(
+                    attempts=table.c.attempts + bindparam('add_attempts'),
+                    correct=table.c.correct + bindparam('add_correct'),
+                    score_total=table.c.score_total + bindparam('add_score'),
+                    last_response_at=bindparam('last_response_at')
+                ),
+                [
+                    {'row_key': k, 'add_attempts': t['attempts'], 'add_correct': t['correct'],
+                     'add_score': t['score_total'], 'last_response_at': t['last_response_at']}
+                    for k, t in totals.items() if k in existing
+                ]
+            )
+
+        new_rows = [
+            dict(t, **{key_column.key: k}, **(extra(k) if extra else {}))
+            for k, t in totals.items() if k not in existing
+        ]
+        if new_rows:
+            db.session.connection().execute(insert(table), new_rows)
@@ -0,0 +1,93 @@
+"""
+Ordered schema migrations for databases created before a model change, tracked in a schema_migrations table.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from models import Worksheet, Task, TaskResponse, EmailVerification, ProcessingJob, db
+
+logger = logging.getLogger(__name__)
+
+def _create_indexes(*models):
+    """Create every index declared on the given models that the database lacks"""
+    def migrate(connection):
+        for model in models:
+            for index in model.__table__.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+    return migrate
+
+def _add_column(model, column_name):
+    """Add a column declared on a model to a table created before it existed"""
+    def migrate(connection):
+        table = model.__table__
+        if column_name in {column['name'] for column in inspect(connection).get_columns(table.name)}:
+            return
+        column_type = table.columns[column_name].type.compile(dialect=connection.dialect)
+        connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column_name} {column_type}'))
+    return migrate
+
+class SchemaMigrations:
+    """Applies MIGRATIONS in order after db.create_all(), each one exactly once per database
+
+    create_all() already builds new databases in their latest shape, so every
+    migration must be a no-op when its change is already present (IF NOT EXISTS,
+    column checks).
+    That keeps fresh and upgraded databases identical.
+    """
+
+    TABLE = 'schema_migrations'
+
+    # (version, description, function taking a connection); append only, never reorder
+    MIGRATIONS = [
+        (1, 'Indexes for task lists, dashboards, verification checks, responses and the job queue',
+         _create_indexes(Task, Worksheet, EmailVerification, TaskResponse, ProcessingJob)),
+        (2, 'Precompiled answer keys on tasks (older tasks are compiled when graded)',
+         _add_column(Task, 'answer_key')),
+    ]
+
+    @staticmethod
+    def _ensure_table(connection):
+        connection.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {SchemaMigrations.TABLE} ('
+            'version INTEGER PRIMARY KEY, description VARCHAR(255), applied_at TIMESTAMP)'
+        ))
+
+    @staticmethod
+    def applied_versions():
+        """Versions recorded as applied in this database"""
+        with db.engine.begin() as connection:
+            SchemaMigrations._ensure_table(connection)
+            return {row[0] for row in connection.execute(text(f'SELECT version FROM {SchemaMigrations.TABLE}'))}
+
+    @staticmethod
+    def pending():
+        """Migrations not applied yet, in order"""
+        applied = SchemaMigrations.applied_versions()
+        return [migration for migration in SchemaMigrations.MIGRATIONS if migration[0] not in applied]
+
+    @staticmethod
+    def upgrade():
+        """Apply pending migrations, each in its own transaction; returns the versions applied"""
+        applied = []
+        for version, description, migrate in SchemaMigrations.pending():
+            try:
+                with db.engine.begin() as connection:
+                    migrate(connection)
+                    connection.execute(
+                        text(f'INSERT INTO {SchemaMigrations.TABLE} (version, description, applied_at) '
+                             'VALUES (:version, :description, :applied_at)'),
+                        {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+                    )
+            except IntegrityError:
+                # Another process starting at the same time recorded it first
+                logger.info(f"Schema migration {version} already applied by another process")
+                continue
+            except Exception as e:
+                logger.error(f"Schema migration {version} failed: {str(e)}")
+                raise Exception(f"Failed to apply schema migration {version}: {str(e)}")
+
+            logger.info(f"Applied schema migration {version}: {description}")
+            applied.append(version)
+        return applied
@@ -0,0 +1,164 @@
+"""
+Single-flight coordination so concurrent identical generation requests run only once.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process coordination only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_shared_flight = None
+_shared_flight_lock = threading.Lock()
+
+def get_single_flight():
+    """Get the single-flight coordinator shared by the whole process"""
+    global _shared_flight
+    if _shared_flight is None:
+        with _shared_flight_lock:
+            if _shared_flight is None:
+                cache_dir = os.environ.get('CACHE_DIR', 'cache')
+                timeout = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 300))
+                _shared_flight = SingleFlight(os.path.join(cache_dir, 'locks'), timeout=timeout)
+    return _shared_flight
+
+class Flight:
+    """Outcome of joining a flight: either an existing result or the duty to produce one"""
+
+    def __init__(self, result=None):
+        self.result = result
+
+    @property
+    def is_leader(self):
+        return self.result is None
+
+class SingleFlight:
+    """Serializes work per key across threads (locks) and processes (per-key file locks)
+
+    Callers pass a check() function that looks the result up (e.g. in the task
+    cache). Whoever gets the key first runs the work; everyone who was waiting
+    re-runs check() once the leader is done and gets the leader's result.
+    """
+
+    def __init__(self, lock_dir, timeout=300):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self._locks = {}
+        self._guard = threading.Lock()
+        self._stats = Counter()
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def _count(self, name, amount=1):
+        with self._guard:
+            self._stats[name] += amount
+
+    @contextmanager
+    def _thread_lock(self, key):
+        """Per-key lock shared by threads of this process"""
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        waited = entry[0].locked()
+        acquired = entry[0].acquire(timeout=self.timeout)
+        try:
+            yield acquired, waited
+        finally:
+            if acquired:
+                entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(key, None)
+
+    @contextmanager
+    def _process_lock(self, key):
+        """Exclusive lock file of this key, shared by local processes
+
+        Files are named by the full SHA-256 of the key, so unrelated keys never
+        wait for each other. The holder removes its file before unlocking; a
+        waiter that then gets the lock on the removed file starts over on a new one.
+        """
+        if fcntl is None:
+            yield True, False
+            return
+
+        path = os.path.join(self.lock_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.lock")
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            lock_file = open(path, 'a')
+            acquired = False
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    waited = True
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(0.1)
+
+            if acquired and not self._is_current(lock_file, path):
+                lock_file.close()
+                continue
+            break
+
+        try:
+            yield acquired, waited
+        finally:
+            if acquired:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    @staticmethod
+    def _is_current(lock_file, path):
+        """Whether the locked file is still the one at path (not removed by its previous holder)"""
+        try:
+            return os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino
+        except FileNotFoundError:
+            return False
+
+    @contextmanager
+    def flight(self, key, check):
+        """Join the flight for key; yields a Flight with a result or leadership"""
+        with self._thread_lock(key) as (thread_locked, thread_waited):
+            with self._process_lock(key) as (process_locked, process_waited):
+                result = check()
+                if result is not None:
+                    if thread_waited or process_waited:
+                        self._count('coalesced')
+                        logger.info(f"Single-flight: reused result of concurrent generation for {key}")
+                    yield Flight(result)
+                    return
+
+                if not (thread_locked and process_locked):
+                    # Locks are per key, so the holder is generating this same key: the work is duplicated
+                    self._count('lock_timeouts')
+                    self._count('wasted_generations')
+                    logger.warning(f"Single-flight: lock timeout for {key}, generating without coordination")
+
+                self._count('leader_runs')
+                yield Flight()
+
+    def get_stats(self):
+        """Counters for this process"""
+        with self._guard:
+            stats = dict(self._stats)
+            stats['in_flight_keys'] = len(self._locks)
+        for name in ('leader_runs', 'coalesced', 'lock_timeouts', 'wasted_generations'):
+            stats.setdefault(name, 0)
+        return stats
@@ -4,6 +4,7 @@ from flask import session
 from datetime import datetime, timedelta
 from app import db
 from models import User
+from services.entitlements import EntitlementService
 
 stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
 
@@ -113,6 +114,7 @@ class SubscriptionService:
             user.subscription_end_date = datetime.fromtimestamp(subscription.current_period_end)
             
             db.session.commit()
+            EntitlementService.invalidate(email)
             
             return user
         except Exception as e:
@@ -135,6 +137,7 @@ class SubscriptionService:
             # Update user status
             user.subscription_status = 'canceled'
             db.session.commit()
+            EntitlementService.invalidate(user_email)
             
             return True
         except Exception as e:
@@ -148,17 +151,18 @@ class SubscriptionService:
             user = User(email=email)
             db.session.add(user)
             db.session.commit()
+            EntitlementService.invalidate(email)
         return user
     
     @staticmethod
     def check_usage_limit(email):
         """Check if user has exceeded their usage limit"""
-        user = SubscriptionService.get_or_create_user(email)
-        return user.can_process_worksheet()
+        return EntitlementService.can_process(email)
     
     @staticmethod
     def increment_usage(email):
         """Increment user's worksheet processing count"""
         user = SubscriptionService.get_or_create_user(email)
         user.increment_usage()
+        EntitlementService.invalidate(email)
         return user
\ No newline at end of file
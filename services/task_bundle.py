@@ -0,0 +1,68 @@
+"""
+Offline bundles of a worksheet: its tasks and compiled answer keys under an immutable, versioned URL.
+"""
+import json
+import logging
+from sqlalchemy.orm import undefer
+from models import Task, Worksheet, db
+from .cache_service import get_cache_service
+from .grading_engine import GradingEngine
+from .task_payload import TaskPayloadCache
+
+logger = logging.getLogger(__name__)
+
+class TaskBundle:
+    """Builds the bundle students grade against when offline
+
+    The version is a hash of the tasks the bundle was built from plus the
+    answer-key format, so a bundle URL never changes content and can be cached
+    forever by browsers, the service worker and any CDN in front of the app.
+    Only completed worksheets have bundles.
+    """
+
+    NAMESPACE = 'task_bundles'
+
+    @staticmethod
+    def version_for(payload_etag):
+        """Bundle version of a task payload"""
+        return f"{payload_etag[:20]}k{GradingEngine.KEY_VERSION}"
+
+    @staticmethod
+    def get(worksheet_id):
+        """Current bundle of a completed worksheet (version, data and JSON body), or None"""
+        payload = TaskPayloadCache.get(worksheet_id)[0]
+        if not payload['task_count']:
+            return None
+
+        cache_service = get_cache_service()
+        bundle = cache_service.get(TaskBundle.NAMESPACE, str(worksheet_id))
+        if bundle is not None and bundle['version'] == TaskBundle.version_for(payload['etag']):
+            return bundle
+
+        worksheet = db.session.query(
+            Worksheet.original_filename, Worksheet.processing_status
+        ).filter_by(id=worksheet_id).first()
+        if worksheet is None or worksheet.processing_status != 'completed':
+            return None
+
+        tasks = Task.query.options(undefer(Task.answer_key)).filter_by(
+            worksheet_id=worksheet_id
+        ).order_by(Task.order_index).all()
+
+        # Versioned by what was actually read, so a concurrent save cannot mislabel it
+        version = TaskBundle.version_for(TaskPayloadCache.serialize(tasks)['etag'])
+        data = {
+            'version': version,
+            'worksheet': {'id': worksheet_id, 'original_filename': worksheet.original_filename},
+            'tasks': [task.to_dict() for task in tasks],
+            'answer_keys': {str(task.id): GradingEngine.key_for(task) for task in tasks}
+        }
+        bundle = {'version': version, 'data': data, 'body': json.dumps(data, separators=(',', ':'))}
+        cache_service.set(TaskBundle.NAMESPACE, str(worksheet_id), bundle)
+        logger.info(f"Built offline bundle {version} for worksheet {worksheet_id}")
+        return bundle
+
+    @staticmethod
+    def invalidate(worksheet_id):
+        """Drop the cached bundle after a worksheet's tasks changed"""
+        get_cache_service().delete(TaskBundle.NAMESPACE, str(worksheet_id))
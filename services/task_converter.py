@@ -1,5 +1,11 @@
 import logging
-from models import Task, Worksheet, db
+from datetime import datetime
+from sqlalchemy import insert, update, delete, select
+from models import Task, TaskResponse, TaskStats, WorksheetStats, Worksheet, db
+from .grading_engine import GradingEngine
+from .task_payload import TaskPayloadCache
+from .task_page_cache import TaskPageCache
+from .task_bundle import TaskBundle
 
 logger = logging.getLogger(__name__)
 
@@ -7,33 +13,109 @@ class TaskConverter:
     """Service for converting AI-generated tasks to database models"""
     
     @staticmethod
-    def save_tasks_to_database(worksheet_id, tasks_data):
-        """Save generated tasks to database"""
+    def save_tasks_to_database(worksheet_id, tasks_data, status=None):
+        """Replace a worksheet's tasks, optionally setting its status, in one transaction"""
         try:
             # Clear existing tasks for this worksheet
-            Task.query.filter_by(worksheet_id=worksheet_id).delete()
+            TaskConverter._delete_tasks(worksheet_id)
             
-            saved_tasks = []
-            for task_data in tasks_data:
-                task = Task(
-                    worksheet_id=worksheet_id,
-                    task_type=task_data['task_type'],
-                    question=task_data['question'],
-                    task_data=task_data['task_data'],
-                    order_index=task_data['order_index']
-                )
-                db.session.add(task)
-                saved_tasks.append(task)
+            saved = TaskConverter.bulk_insert_tasks({worksheet_id: tasks_data})
+            if status:
+                TaskConverter._set_status(worksheet_id, status)
             
             db.session.commit()
-            logger.info(f"Saved {len(saved_tasks)} tasks for worksheet {worksheet_id}")
-            return saved_tasks
+            TaskPayloadCache.refresh(worksheet_id)
+            TaskConverter._drop_derived(worksheet_id)
+            logger.info(f"Saved {saved} tasks for worksheet {worksheet_id}")
+            return saved
             
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error saving tasks to database: {str(e)}")
             raise Exception(f"Failed to save tasks: {str(e)}")
     
+    @staticmethod
+    def bulk_insert_tasks(tasks_by_worksheet):
+        """Insert tasks for one or more worksheets as a single executemany (not committed)"""
+        now = datetime.utcnow()
+        rows = [
+            {
+                'worksheet_id': worksheet_id,
+                'task_type': task_data['task_type'],
+                'question': task_data['question'],
+                'task_data': task_data['task_data'],
+                'answer_key': GradingEngine.compile(task_data['task_type'], task_data['task_data']),
+                'order_index': task_data['order_index'],
+                'created_date': now
+            }
+            for worksheet_id, tasks_data in tasks_by_worksheet.items()
+            for task_data in tasks_data
+        ]
+        
+        # No RETURNING: ids are not needed, and asking for them in order makes
+        # backends without a sentinel column fall back to one INSERT per row
+        if rows:
+            db.session.execute(insert(Task), rows)
+        return len(rows)
+    
+    @staticmethod
+    def _delete_tasks(worksheet_id):
+        """Delete a worksheet's tasks with the responses and statistics recorded against them (not committed)"""
+        task_ids = select(Task.id).where(Task.worksheet_id == worksheet_id)
+        db.session.execute(delete(TaskResponse).where(TaskResponse.task_id.in_(task_ids)))
+        db.session.execute(delete(TaskStats).where(TaskStats.worksheet_id == worksheet_id))
+        db.session.execute(delete(WorksheetStats).where(WorksheetStats.worksheet_id == worksheet_id))
+        db.session.execute(delete(Task).where(Task.worksheet_id == worksheet_id))
+    
+    @staticmethod
+    def _drop_derived(worksheet_id):
+        """Drop the rendered task list and offline bundle built from a worksheet's previous tasks"""
+        TaskPageCache.invalidate(worksheet_id)
+        TaskBundle.invalidate(worksheet_id)
+    
+    @staticmethod
+    def _set_status(worksheet_id, status):
+        """Status update as a single statement in the current transaction"""
+        return db.session.execute(
+            update(Worksheet).where(Worksheet.id == worksheet_id).values(processing_status=status)
+        )
+    
+    @staticmethod
+    def clear_tasks(worksheet_id):
+        """Remove all tasks for a worksheet before regenerating them"""
+        try:
+            TaskConverter._delete_tasks(worksheet_id)
+            db.session.commit()
+            TaskPayloadCache.invalidate(worksheet_id)
+            TaskConverter._drop_derived(worksheet_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error clearing tasks: {str(e)}")
+            raise Exception(f"Failed to clear tasks: {str(e)}")
+    
+    @staticmethod
+    def add_task(worksheet_id, task_data):
+        """Save a single generated task as soon as it is available"""
+        try:
+            task = Task(
+                worksheet_id=worksheet_id,
+                task_type=task_data['task_type'],
+                question=task_data['question'],
+                task_data=task_data['task_data'],
+                answer_key=GradingEngine.compile(task_data['task_type'], task_data['task_data']),
+                order_index=task_data['order_index']
+            )
+            db.session.add(task)
+            db.session.commit()
+            TaskPayloadCache.invalidate(worksheet_id)
+            TaskConverter._drop_derived(worksheet_id)
+            return task
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error saving task to database: {str(e)}")
+            raise Exception(f"Failed to save task: {str(e)}")
+    
     @staticmethod
     def get_tasks_for_worksheet(worksheet_id):
         """Retrieve all tasks for a specific worksheet"""
@@ -59,10 +141,13 @@ class TaskConverter:
     def update_worksheet_status(worksheet_id, status):
         """Update worksheet processing status"""
         try:
-            worksheet = Worksheet.query.get(worksheet_id)
-            if worksheet:
-                worksheet.processing_status = status
-                db.session.commit()
+            result = TaskConverter._set_status(worksheet_id, status)
+            db.session.commit()
+            if result.rowcount:
+                if status == 'completed':
+                    TaskPayloadCache.refresh(worksheet_id)
+                else:
+                    TaskPayloadCache.invalidate(worksheet_id)
                 logger.info(f"Updated worksheet {worksheet_id} status to {status}")
             else:
                 logger.warning(f"Worksheet {worksheet_id} not found")
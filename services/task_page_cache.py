@@ -0,0 +1,79 @@
+"""
+Rendered task-list fragments of tasks.html, cached per worksheet and task-content version.
+"""
+import json
+import time
+import logging
+import threading
+from flask import current_app, render_template
+from jinja2.utils import htmlsafe_json_dumps
+from .cache_service import get_cache_service
+from .task_payload import TaskPayloadCache
+
+logger = logging.getLogger(__name__)
+
+class TaskPageCache:
+    """Caches the task cards and tasksData JSON of /tasks/<id>, the parts that are the same for every visitor
+
+    A fragment is stored under the worksheet id together with the ETag of the
+    task payload it was rendered from, and only served while that ETag is still
+    current, so a rewritten task list can never show stale cards even if an
+    invalidation is missed. The page around it (navigation, flashes) is
+    rendered per request as before.
+    """
+
+    NAMESPACE = 'task_pages'
+
+    _stats = {'hits': 0, 'misses': 0, 'render_ms': 0.0}
+    _stats_lock = threading.Lock()
+
+    @staticmethod
+    def get(worksheet_id):
+        """Fragment of a worksheet's tasks: html, tasks_json and task_count"""
+        payload = TaskPayloadCache.get(worksheet_id)[0]
+        cache_service = get_cache_service()
+
+        fragment = cache_service.get(TaskPageCache.NAMESPACE, str(worksheet_id))
+        if fragment is not None and fragment['version'] == payload['etag']:
+            TaskPageCache._record(hit=True)
+            return fragment
+
+        started = time.perf_counter()
+        tasks = json.loads(payload['body'])['tasks']
+        fragment = {
+            'version': payload['etag'],
+            'html': render_template('partials/task_list.html', tasks=tasks),
+            'tasks_json': str(htmlsafe_json_dumps(tasks, dumps=current_app.json.dumps)),
+            'task_count': len(tasks)
+        }
+        TaskPageCache._record(hit=False, render_ms=(time.perf_counter() - started) * 1000)
+
+        if tasks:
+            cache_service.set(TaskPageCache.NAMESPACE, str(worksheet_id), fragment)
+        return fragment
+
+    @staticmethod
+    def invalidate(worksheet_id):
+        """Drop the rendered fragment after a worksheet's tasks changed"""
+        get_cache_service().delete(TaskPageCache.NAMESPACE, str(worksheet_id))
+
+    @staticmethod
+    def _record(hit, render_ms=0.0):
+        with TaskPageCache._stats_lock:
+            TaskPageCache._stats['hits' if hit else 'misses'] += 1
+            TaskPageCache._stats['render_ms'] += render_ms
+
+    @staticmethod
+    def get_stats():
+        """Hit ratio of this process and the render time the hits saved, estimated from the average miss"""
+        with TaskPageCache._stats_lock:
+            stats = dict(TaskPageCache._stats)
+        lookups = stats['hits'] + stats['misses']
+        average_render_ms = stats['render_ms'] / stats['misses'] if stats['misses'] else 0.0
+        return {
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_ratio': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+            'average_render_ms': round(average_render_ms, 2),
+            'render_ms_saved': round(stats['hits'] * average_render_ms, 1)
+        }
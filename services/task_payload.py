@@ -0,0 +1,105 @@
+"""
+Serialized /api/tasks payloads, built once per task set and served with strong ETags.
+"""
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from models import Task, Worksheet, db
+from .cache_service import get_cache_service
+
+logger = logging.getLogger(__name__)
+
+class TaskPayloadCache:
+    """Caches the JSON body of a worksheet's task list, keyed by worksheet id
+
+    The body is stored (with its ETag) in the shared cache when tasks are saved,
+    so a repeat load costs one cache lookup and no query or JSON encoding. Only
+    completed worksheets are cached; task lists still being generated are built
+    on every request. Encoded bytes, gzipped or not, are kept per process by ETag.
+    """
+
+    NAMESPACE = 'task_payloads'
+
+    # Bodies shorter than this are not worth compressing
+    GZIP_MIN_BYTES = 1024
+
+    # Encoded bodies kept in memory per process
+    MAX_ENCODED = 256
+
+    _encoded = OrderedDict()
+    _encoded_lock = threading.Lock()
+
+    @staticmethod
+    def build(worksheet_id):
+        """Serialize a worksheet's tasks; returns (payload, cacheable) where payload has etag and body"""
+        status = db.session.query(Worksheet.processing_status).filter_by(id=worksheet_id).scalar()
+        tasks = Task.query.filter_by(worksheet_id=worksheet_id).order_by(Task.order_index).all()
+        return TaskPayloadCache.serialize(tasks), status == 'completed'
+
+    @staticmethod
+    def serialize(tasks):
+        """Payload of a list of tasks: JSON body, its content-hash ETag and the task count"""
+        body = json.dumps({'tasks': [task.to_dict() for task in tasks]}, separators=(',', ':'))
+        return {
+            'etag': hashlib.sha256(body.encode()).hexdigest()[:32],
+            'body': body,
+            'task_count': len(tasks)
+        }
+
+    @staticmethod
+    def get(worksheet_id):
+        """Payload of a worksheet's tasks and whether it is final, from the cache or built (and cached if the worksheet is completed)"""
+        cache_service = get_cache_service()
+        payload = cache_service.get(TaskPayloadCache.NAMESPACE, str(worksheet_id))
+        if payload is not None:
+            return payload, True
+
+        payload, cacheable = TaskPayloadCache.build(worksheet_id)
+        if cacheable:
+            cache_service.set(TaskPayloadCache.NAMESPACE, str(worksheet_id), payload)
+        return payload, cacheable
+
+    @staticmethod
+    def refresh(worksheet_id):
+        """Rebuild the cached payload after a worksheet's tasks were saved"""
+        try:
+            cache_service = get_cache_service()
+            payload, cacheable = TaskPayloadCache.build(worksheet_id)
+            if cacheable:
+                cache_service.set(TaskPayloadCache.NAMESPACE, str(worksheet_id), payload)
+            else:
+                cache_service.delete(TaskPayloadCache.NAMESPACE, str(worksheet_id))
+        except Exception as e:
+            # The next read rebuilds it; never fail a save because of the cache
+            logger.error(f"Error refreshing task payload for worksheet {worksheet_id}: {str(e)}")
+            TaskPayloadCache.invalidate(worksheet_id)
+
+    @staticmethod
+    def invalidate(worksheet_id):
+        """Drop the cached payload after a worksheet's tasks changed"""
+        get_cache_service().delete(TaskPayloadCache.NAMESPACE, str(worksheet_id))
+
+    @staticmethod
+    def encoded(payload, use_gzip=False):
+        """Body bytes of a payload and their ETag, gzipped if asked and worth it; encoded once per process"""
+        use_gzip = use_gzip and len(payload['body']) >= TaskPayloadCache.GZIP_MIN_BYTES
+        etag = payload['etag'] + ('-gz' if use_gzip else '')
+
+        with TaskPayloadCache._encoded_lock:
+            data = TaskPayloadCache._encoded.get(etag)
+            if data is not None:
+                TaskPayloadCache._encoded.move_to_end(etag)
+                return data, etag, use_gzip
+
+        data = payload['body'].encode()
+        if use_gzip:
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+
+        with TaskPayloadCache._encoded_lock:
+            TaskPayloadCache._encoded[etag] = data
+            while len(TaskPayloadCache._encoded) > TaskPayloadCache.MAX_ENCODED:
+                TaskPayloadCache._encoded.popitem(last=False)
+        return data, etag, use_gzip
@@ -0,0 +1,97 @@
+"""
+Incremental parser that pulls complete task objects out of a streamed JSON response.
+"""
+import json
+import logging
+from typing import List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class TaskStreamParser:
+    """Parses {"tasks": [{...}, {...}]} as it arrives, one task object at a time"""
+
+    def __init__(self, array_key: str = 'tasks'):
+        self.array_key = array_key
+        self.buffer = ''
+        self.position = 0
+        self.in_array = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_start = None
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add streamed text and return any task objects completed by it"""
+        if self.finished or not chunk:
+            return []
+
+        self.buffer += chunk
+        completed = []
+
+        if not self.in_array and not self._find_array_start():
+            return completed
+
+        buffer = self.buffer
+        i = self.position
+        while i < len(buffer):
+            char = buffer[i]
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                if self.depth == 0 and char == '{':
+                    self.object_start = i
+                self.depth += 1
+            elif char in '}]':
+                if self.depth == 0 and char == ']':
+                    self.finished = True
+                    i += 1
+                    break
+                self.depth -= 1
+                if self.depth == 0 and self.object_start is not None:
+                    task = self._decode(buffer[self.object_start:i + 1])
+                    if task is not None:
+                        completed.append(task)
+                    self.object_start = None
+
+            i += 1
+
+        # Drop text that belongs to tasks already emitted
+        keep_from = self.object_start if self.object_start is not None else i
+        self.buffer = buffer[keep_from:]
+        self.position = i - keep_from
+        if self.object_start is not None:
+            self.object_start = 0
+
+        return completed
+
+    def _find_array_start(self) -> bool:
+        """Locate the opening bracket of the tasks array"""
+        key_index = self.buffer.find(f'"{self.array_key}"')
+        if key_index == -1:
+            return False
+
+        bracket_index = self.buffer.find('[', key_index)
+        if bracket_index == -1:
+            return False
+
+        self.in_array = True
+        self.buffer = self.buffer[bracket_index + 1:]
+        self.position = 0
+        return True
+
+    def _decode(self, text: str):
+        """Decode one task object, skipping malformed ones"""
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed streamed task: {e}")
+            return None
@@ -0,0 +1,80 @@
+"""
+Splits long worksheet text into prompt-sized chunks on page and section boundaries.
+"""
+import re
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+class TextChunker:
+    """Packs pages/sections of extracted text into chunks of bounded size"""
+
+    PAGE_BREAK = '\f'
+    SECTION_BREAK = re.compile(r'\n\s*\n')
+
+    def __init__(self, max_chars: int = 12000):
+        self.max_chars = max_chars
+
+    def split(self, text: str) -> List[str]:
+        """Split text into chunks no longer than max_chars"""
+        if len(text) <= self.max_chars:
+            return [text]
+
+        chunks = []
+        current = []
+        current_len = 0
+
+        for page in text.split(self.PAGE_BREAK):
+            for section in self._split_section(page):
+                if current and current_len + len(section) + 2 > self.max_chars:
+                    chunks.append('\n\n'.join(current))
+                    current = []
+                    current_len = 0
+                current.append(section)
+                current_len += len(section) + 2
+
+        if current:
+            chunks.append('\n\n'.join(current))
+        return chunks
+
+    def _split_section(self, text: str) -> List[str]:
+        """Break a page into sections small enough to fit in a chunk"""
+        text = text.strip()
+        if not text:
+            return []
+        if len(text) <= self.max_chars:
+            return [text]
+
+        sections = []
+        for paragraph in self.SECTION_BREAK.split(text):
+            paragraph = paragraph.strip()
+            if len(paragraph) <= self.max_chars:
+                if paragraph:
+                    sections.append(paragraph)
+                continue
+
+            # Oversized paragraph: fall back to lines, then hard cuts
+            for line in paragraph.split('\n'):
+                while len(line) > self.max_chars:
+                    sections.append(line[:self.max_chars])
+                    line = line[self.max_chars:]
+                if line.strip():
+                    sections.append(line)
+
+        return sections
+
+    @staticmethod
+    def allocate_tasks(chunks: List[str], num_tasks: int) -> List[int]:
+        """Share num_tasks between chunks in proportion to their length"""
+        total_len = sum(len(chunk) for chunk in chunks) or 1
+        shares = [num_tasks * len(chunk) / total_len for chunk in chunks]
+        counts = [int(share) for share in shares]
+
+        # Largest remainder method so the counts add up to num_tasks exactly
+        remaining = num_tasks - sum(counts)
+        by_remainder = sorted(range(len(chunks)), key=lambda i: shares[i] - counts[i], reverse=True)
+        for i in by_remainder[:remaining]:
+            counts[i] += 1
+
+        return counts
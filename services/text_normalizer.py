@@ -0,0 +1,71 @@
+"""
+Text normalization applied before hashing so trivially different exports share cache entries.
+"""
+import re
+import hashlib
+import unicodedata
+from collections import Counter
+
+PAGE_BREAK = '\f'
+
+# "Page 3", "Page 3 of 10", "3 of 10", "3/10", "- 3 -" anywhere in the text
+PAGE_NUMBER_LINE = re.compile(r'^(?:page\s*\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?|\d{1,4}\s*(?:of|/)\s*\d{1,4}|[-–—]\s*\d{1,4}\s*[-–—])$', re.IGNORECASE)
+# A bare number only counts as a page number on the first or last line of a page
+BARE_NUMBER_LINE = re.compile(r'^\d{1,4}$')
+INVISIBLE_CHARS = re.compile('[\u00ad\u200b\u200c\u200d\u2060\ufeff]')
+WHITESPACE = re.compile(r'\s+')
+
+NORMALIZATION_VERSION = 1
+
+def normalize_text(text: str) -> str:
+    """Canonical form of extracted text used for cache keys
+
+    Applies Unicode NFKC normalization, drops invisible characters, page-number
+    lines and headers/footers repeated on most pages, and collapses all runs of
+    whitespace (including line and page breaks) to single spaces.
+    """
+    text = unicodedata.normalize('NFKC', text or '')
+    text = INVISIBLE_CHARS.sub('', text)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    pages = [page.split('\n') for page in text.split(PAGE_BREAK)]
+    repeated = _repeated_page_lines(pages)
+
+    kept = []
+    for lines in pages:
+        lines = [WHITESPACE.sub(' ', line).strip() for line in lines]
+        lines = [line for line in lines if line]
+        for index, line in enumerate(lines):
+            if PAGE_NUMBER_LINE.match(line) or _line_signature(line) in repeated:
+                continue
+            if BARE_NUMBER_LINE.match(line) and index in (0, len(lines) - 1):
+                continue
+            kept.append(line)
+
+    return ' '.join(kept)
+
+def content_hash(text: str) -> str:
+    """SHA-256 of the normalized text"""
+    normalized = normalize_text(text)
+    return hashlib.sha256(f"v{NORMALIZATION_VERSION}:{normalized}".encode()).hexdigest()
+
+def _line_signature(line: str) -> str:
+    """Digits are masked so "Page 3 - Unit 2" and "Page 4 - Unit 2" compare equal"""
+    return re.sub(r'\d+', '#', line.lower())
+
+def _repeated_page_lines(pages):
+    """Header/footer lines: first or last lines of a page that repeat on at least half of the pages"""
+    if len(pages) < 3:
+        return set()
+
+    counts = Counter()
+    for lines in pages:
+        stripped = [WHITESPACE.sub(' ', line).strip() for line in lines]
+        stripped = [line for line in stripped if line]
+        if len(stripped) < 3:
+            continue
+        edges = {stripped[0], stripped[-1]}
+        counts.update(_line_signature(line) for line in edges if len(line) <= 120)
+
+    threshold = max(2, len(pages) // 2)
+    return {signature for signature, count in counts.items() if count >= threshold}
@@ -0,0 +1,69 @@
+"""
+Paginated per-user worksheet listing for the dashboard.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import load_only
+from models import Worksheet, Task, User, db
+
+logger = logging.getLogger(__name__)
+
+class WorksheetDashboard:
+    """Keyset-paginated worksheet pages with task counts, newest first"""
+
+    DEFAULT_PAGE_SIZE = 24
+
+    @staticmethod
+    def encode_cursor(worksheet):
+        """Opaque position after a worksheet in (upload_date, id) order"""
+        return f"{worksheet.upload_date.isoformat()}_{worksheet.id}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Parse a cursor back into (upload_date, id); raises ValueError if malformed"""
+        upload_date, worksheet_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(upload_date), int(worksheet_id)
+
+    @staticmethod
+    def get_page(user_email, cursor=None, page_size=None):
+        """One page of a user's worksheets plus the cursor of the next page, if any"""
+        page_size = page_size or WorksheetDashboard.DEFAULT_PAGE_SIZE
+
+        user_id = db.session.query(User.id).filter_by(email=user_email).scalar() if user_email else None
+        if user_id is None:
+            return [], {}, None
+
+        # Only the columns the cards show; extracted_text can be megabytes per row
+        query = Worksheet.query.options(
+            load_only(Worksheet.id, Worksheet.original_filename, Worksheet.file_type,
+                      Worksheet.upload_date, Worksheet.processing_status)
+        ).filter(Worksheet.user_id == user_id)
+
+        if cursor:
+            upload_date, worksheet_id = WorksheetDashboard.decode_cursor(cursor)
+            query = query.filter(or_(
+                Worksheet.upload_date < upload_date,
+                and_(Worksheet.upload_date == upload_date, Worksheet.id < worksheet_id)
+            ))
+
+        # One extra row tells whether another page follows without a COUNT over the whole table
+        worksheets = query.order_by(Worksheet.upload_date.desc(), Worksheet.id.desc()).limit(page_size + 1).all()
+        next_cursor = None
+        if len(worksheets) > page_size:
+            worksheets = worksheets[:page_size]
+            next_cursor = WorksheetDashboard.encode_cursor(worksheets[-1])
+
+        return worksheets, WorksheetDashboard.task_counts([w.id for w in worksheets]), next_cursor
+
+    @staticmethod
+    def task_counts(worksheet_ids):
+        """Task count per worksheet with one grouped query instead of loading each worksheet's tasks"""
+        if not worksheet_ids:
+            return {}
+        return dict(
+            db.session.query(Task.worksheet_id, func.count(Task.id))
+            .filter(Task.worksheet_id.in_(worksheet_ids))
+            .group_by(Task.worksheet_id)
+            .all()
+        )
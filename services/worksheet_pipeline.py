@@ -0,0 +1,247 @@
+"""
+Worksheet processing pipeline: text extraction, AI task generation and storage.
+"""
+import os
+import re
+import json
+import asyncio
+import logging
+from flask import current_app
+from models import Worksheet, db
+from .file_processor import FileProcessor
+from .blob_store import BlobStore
+from .cache_service import get_cache_service
+from .ai_task_generator import AITaskGenerator
+from .task_converter import TaskConverter
+from .near_duplicate_index import get_near_duplicate_index
+from .job_queue import run_in_app_context
+from .text_normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+class WorksheetPipeline:
+    """Runs the full conversion of an uploaded worksheet into interactive tasks"""
+
+    @staticmethod
+    def extract_worksheet_text(worksheet):
+        """Extract and store text for a worksheet if it has not been extracted yet"""
+        if worksheet.extracted_text:
+            return worksheet.extracted_text
+
+        # Identical bytes were uploaded before: reuse their stored text
+        extracted_text = BlobStore.find_extracted_text(worksheet)
+        if extracted_text is not None:
+            worksheet.extracted_text = extracted_text
+            db.session.commit()
+            logger.info(f"Reused extracted text of an identical upload for worksheet {worksheet.id}")
+            return extracted_text
+
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], worksheet.filename)
+        file_hash = BlobStore.hash_of(worksheet.filename) or FileProcessor.file_sha256(file_path)
+
+        # Checked before any parser runs, so repeat uploads never reach PyPDF2/python-docx
+        cache_service = get_cache_service()
+        extracted_text = cache_service.get_cached_text(file_hash, worksheet.file_type, FileProcessor.EXTRACTION_VERSION)
+        if extracted_text is None:
+            extracted_text = FileProcessor.extract_text_from_path(file_path, worksheet.file_type)
+            cache_service.cache_text(file_hash, worksheet.file_type, extracted_text, FileProcessor.EXTRACTION_VERSION)
+            logger.info(f"Extracted {len(extracted_text)} chars for worksheet {worksheet.id}")
+
+        worksheet.extracted_text = extracted_text
+        db.session.commit()
+        return extracted_text
+
+    @staticmethod
+    def _stream_tasks(ai_generator, worksheet_id, text, num_tasks):
+        """Persist each task as soon as it streams in so the tasks page can show it"""
+        TaskConverter.clear_tasks(worksheet_id)
+
+        tasks_data = []
+        for task_data in ai_generator.stream_tasks_from_text(text, num_tasks=num_tasks):
+            TaskConverter.add_task(worksheet_id, task_data)
+            tasks_data.append(task_data)
+
+        logger.info(f"Streamed {len(tasks_data)} tasks for worksheet {worksheet_id}")
+        return tasks_data
+
+    @staticmethod
+    def _find_near_duplicate(worksheet, signature):
+        """Find a completed worksheet whose text is nearly identical to this one"""
+        index = get_near_duplicate_index()
+        threshold = current_app.config.get('NEAR_DUPLICATE_THRESHOLD', 0.8)
+
+        for doc_id, similarity in index.query(None, threshold=threshold, exclude=worksheet.id, signature=signature):
+            source = Worksheet.query.get(doc_id)
+            if source and source.processing_status == 'completed' and source.extracted_text and source.tasks:
+                return source, similarity
+        return None, 0.0
+
+    @staticmethod
+    def _section_diff(old_text, new_text):
+        """Runs of consecutive lines present only in the new text and only in the old text, plus the lines both share"""
+        def keys(text):
+            return {normalize_text(line) for line in text.split('\n') if normalize_text(line)}
+
+        def runs(text, other_keys):
+            sections, current, shared = [], [], []
+            for line in text.split('\n'):
+                key = normalize_text(line)
+                if not key:
+                    continue
+                if key in other_keys:
+                    shared.append(line)
+                    if current:
+                        sections.append('\n'.join(current))
+                        current = []
+                else:
+                    current.append(line)
+            if current:
+                sections.append('\n'.join(current))
+            return sections, shared
+
+        added, shared = runs(new_text, keys(old_text))
+        removed, _ = runs(old_text, keys(new_text))
+        return added, removed, shared
+
+    @staticmethod
+    def _tokens(value):
+        """Lower-cased words and numbers of a text"""
+        return set(re.findall(r'\w+', value.lower()))
+
+    @staticmethod
+    def _reuse_near_duplicate(ai_generator, source, text, num_tasks):
+        """Reuse tasks from a near-duplicate worksheet, regenerating those that touch changed lines"""
+        source_tasks = [
+            {key: task[key] for key in ('task_type', 'question', 'task_data')}
+            for task in TaskConverter.get_tasks_for_worksheet(source.id)
+        ]
+
+        added_sections, removed_sections, shared_lines = WorksheetPipeline._section_diff(source.extracted_text, text)
+        added_text = '\n'.join(added_sections)
+        removed_text = '\n'.join(removed_sections)
+
+        # A task mentioning a number or word that differs between the changed lines may no
+        # longer match the worksheet (3 + 4 became 5 + 4), however short the change. Words
+        # the unchanged lines also use are ordinary vocabulary and are left out.
+        shared_words = {token for token in WorksheetPipeline._tokens('\n'.join(shared_lines)) if not token.isdigit()}
+        changed_tokens = (
+            WorksheetPipeline._tokens(added_text) ^ WorksheetPipeline._tokens(removed_text)
+        ) - shared_words
+
+        tasks = [
+            task for task in source_tasks
+            if not WorksheetPipeline._tokens(
+                task['question'] + json.dumps(task['task_data'], ensure_ascii=False)
+            ) & changed_tokens
+        ]
+
+        # Short changes in total (a new date, class name or header) never change which tasks fit;
+        # larger ones get a share of fresh tasks proportional to their size
+        min_chars = current_app.config.get('NEAR_DUPLICATE_MIN_SECTION_CHARS', 200)
+        substantial = len(added_text) + len(removed_text) >= min_chars
+        new_share = 0
+        if substantial and added_text:
+            new_share = max(1, round(num_tasks * len(added_text) / max(len(text), 1)))
+        tasks = tasks[:num_tasks - new_share]
+
+        target = num_tasks if substantial else min(num_tasks, len(source_tasks))
+        missing = target - len(tasks)
+        if missing > 0:
+            # Replacements come from the changed lines; a pure deletion leaves only the whole text
+            source_text = added_text or text
+            logger.info(f"Generating {missing} tasks for changed sections ({len(source_text)} chars)")
+            tasks += ai_generator.generate_tasks_from_text(source_text, num_tasks=missing)
+
+        return [dict(task, order_index=i) for i, task in enumerate(tasks)]
+
+    @staticmethod
+    def _prepare(worksheet_id):
+        """Mark a worksheet processing, extract its text and look for a near-duplicate of it"""
+        worksheet = Worksheet.query.get(worksheet_id)
+        if not worksheet:
+            raise ValueError(f"Worksheet {worksheet_id} not found")
+
+        TaskConverter.update_worksheet_status(worksheet_id, 'processing')
+
+        text = WorksheetPipeline.extract_worksheet_text(worksheet)
+
+        # Near-identical uploads (same template, different class name or date) reuse earlier tasks
+        signature = None
+        source, similarity = None, 0.0
+        if current_app.config.get('NEAR_DUPLICATE_DETECTION', True):
+            signature = get_near_duplicate_index().signature(text)
+            source, similarity = WorksheetPipeline._find_near_duplicate(worksheet, signature)
+
+        return text, signature, source, similarity
+
+    @staticmethod
+    def _save_reused(ai_generator, worksheet_id, source, similarity, text, num_tasks):
+        """Save the tasks reused from a near-duplicate worksheet and complete this one"""
+        logger.info(f"Worksheet {worksheet_id} matches worksheet {source.id} (similarity {similarity:.2f})")
+        tasks_data = WorksheetPipeline._reuse_near_duplicate(ai_generator, source, text, num_tasks)
+        TaskConverter.save_tasks_to_database(worksheet_id, tasks_data, status='completed')
+        return {
+            'reused_from_worksheet_id': source.id,
+            'similarity': round(similarity, 3),
+            'tasks_count': len(tasks_data)
+        }
+
+    @staticmethod
+    def _index(worksheet_id, text, signature):
+        """Make a completed worksheet findable as the source of later near-duplicates"""
+        if signature is not None:
+            get_near_duplicate_index().insert(worksheet_id, text, signature=signature)
+
+    @staticmethod
+    def process_worksheet(worksheet_id, num_tasks=15):
+        """Extract text, generate tasks and save them for a worksheet"""
+        text, signature, source, similarity = WorksheetPipeline._prepare(worksheet_id)
+
+        ai_generator = AITaskGenerator()
+
+        # Tasks and the final status are written in one transaction
+        if source:
+            result = WorksheetPipeline._save_reused(ai_generator, worksheet_id, source, similarity, text, num_tasks)
+        else:
+            # Saving each task as it streams in costs a commit per task; only worth it
+            # when open pages receive them over the event stream
+            if current_app.config.get('TASK_SSE', False):
+                tasks_data = WorksheetPipeline._stream_tasks(ai_generator, worksheet_id, text, num_tasks)
+                TaskConverter.update_worksheet_status(worksheet_id, 'completed')
+            else:
+                tasks_data = ai_generator.generate_tasks_from_text(text, num_tasks=num_tasks)
+                TaskConverter.save_tasks_to_database(worksheet_id, tasks_data, status='completed')
+            result = {'tasks_count': len(tasks_data)}
+
+        WorksheetPipeline._index(worksheet_id, text, signature)
+        return result
+
+    @staticmethod
+    async def aprocess_worksheet(app, worksheet_id, num_tasks=15):
+        """process_worksheet for the async job worker: database work runs in threads, generation awaits the API
+
+        Tasks are saved once generation finishes rather than streamed one by one,
+        since streaming would need a database round trip per task.
+        """
+        def prepare():
+            text, signature, source, similarity = WorksheetPipeline._prepare(worksheet_id)
+            if not source:
+                return text, signature, None
+
+            # Reuse is database work plus at most one small generation, so it stays synchronous
+            result = WorksheetPipeline._save_reused(AITaskGenerator(), worksheet_id, source, similarity, text, num_tasks)
+            WorksheetPipeline._index(worksheet_id, text, signature)
+            return text, signature, result
+
+        text, signature, result = await asyncio.to_thread(run_in_app_context, app, prepare)
+        if result is not None:
+            return result
+
+        tasks_data = await AITaskGenerator().agenerate_tasks_from_text(text, num_tasks=num_tasks)
+
+        def finish():
+            TaskConverter.save_tasks_to_database(worksheet_id, tasks_data, status='completed')
+            WorksheetPipeline._index(worksheet_id, text, signature)
+
+        await asyncio.to_thread(run_in_app_context, app, finish)
+        return {'tasks_count': len(tasks_data)}
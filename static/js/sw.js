@@ -0,0 +1,79 @@
+/**
+ * Service worker keeping worksheets usable on flaky classroom connections.
+ *
+ * Served from /sw.js so its scope is the whole site. Versioned URLs (offline
+ * bundles and static files with ?v=) never change, so they are answered from
+ * the cache without touching the network. Task pages and task lists are
+ * fetched fresh when possible and fall back to the last copy when not.
+ * Nothing that writes (POST) is ever cached; answers are queued by TaskManager.
+ */
+const CACHE_NAME = 'worksheets-v1';
+
+// Cross-origin styles and scripts the pages load from CDNs
+const CDN_HOSTS = ['cdn.replit.com', 'unpkg.com', 'cdn.jsdelivr.net'];
+
+self.addEventListener('install', () => {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names.filter(name => name !== CACHE_NAME).map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('message', event => {
+    // Pages ask for their bundle and assets to be stored ahead of time
+    if (event.data && event.data.type === 'cache-urls') {
+        event.waitUntil(
+            caches.open(CACHE_NAME).then(cache => Promise.all(event.data.urls.map(url =>
+                cache.match(url).then(hit => hit || cache.add(url)).catch(error => console.error('Error caching', url, error))
+            )))
+        );
+    }
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin === self.location.origin) {
+        if (url.pathname.startsWith('/bundles/') || (url.pathname.startsWith('/static/') && url.searchParams.has('v'))) {
+            event.respondWith(cacheFirst(request));
+        } else if (/^\/(api\/)?tasks\/\d+$/.test(url.pathname) || url.pathname.startsWith('/static/')) {
+            event.respondWith(networkFirst(request));
+        }
+    } else if (CDN_HOSTS.includes(url.hostname)) {
+        event.respondWith(cacheFirst(request));
+    }
+});
+
+async function cacheFirst(request) {
+    const cache = await caches.open(CACHE_NAME);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+
+    const response = await fetch(request);
+    if (response.ok || response.type === 'opaque') {
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(CACHE_NAME);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) return cached;
+        throw error;
+    }
+}
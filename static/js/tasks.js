@@ -1,21 +1,267 @@
 /**
  * TaskManager - Handles interactive task functionality
  */
+
+// Answers sent per sync request, and kept at most while waiting for a connection
+const RESPONSE_SYNC_BATCH = 200;
+const MAX_QUEUED_RESPONSES = 2000;
+
+// Same list as STOPWORDS in services/grading_engine.py
+const STOPWORDS = new Set(`
+a an and are as at be been but by can do does for from has have how in into is it its of on or
+that the their them then there these they this to was were what when where which while who why
+will with would your you also more most other such than very
+`.split(/\s+/).filter(Boolean));
+
+// toLowerCase() plus the case foldings Python's str.casefold() adds for Latin and Greek text
+const CASE_FOLDS = {'ß': 'ss', 'ς': 'σ', 'ſ': 's', 'ﬀ': 'ff', 'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬃ': 'ffi', 'ﬄ': 'ffl', 'ﬅ': 'st', 'ﬆ': 'st'};
+
+function casefold(text) {
+    return text.toLowerCase().replace(/[ßςſﬀ-ﬆ]/g, char => CASE_FOLDS[char]);
+}
+
 class TaskManager {
     constructor() {
         this.tasks = [];
         this.completedTasks = new Set();
+        this.answerKeys = {};
+        this.syncUrl = null;
+        this.worksheetId = null;
+        this.syncTimer = null;
+        this.syncing = false;
         this.initialize();
     }
 
-    static init(tasksData) {
+    static init(tasksData, options = {}) {
         const manager = new TaskManager();
         manager.tasks = tasksData;
+        manager.answerKeys = options.answerKeys || {};
+        manager.syncUrl = options.syncUrl || null;
+        manager.worksheetId = options.worksheetId || null;
         manager.setupEventListeners();
         manager.initializeDragAndDrop();
+
+        if (options.bundleUrl) {
+            manager.loadBundle(options.bundleUrl);
+        }
+        if (manager.syncUrl) {
+            window.addEventListener('online', () => manager.syncResponses());
+            manager.syncResponses();
+        }
+        if (options.serviceWorkerUrl) {
+            TaskManager.registerServiceWorker(options.serviceWorkerUrl, options.offlineUrls || []);
+        }
         return manager;
     }
 
+    static registerServiceWorker(url, offlineUrls) {
+        // The worker keeps this worksheet's bundle and page so they open without a connection
+        if (!('serviceWorker' in navigator)) return;
+        navigator.serviceWorker.register(url, {scope: '/'})
+            .then(() => navigator.serviceWorker.ready)
+            .then(registration => {
+                if (registration.active) {
+                    registration.active.postMessage({type: 'cache-urls', urls: offlineUrls});
+                }
+            })
+            .catch(error => console.error('Error registering service worker:', error));
+    }
+
+    async loadBundle(bundleUrl) {
+        // Answer keys let answers be checked in the browser, with or without a connection
+        try {
+            const response = await fetch(bundleUrl);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const bundle = await response.json();
+            this.answerKeys = bundle.answer_keys || {};
+        } catch (error) {
+            console.error('Error loading offline bundle:', error);
+        }
+    }
+
+    static pollJob(statusUrl, interval = 2000) {
+        // Poll the background job until tasks are ready, then reload the page
+        const message = document.getElementById('processingMessage');
+        const poll = async () => {
+            try {
+                const response = await fetch(statusUrl);
+                const job = await response.json();
+
+                if (job.status === 'completed') {
+                    window.location.reload();
+                    return;
+                }
+                if (job.status === 'failed') {
+                    if (message) {
+                        message.textContent = `Task generation failed: ${job.error || 'unknown error'}`;
+                    }
+                    return;
+                }
+                if (message && job.status === 'processing') {
+                    message.textContent = 'Generating interactive tasks...';
+                }
+            } catch (error) {
+                console.error('Error polling job status:', error);
+            }
+            setTimeout(poll, interval);
+        };
+        setTimeout(poll, interval);
+    }
+
+    streamTasks(streamUrl, statusUrl) {
+        // Render tasks as the server pushes them; fall back to polling without SSE support
+        if (typeof EventSource === 'undefined') {
+            TaskManager.pollJob(statusUrl);
+            return;
+        }
+
+        const message = document.getElementById('processingMessage');
+        const source = new EventSource(streamUrl);
+
+        source.addEventListener('task', (e) => {
+            const task = JSON.parse(e.data);
+            if (this.tasks.some(t => t.id == task.id)) return;
+            this.addTask(task);
+            if (message) {
+                message.textContent = `Generated ${this.tasks.length} tasks so far...`;
+            }
+        });
+
+        source.addEventListener('done', (e) => {
+            source.close();
+            const result = JSON.parse(e.data);
+            if (result.status === 'failed') {
+                if (message) message.textContent = 'Task generation failed. Please try uploading the worksheet again.';
+                return;
+            }
+            const status = document.getElementById('processingStatus');
+            if (status) status.style.display = 'none';
+        });
+
+        source.addEventListener('timeout', () => {
+            // The stream has a server-side time limit; keep waiting by polling instead
+            source.close();
+            TaskManager.pollJob(statusUrl);
+        });
+    }
+
+    addTask(task) {
+        const container = document.getElementById('tasksContainer');
+        if (!container) return;
+
+        this.tasks.push(task);
+        const wrapper = document.createElement('div');
+        wrapper.innerHTML = this.renderTaskCard(task, this.tasks.length).trim();
+        const card = wrapper.firstChild;
+        container.appendChild(card);
+
+        this.setupEventListeners(card);
+        this.initializeDragAndDrop(card);
+        this.initialize();
+        this.updateProgress();
+    }
+
+    renderTaskCard(task, number) {
+        // Mirrors the server-rendered card markup in templates/partials/task_list.html
+        const esc = TaskManager.escapeHtml;
+        const data = task.task_data || {};
+        const labels = {
+            multiple_choice: ['check-circle', 'Multiple Choice'],
+            fill_blank: ['edit', 'Fill in the Blank'],
+            short_answer: ['message-square', 'Short Answer'],
+            drag_drop: ['move', 'Drag & Drop']
+        };
+        const [icon, label] = labels[task.task_type] || ['help-circle', ''];
+        const typeName = (task.task_type || '').replace(/_/g, ' ').replace(/\b\w/g, c => c.toUpperCase());
+
+        let content = '';
+        switch (task.task_type) {
+            case 'multiple_choice':
+                content = `<div class="multiple-choice-options">${(data.options || []).map((option, i) => `
+                    <div class="form-check mb-2">
+                        <input class="form-check-input" type="radio" name="task_${task.id}"
+                               id="task_${task.id}_option_${i}" value="${i}">
+                        <label class="form-check-label" for="task_${task.id}_option_${i}">${esc(option)}</label>
+                    </div>`).join('')}</div>`;
+                break;
+
+            case 'fill_blank':
+                content = `<div class="fill-blank-input">
+                    <input type="text" class="form-control" placeholder="Enter your answer here..." id="task_${task.id}_answer">
+                </div>`;
+                break;
+
+            case 'short_answer':
+                const maxLength = data.max_length || 500;
+                content = `<div class="short-answer-input">
+                    <textarea class="form-control" rows="4" placeholder="Enter your answer here..."
+                              id="task_${task.id}_answer" maxlength="${maxLength}"></textarea>
+                    <div class="form-text">Maximum ${maxLength} characters</div>
+                </div>`;
+                break;
+
+            case 'drag_drop':
+                content = `<div class="drag-drop-container"><div class="row">
+                    <div class="col-md-6">
+                        <h6>Items to Match:</h6>
+                        <div class="draggable-items" id="task_${task.id}_items">${(data.items || []).map(item => `
+                            <div class="draggable-item badge bg-primary me-2 mb-2 p-2" draggable="true" data-item="${esc(item)}">${esc(item)}</div>`).join('')}
+                        </div>
+                    </div>
+                    <div class="col-md-6">
+                        <h6>Drop Targets:</h6>
+                        <div class="drop-targets" id="task_${task.id}_targets">${(data.targets || []).map(target => `
+                            <div class="drop-target border rounded p-3 mb-2" data-target="${esc(target)}">
+                                <div class="target-label">${esc(target)}</div>
+                                <div class="dropped-item"></div>
+                            </div>`).join('')}
+                        </div>
+                    </div>
+                </div></div>`;
+                break;
+        }
+
+        return `
+            <div class="card mb-4 task-card" data-task-id="${task.id}">
+                <div class="card-header d-flex justify-content-between align-items-center">
+                    <h5 class="card-title mb-0">
+                        <span class="badge bg-info me-2">${number}</span>
+                        <i data-feather="${icon}" class="me-1"></i>
+                        ${label}
+                    </h5>
+                    <span class="badge bg-secondary">${esc(typeName)}</span>
+                </div>
+                <div class="card-body">
+                    <div class="question mb-3">
+                        <h6 class="fw-bold">${esc(task.question)}</h6>
+                    </div>
+                    <div class="task-content">${content}</div>
+                    <div class="task-actions mt-3">
+                        <button class="btn btn-primary check-answer-btn" data-task-id="${task.id}">
+                            <i data-feather="check" class="me-1"></i>
+                            Check Answer
+                        </button>
+                        <button class="btn btn-outline-secondary reset-btn" data-task-id="${task.id}">
+                            <i data-feather="refresh-cw" class="me-1"></i>
+                            Reset
+                        </button>
+                    </div>
+                    <div class="task-feedback mt-3" id="feedback_${task.id}" style="display: none;"></div>
+                </div>
+            </div>`;
+    }
+
+    static escapeHtml(value) {
+        return String(value === undefined || value === null ? '' : value)
+            .replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;')
+            .replace(/'/g, '&#39;');
+    }
+
     initialize() {
         // Initialize Feather icons
         if (typeof feather !== 'undefined') {
@@ -23,9 +269,9 @@ class TaskManager {
         }
     }
 
-    setupEventListeners() {
+    setupEventListeners(root = document) {
         // Check answer buttons
-        document.querySelectorAll('.check-answer-btn').forEach(btn => {
+        root.querySelectorAll('.check-answer-btn').forEach(btn => {
             btn.addEventListener('click', (e) => {
                 const taskId = e.target.dataset.taskId;
                 this.checkAnswer(taskId);
@@ -33,7 +279,7 @@ class TaskManager {
         });
 
         // Reset buttons
-        document.querySelectorAll('.reset-btn').forEach(btn => {
+        root.querySelectorAll('.reset-btn').forEach(btn => {
             btn.addEventListener('click', (e) => {
                 const taskId = e.target.dataset.taskId;
                 this.resetTask(taskId);
@@ -41,7 +287,7 @@ class TaskManager {
         });
 
         // Auto-save for text inputs
-        document.querySelectorAll('input[type="text"], textarea').forEach(input => {
+        root.querySelectorAll('input[type="text"], textarea').forEach(input => {
             input.addEventListener('input', () => {
                 this.saveProgress();
             });
@@ -57,9 +303,12 @@ class TaskManager {
         const taskCard = document.querySelector(`[data-task-id="${taskId}"]`);
 
         try {
-            // For demo purposes, we'll do client-side checking
-            // In production, you'd send this to the server
-            const result = this.validateAnswer(task, answer);
+            // Graded in the browser from the bundled answer key; the server re-grades when answers sync
+            const key = this.answerKeys[taskId];
+            const result = key ? TaskManager.gradeWithKey(task, key, answer) : this.validateAnswer(task, answer);
+            if (key) {
+                this.queueResponse(taskId, answer);
+            }
             
             this.showFeedback(feedbackElement, result);
             this.updateTaskStatus(taskCard, result.is_correct);
@@ -78,6 +327,231 @@ class TaskManager {
         }
     }
 
+    async checkAll(gradeUrl) {
+        // Grade every answered task locally if all keys are bundled, otherwise with a single request
+        const answers = this.getAllAnswers();
+        if (Object.keys(answers).length === 0) return;
+
+        if (!gradeUrl || Object.keys(answers).every(taskId => this.answerKeys[taskId])) {
+            const results = {};
+            for (const [taskId, answer] of Object.entries(answers)) {
+                const task = this.tasks.find(t => t.id == taskId);
+                const key = this.answerKeys[taskId];
+                results[taskId] = key ? TaskManager.gradeWithKey(task, key, answer) : this.validateAnswer(task, answer);
+                if (key) {
+                    this.queueResponse(taskId, answer);
+                }
+            }
+            this.applyResults(results);
+            return;
+        }
+
+        try {
+            const response = await fetch(gradeUrl, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({answers})
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const summary = await response.json();
+            this.applyResults(summary.results);
+        } catch (error) {
+            console.error('Error grading answers:', error);
+        }
+    }
+
+    applyResults(results) {
+        for (const [taskId, result] of Object.entries(results)) {
+            this.showFeedback(document.getElementById(`feedback_${taskId}`), result);
+            this.updateTaskStatus(document.querySelector(`[data-task-id="${taskId}"]`), result.is_correct);
+            if (result.is_correct) {
+                this.completedTasks.add(taskId);
+            } else {
+                this.completedTasks.delete(taskId);
+            }
+        }
+        this.updateProgress();
+    }
+
+    queueKey() {
+        return `worksheet_responses_${this.worksheetId}`;
+    }
+
+    pendingResponses() {
+        try {
+            return JSON.parse(localStorage.getItem(this.queueKey()) || '[]');
+        } catch (error) {
+            return [];
+        }
+    }
+
+    queueResponse(taskId, answer) {
+        // Answers wait in localStorage until they reach the server, surviving reloads and lost connections
+        if (!this.syncUrl || !this.worksheetId) return;
+        const queue = this.pendingResponses();
+        queue.push({task_id: Number(taskId), answer: answer, answered_at: new Date().toISOString()});
+        localStorage.setItem(this.queueKey(), JSON.stringify(queue.slice(-MAX_QUEUED_RESPONSES)));
+        this.scheduleSync();
+    }
+
+    scheduleSync(delay = 2000) {
+        clearTimeout(this.syncTimer);
+        this.syncTimer = setTimeout(() => this.syncResponses(), delay);
+    }
+
+    async syncResponses() {
+        const queue = this.pendingResponses();
+        this.updateSyncStatus(queue.length);
+        if (!this.syncUrl || queue.length === 0 || this.syncing || navigator.onLine === false) return;
+
+        this.syncing = true;
+        const batch = queue.slice(0, RESPONSE_SYNC_BATCH);
+        try {
+            const response = await fetch(this.syncUrl, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({responses: batch})
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+
+            // Answers queued while the request was in flight stay for the next sync
+            const remaining = this.pendingResponses().slice(batch.length);
+            localStorage.setItem(this.queueKey(), JSON.stringify(remaining));
+            this.updateSyncStatus(remaining.length);
+            if (remaining.length > 0) {
+                this.scheduleSync(0);
+            }
+        } catch (error) {
+            console.error('Error syncing answers:', error);
+            this.scheduleSync(30000);
+        } finally {
+            this.syncing = false;
+        }
+    }
+
+    updateSyncStatus(count) {
+        const status = document.getElementById('syncStatus');
+        if (!status) return;
+        status.textContent = count > 0
+            ? `${count} answer${count === 1 ? '' : 's'} waiting to be saved`
+            : 'All answers saved';
+    }
+
+    static normalizeAnswer(value, caseSensitive = false) {
+        // Mirrors GradingEngine.normalize
+        const text = String(value).replace(/\s+/g, ' ').trim().replace(/[.!?;:,]+$/, '').trim();
+        return caseSensitive ? text : casefold(text);
+    }
+
+    static keywords(text) {
+        // Mirrors GradingEngine.keywords
+        const words = new Set();
+        for (let word of casefold(String(text)).match(/[\p{L}\p{N}_']+/gu) || []) {
+            if (word.length < 3 || STOPWORDS.has(word)) continue;
+            if (word.length > 3 && word.endsWith('s') && !word.endsWith('ss')) {
+                word = word.slice(0, -1);
+            }
+            words.add(word);
+        }
+        return words;
+    }
+
+    static gradeWithKey(task, key, answer) {
+        // Mirrors GradingEngine.grade, so offline results match what the server records
+        const data = task.task_data || {};
+        const normalize = TaskManager.normalizeAnswer;
+        let result;
+
+        try {
+            switch (task.task_type) {
+                case 'multiple_choice': {
+                    // Only what int() accepts on the server: whole numbers, or strings of digits
+                    const choice = answer === null || answer === undefined ? null : Number(answer);
+                    const unreadable = typeof answer === 'string' && !/^\s*[+-]?\d+\s*$/.test(answer);
+                    if (choice !== null && (unreadable || !Number.isInteger(choice))) {
+                        throw new TypeError('Not an option index');
+                    }
+                    const isCorrect = choice !== null && choice === key.correct;
+                    result = {
+                        is_correct: isCorrect,
+                        score: isCorrect ? 1 : 0,
+                        feedback: data.explanation || '',
+                        correct_answer: key.correct
+                    };
+                    break;
+                }
+
+                case 'fill_blank': {
+                    const isCorrect = answer !== null && answer !== undefined &&
+                        key.answers.includes(normalize(answer, key.case_sensitive));
+                    result = {
+                        is_correct: isCorrect,
+                        score: isCorrect ? 1 : 0,
+                        feedback: data.explanation || '',
+                        correct_answers: data.correct_answers || []
+                    };
+                    break;
+                }
+
+                case 'short_answer': {
+                    const text = String(answer || '').trim();
+                    if (text.length < key.min_length) {
+                        result = {is_correct: false, score: 0, feedback: 'Please provide a more detailed answer.',
+                                  sample_answer: data.sample_answer};
+                        break;
+                    }
+
+                    // A key point counts as covered when at least half of its keywords appear in the answer
+                    const words = TaskManager.keywords(text);
+                    const covered = key.points.filter(point => point.filter(word => words.has(word)).length * 2 >= point.length).length;
+                    const total = key.points.length;
+                    if (total === 0) {
+                        result = {is_correct: true, score: 1, feedback: 'Good answer! Remember to check with your teacher.',
+                                  sample_answer: data.sample_answer};
+                        break;
+                    }
+                    result = {
+                        is_correct: covered >= key.required,
+                        score: covered / total,
+                        feedback: `Your answer covers ${covered} of ${total} key points.`,
+                        sample_answer: data.sample_answer
+                    };
+                    break;
+                }
+
+                case 'drag_drop': {
+                    const given = {};
+                    for (const [item, target] of Object.entries(answer || {})) {
+                        given[normalize(item)] = normalize(target);
+                    }
+                    const matches = Object.entries(key.matches);
+                    const correct = matches.filter(([item, target]) => given[item] === target).length;
+                    const total = matches.length;
+                    const isCorrect = total > 0 && correct === total;
+                    result = {
+                        is_correct: isCorrect,
+                        score: total ? correct / total : 0,
+                        feedback: isCorrect ? 'Perfect! All matches are correct.' : `${correct} out of ${total} matches are correct.`,
+                        correct_matches: data.correct_matches || {}
+                    };
+                    break;
+                }
+
+                default:
+                    result = {is_correct: false, score: 0, feedback: 'This task type cannot be checked automatically.'};
+            }
+        } catch (error) {
+            result = {is_correct: false, score: 0, feedback: 'Answer could not be read.'};
+        }
+
+        result.score = Math.round(result.score * 1000) / 1000;
+        return result;
+    }
+
     getTaskAnswer(taskId, taskType) {
         switch (taskType) {
             case 'multiple_choice':
@@ -227,6 +701,7 @@ class TaskManager {
         
         const progressBar = document.getElementById('progressBar');
         const completedTasksElement = document.getElementById('completedTasks');
+        const totalTasksElement = document.getElementById('totalTasks');
         
         if (progressBar) {
             progressBar.style.width = `${percentage}%`;
@@ -236,6 +711,10 @@ class TaskManager {
         if (completedTasksElement) {
             completedTasksElement.textContent = completedCount;
         }
+
+        if (totalTasksElement) {
+            totalTasksElement.textContent = totalTasks;
+        }
     }
 
     resetTask(taskId) {
@@ -301,14 +780,14 @@ class TaskManager {
         });
     }
 
-    initializeDragAndDrop() {
+    initializeDragAndDrop(root = document) {
         // Initialize drag and drop for all drag-drop tasks
-        document.querySelectorAll('.draggable-item').forEach(item => {
+        root.querySelectorAll('.draggable-item').forEach(item => {
             item.addEventListener('dragstart', this.handleDragStart.bind(this));
             item.addEventListener('dragend', this.handleDragEnd.bind(this));
         });
 
-        document.querySelectorAll('.drop-target').forEach(target => {
+        root.querySelectorAll('.drop-target').forEach(target => {
             target.addEventListener('dragover', this.handleDragOver.bind(this));
             target.addEventListener('drop', this.handleDrop.bind(this));
             target.addEventListener('dragenter', this.handleDragEnter.bind(this));
@@ -0,0 +1,34 @@
+"""
+Shared fixtures: the app runs against a throwaway SQLite database and cache directory.
+"""
+import os
+import tempfile
+
+# Must be set before app.py is imported, since it creates the app at import time
+_workdir = tempfile.mkdtemp(prefix='worksheet-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ['CACHE_DIR'] = os.path.join(_workdir, 'cache')
+os.environ['JOB_EMBEDDED_WORKERS'] = '0'
+os.environ.pop('MAIL_USERNAME', None)
+
+import pytest
+from app import app as flask_app, db
+from services.cache_service import get_cache_service
+
+@pytest.fixture
+def app():
+    """The application with empty tables and an empty cache"""
+    with flask_app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        get_cache_service().clear_cache()
+        db.session.remove()
+    yield flask_app
+
+@pytest.fixture
+def app_context(app):
+    """An application context with its own database session"""
+    with app.app_context():
+        yield
+        db.session.remove()
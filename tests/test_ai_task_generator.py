@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from services.ai_task_generator import AITaskGenerator
+from services.single_flight import SingleFlight
+
+class MemoryCache:
+    """Task cache stand-in recording what was cached"""
+
+    def __init__(self):
+        self.cached = {}
+
+    def task_cache_key(self, text, num_tasks=5):
+        return f"{hash(text)}_{num_tasks}"
+
+    def get_cached_tasks(self, text, num_tasks=5):
+        return self.cached.get(self.task_cache_key(text, num_tasks))
+
+    def cache_tasks(self, text, tasks, num_tasks=5):
+        self.cached[self.task_cache_key(text, num_tasks)] = tasks
+        return True
+
+class ChunkGenerator(AITaskGenerator):
+    """Generator answering each chunk locally and failing the chunks that mention FAIL"""
+
+    def _request_tasks(self, text, num_tasks):
+        if 'FAIL' in text:
+            raise RuntimeError('429 Too Many Requests')
+        return [{'task_type': 'short_answer', 'question': f'{text[:12]} {i}', 'task_data': {}, 'order_index': i}
+                for i in range(num_tasks)]
+
+    async def _arequest_tasks(self, text, num_tasks):
+        return self._request_tasks(text, num_tasks)
+
+def make_generator(tmp_path):
+    generator = ChunkGenerator(openai_client=object(), cache_service=MemoryCache(),
+                               single_flight=SingleFlight(str(tmp_path / 'locks'), timeout=5))
+    generator.chunk_max_chars = 100
+    return generator
+
+def document(failing=False):
+    sections = [f'Section {i} ' + ('FAIL ' if failing and i == 1 else '') + 'text ' * 15 for i in range(3)]
+    return '\n\n'.join(sections)
+
+def test_chunked_generation_merges_in_document_order(tmp_path):
+    generator = make_generator(tmp_path)
+
+    tasks = generator.generate_tasks_from_text(document(), num_tasks=9)
+
+    assert [task['order_index'] for task in tasks] == list(range(9))
+    assert [task['question'][:9] for task in tasks[::3]] == ['Section 0', 'Section 1', 'Section 2']
+    assert list(generator._stream_chunked_tasks(document(), 9)) == tasks
+
+def test_failed_chunk_fails_generation_and_caches_nothing(tmp_path):
+    generator = make_generator(tmp_path)
+
+    with pytest.raises(Exception, match='chunk 1'):
+        generator.generate_tasks_from_text(document(failing=True), num_tasks=9)
+    with pytest.raises(Exception, match='chunk 1'):
+        list(generator.stream_tasks_from_text(document(failing=True), num_tasks=9))
+
+    assert generator.cache_service.cached == {}
+
+def test_failed_chunk_fails_async_generation_and_caches_nothing(tmp_path):
+    generator = make_generator(tmp_path)
+
+    with pytest.raises(Exception, match='chunk 1'):
+        asyncio.run(generator.agenerate_tasks_from_text(document(failing=True), num_tasks=9))
+
+    assert generator.cache_service.cached == {}
@@ -0,0 +1,28 @@
+import io
+import os
+import hashlib
+import pytest
+from werkzeug.datastructures import FileStorage
+from services.blob_store import BlobStore
+
+def upload(data, filename):
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+def test_identical_uploads_share_one_blob(app, tmp_path):
+    first = BlobStore.save_upload(upload(b'%PDF-1.4 same', 'a.pdf'), str(tmp_path))
+    second = BlobStore.save_upload(upload(b'%PDF-1.4 same', '../b.PDF'), str(tmp_path))
+
+    sha256 = hashlib.sha256(b'%PDF-1.4 same').hexdigest()
+    assert first['filename'] == second['filename'] == BlobStore.blob_path(sha256, 'pdf')
+    assert (first['deduplicated'], second['deduplicated']) == (False, True)
+    assert second['size'] == len(b'%PDF-1.4 same')
+    with open(first['file_path'], 'rb') as f:
+        assert f.read() == b'%PDF-1.4 same'
+
+    # The single temp file of each upload was moved or removed
+    assert os.listdir(tmp_path / BlobStore.BLOB_DIR / 'tmp') == []
+
+def test_disallowed_upload_is_rejected_before_writing(app, tmp_path):
+    with pytest.raises(Exception, match='File type not allowed'):
+        BlobStore.save_upload(upload(b'#!/bin/sh', 'run.sh'), str(tmp_path))
+    assert not (tmp_path / BlobStore.BLOB_DIR).exists()
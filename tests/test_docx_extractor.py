@@ -0,0 +1,85 @@
+import io
+import zipfile
+import docx
+from services.docx_extractor import DocxExtractor
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+MC_NS = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+
+def saved(document):
+    stream = io.BytesIO()
+    document.save(stream)
+    stream.seek(0)
+    return stream
+
+def raw_docx(body):
+    """A DOCX package holding just a document part with the given body XML"""
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, 'w') as archive:
+        archive.writestr(DocxExtractor.DOCUMENT_PART,
+                         f'<w:document xmlns:w="{W_NS}" xmlns:mc="{MC_NS}"><w:body>{body}</w:body></w:document>')
+    stream.seek(0)
+    return stream
+
+def p(text):
+    return f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>'
+
+def test_paragraphs_and_tables_in_document_order():
+    document = docx.Document()
+    document.add_paragraph('Before the table')
+    table = document.add_table(rows=2, cols=2)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f'r{r}c{c}'
+    document.add_paragraph('After the table')
+
+    assert DocxExtractor.extract_text(saved(document)).split('\n') == [
+        'Before the table', 'r0c0 r0c1', 'r1c0 r1c1', 'After the table'
+    ]
+
+def test_runs_tabs_and_breaks_match_python_docx():
+    document = docx.Document()
+    paragraph = document.add_paragraph('Name:')
+    paragraph.add_run().add_tab()
+    paragraph.add_run('____')
+    paragraph.add_run().add_break()
+    paragraph.add_run('Date')
+    stream = saved(document)
+
+    expected = docx.Document(stream).paragraphs[0].text
+    stream.seek(0)
+    assert DocxExtractor.extract_text(stream) == expected == 'Name:\t____\nDate'
+
+def test_content_controls_and_nested_tables():
+    body = (
+        p('Title')
+        + f'<w:sdt><w:sdtContent>{p("Inside a content control")}</w:sdtContent></w:sdt>'
+        + '<w:tbl><w:tr>'
+        + f'<w:tc>{p("outer")}<w:tbl><w:tr><w:tc>{p("inner")}</w:tc></w:tr></w:tbl></w:tc>'
+        + f'<w:sdt><w:sdtContent><w:tc>{p("wrapped cell")}</w:tc></w:sdtContent></w:sdt>'
+        + '</w:tr></w:tbl>'
+    )
+    assert DocxExtractor.extract_text(raw_docx(body)).split('\n') == [
+        'Title', 'Inside a content control', 'outer wrapped cell', 'inner'
+    ]
+
+def test_alternate_content_is_read_once():
+    body = (
+        '<w:p><w:r><mc:AlternateContent>'
+        '<mc:Choice Requires="wps"><w:t>Text box</w:t></mc:Choice>'
+        '<mc:Fallback><w:t>Text box</w:t></mc:Fallback>'
+        '</mc:AlternateContent></w:r></w:p>'
+    )
+    assert DocxExtractor.extract_text(raw_docx(body)) == 'Text box'
+
+def test_external_entities_are_not_resolved(tmp_path):
+    secret = tmp_path / 'secret.txt'
+    secret.write_text('TOP SECRET')
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, 'w') as archive:
+        archive.writestr(DocxExtractor.DOCUMENT_PART, (
+            f'<?xml version="1.0"?><!DOCTYPE d [<!ENTITY secret SYSTEM "{secret.as_uri()}">]>'
+            f'<w:document xmlns:w="{W_NS}"><w:body>{p("before &secret; after")}</w:body></w:document>'
+        ))
+    stream.seek(0)
+    assert 'TOP SECRET' not in DocxExtractor.extract_text(stream)
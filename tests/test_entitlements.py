@@ -0,0 +1,65 @@
+import uuid
+from datetime import datetime, timedelta
+from models import User, EmailVerification, db
+from services.entitlements import EntitlementService
+from services.email_verification import EmailVerificationService
+from services.quota_service import QuotaService
+
+def verify(email):
+    db.session.add(EmailVerification(email=email, token=uuid.uuid4().hex, verified=True,
+                                      expires_at=datetime.utcnow() + timedelta(days=1)))
+    db.session.commit()
+
+def test_cached_entitlement_is_not_shared_between_differently_cased_emails(app_context):
+    verify('Alice@x.com')
+    db.session.add(User(email='Alice@x.com', worksheets_processed=0))
+    db.session.commit()
+
+    assert EntitlementService.is_verified('Alice@x.com')
+    assert EntitlementService.get('Alice@x.com')['user_id'] is not None
+
+    assert not EntitlementService.is_verified('alice@x.com')
+    assert EntitlementService.get('alice@x.com')['user_id'] is None
+
+def test_entitlement_is_served_from_cache_until_invalidated(app_context):
+    db.session.add(User(email='cached@example.com', worksheets_processed=0))
+    db.session.commit()
+    assert EntitlementService.get('cached@example.com')['remaining'] == User.FREE_WORKSHEET_LIMIT
+
+    # A write that bypasses the services is not seen until the entry is invalidated
+    User.query.filter_by(email='cached@example.com').update({'subscription_status': 'active'})
+    db.session.commit()
+    assert EntitlementService.get('cached@example.com')['plan'] == 'free'
+
+    EntitlementService.invalidate('cached@example.com')
+    assert EntitlementService.get('cached@example.com')['plan'] == 'premium'
+
+def test_quota_reservation_invalidates_the_entitlement(app_context):
+    db.session.add(User(email='quota@example.com', worksheets_processed=0))
+    db.session.commit()
+    assert EntitlementService.get('quota@example.com')['remaining'] == User.FREE_WORKSHEET_LIMIT
+
+    QuotaService.reserve('quota@example.com')
+    db.session.commit()
+
+    assert EntitlementService.get('quota@example.com')['remaining'] == User.FREE_WORKSHEET_LIMIT - 1
+
+def test_verification_is_visible_immediately(app_context):
+    token = EmailVerificationService.create_verification_request('new@example.com')
+    assert not EntitlementService.is_verified('new@example.com')
+
+    email, error = EmailVerificationService.verify_email_token(token)
+
+    assert (email, error) == ('new@example.com', None)
+    assert EntitlementService.is_verified('new@example.com')
+
+def test_refusal_is_confirmed_against_the_database(app_context):
+    db.session.add(User(email='full@example.com', worksheets_processed=User.FREE_WORKSHEET_LIMIT))
+    db.session.commit()
+    assert not EntitlementService.can_process('full@example.com')
+
+    # Upgrading without invalidating: the cached refusal is re-read, not trusted
+    User.query.filter_by(email='full@example.com').update({'subscription_status': 'active'})
+    db.session.commit()
+
+    assert EntitlementService.can_process('full@example.com')
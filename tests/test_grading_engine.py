@@ -0,0 +1,104 @@
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+from services.grading_engine import GradingEngine
+
+TASKS_JS = Path(__file__).resolve().parent.parent / 'static' / 'js' / 'tasks.js'
+
+def task(task_type, **task_data):
+    return SimpleNamespace(task_type=task_type, task_data=task_data,
+                           answer_key=GradingEngine.compile(task_type, task_data))
+
+MULTIPLE_CHOICE = task('multiple_choice', options=['a', 'b', 'c'], correct_answer=1, explanation='B it is')
+FILL_BLANK = task('fill_blank', correct_answers=['Photosynthesis', ' photosynthesis. ', 'Chlorophyll'])
+GERMAN = task('fill_blank', correct_answers=['Straße', 'Ärger', 'Schiff', 'λόγος'])
+CASE_SENSITIVE = task('fill_blank', correct_answers=['NaCl'], case_sensitive=True)
+SHORT_ANSWER = task('short_answer', key_points=[
+    'Plants use sunlight', 'Carbon dioxide is absorbed', 'Oxygen is released', 'It happens in the leaves'
+], sample_answer='...')
+DRAG_DROP = task('drag_drop', correct_matches={'Cat': 'Mammal', 'Eagle': 'Bird', 'Shark': 'Fish'})
+
+CASES = [
+    (MULTIPLE_CHOICE, 1), (MULTIPLE_CHOICE, '1'), (MULTIPLE_CHOICE, 2), (MULTIPLE_CHOICE, None),
+    (MULTIPLE_CHOICE, '1.5'), (MULTIPLE_CHOICE, 1.5), (MULTIPLE_CHOICE, 1.0), (MULTIPLE_CHOICE, ' 1 '),
+    (MULTIPLE_CHOICE, 'b'), (MULTIPLE_CHOICE, ''), (MULTIPLE_CHOICE, '0x1'),
+    (FILL_BLANK, 'photosynthesis'), (FILL_BLANK, '  PHOTOSYNTHESIS!! '), (FILL_BLANK, 'chlorophyll.'),
+    (FILL_BLANK, 'respiration'), (FILL_BLANK, None),
+    (GERMAN, 'STRASSE'), (GERMAN, 'straße'), (GERMAN, 'ÄRGER'), (GERMAN, 'ſchiﬀ'), (GERMAN, 'ΛΌΓΟΣ'),
+    (CASE_SENSITIVE, 'NaCl'), (CASE_SENSITIVE, 'nacl'),
+    (SHORT_ANSWER, 'short'), (SHORT_ANSWER, 'Plants absorb sunlight and carbon dioxide'),
+    (SHORT_ANSWER, 'Plants use sunlight, absorb carbon dioxide and release oxygen in their leaves'),
+    (SHORT_ANSWER, 'Something entirely unrelated to the question'),
+    (SHORT_ANSWER, 'PLANTS USE SUNLIGHT; ΟΞΥΓΌΝΟ and oxygen are RELEASED'),
+    (DRAG_DROP, {'cat': 'mammal', 'eagle': 'bird', 'shark': 'fish'}),
+    (DRAG_DROP, {'Cat': 'Mammal', 'Eagle': 'Fish'}), (DRAG_DROP, None),
+]
+
+def test_compiled_keys_are_normalized():
+    assert FILL_BLANK.answer_key['answers'] == ['photosynthesis', 'chlorophyll']
+    assert SHORT_ANSWER.answer_key['points'] == [
+        ['plant', 'use', 'sunlight'], ['carbon', 'dioxide', 'absorbed'], ['oxygen', 'released'], ['happen', 'leave']
+    ]
+    assert SHORT_ANSWER.answer_key['required'] == 2
+    assert DRAG_DROP.answer_key['matches'] == {'cat': 'mammal', 'eagle': 'bird', 'shark': 'fish'}
+    assert GradingEngine.compile('matching', {}) is None
+
+def test_grade():
+    assert GradingEngine.grade(MULTIPLE_CHOICE, '1')['is_correct']
+    for unreadable in ('b', '', 1.5):
+        assert GradingEngine.grade(MULTIPLE_CHOICE, unreadable)['feedback'] == 'Answer could not be read.'
+    assert GradingEngine.grade(FILL_BLANK, '  PHOTOSYNTHESIS!! ')['is_correct']
+    assert not GradingEngine.grade(CASE_SENSITIVE, 'nacl')['is_correct']
+
+    partial = GradingEngine.grade(SHORT_ANSWER, 'Plants absorb sunlight and carbon dioxide')
+    assert (partial['is_correct'], partial['score']) == (True, 0.5)
+    assert GradingEngine.grade(SHORT_ANSWER, 'short')['score'] == 0.0
+
+    matches = GradingEngine.grade(DRAG_DROP, {'Cat': 'Mammal', 'Eagle': 'Fish'})
+    assert (matches['is_correct'], matches['score']) == (False, 0.333)
+
+def test_stale_key_is_recompiled():
+    stale = SimpleNamespace(task_type='fill_blank', task_data={'correct_answers': ['Paris']},
+                            answer_key={'answers': ['london'], 'version': GradingEngine.KEY_VERSION - 1})
+    assert GradingEngine.grade(stale, 'paris')['is_correct']
+
+def test_every_answer_gets_a_score_between_zero_and_one():
+    for t, answer in CASES:
+        result = GradingEngine.grade(t, answer)
+        assert 0.0 <= result['score'] <= 1.0
+        assert result['is_correct'] == (result['score'] == 1.0) or t is SHORT_ANSWER
+
+# Loads tasks.js without a browser and grades every case with TaskManager.gradeWithKey
+NODE_GRADER = """
+const vm = require('vm');
+const fs = require('fs');
+const context = {document: {addEventListener() {}}, window: {}, console};
+vm.createContext(context);
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8') + '\\nthis.TaskManager = TaskManager;', context);
+const cases = JSON.parse(fs.readFileSync(0, 'utf8'));
+const results = cases.map(([task, key, answer]) => {
+    const result = context.TaskManager.gradeWithKey(task, key, answer);
+    return {is_correct: result.is_correct, score: result.score, feedback: result.feedback};
+});
+process.stdout.write(JSON.stringify(results));
+"""
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+def test_browser_grader_matches_the_server():
+    cases = [
+        [{'task_type': t.task_type, 'task_data': t.task_data}, t.answer_key, answer]
+        for t, answer in CASES
+    ]
+    output = subprocess.run(
+        ['node', '-e', NODE_GRADER, str(TASKS_JS)],
+        input=json.dumps(cases), capture_output=True, text=True, check=True
+    ).stdout
+
+    expected = [
+        {key: GradingEngine.grade(t, answer)[key] for key in ('is_correct', 'score', 'feedback')}
+        for t, answer in CASES
+    ]
+    assert json.loads(output) == expected
@@ -0,0 +1,103 @@
+import threading
+from datetime import datetime, timedelta
+from models import ProcessingJob, db
+from services.job_queue import JobQueue
+
+def enqueue(count, **kwargs):
+    return [JobQueue.enqueue('test', payload={'n': i}, **kwargs).id for i in range(count)]
+
+def test_claim_next_takes_the_oldest_pending_job(app_context):
+    first, second = enqueue(2)
+
+    job = JobQueue.claim_next()
+    assert job.id == first
+    assert job.status == 'processing'
+    assert job.attempts == 1
+    assert job.claim_token and job.locked_at
+
+    assert JobQueue.claim_next().id == second
+    assert JobQueue.claim_next() is None
+
+def test_claimed_job_is_not_claimed_again(app_context):
+    job_id, = enqueue(1)
+    token = JobQueue.claim_next().claim_token
+
+    assert JobQueue.claim_next() is None
+    assert db.session.get(ProcessingJob, job_id).claim_token == token
+
+def test_concurrent_claims_take_each_job_exactly_once(app):
+    with app.app_context():
+        job_ids = enqueue(40)
+        db.session.remove()
+
+    claimed = []
+    lock = threading.Lock()
+
+    def worker():
+        with app.app_context():
+            while True:
+                job = JobQueue.claim_next()
+                if job is None:
+                    break
+                with lock:
+                    claimed.append(job.id)
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == job_ids
+
+def test_failed_job_is_retried_until_max_attempts(app_context):
+    job_id, = enqueue(1, max_attempts=2)
+
+    job = JobQueue.claim_next()
+    JobQueue.mark_failed(job, job.claim_token, 'first failure')
+    job = db.session.get(ProcessingJob, job_id)
+    assert job.status == 'pending'
+    assert job.claim_token is None
+
+    job = JobQueue.claim_next()
+    JobQueue.mark_failed(job, job.claim_token, 'second failure')
+    job = db.session.get(ProcessingJob, job_id)
+    assert job.status == 'failed'
+    assert job.error_message == 'second failure'
+    assert JobQueue.claim_next() is None
+
+def expire_lease(job_id):
+    db.session.get(ProcessingJob, job_id).locked_at = datetime.utcnow() - timedelta(hours=1)
+    db.session.commit()
+
+def test_stale_job_is_requeued_and_the_old_claim_is_dropped(app_context):
+    job_id, = enqueue(1, max_attempts=3)
+    stale_token = JobQueue.claim_next().claim_token
+    expire_lease(job_id)
+
+    assert JobQueue.requeue_stale_jobs(60) == 1
+    job = JobQueue.claim_next()
+    assert job.id == job_id and job.claim_token != stale_token
+
+    # The first worker finishing late must not overwrite the new claim
+    assert not JobQueue.mark_completed(job, stale_token, {'late': True})
+    assert not JobQueue.mark_failed(job, stale_token, 'late failure')
+    job = db.session.get(ProcessingJob, job_id)
+    assert job.status == 'processing'
+    assert job.result is None and job.error_message == 'Worker lease expired'
+
+    assert JobQueue.mark_completed(job, job.claim_token, {'ok': True})
+    job = db.session.get(ProcessingJob, job_id)
+    assert job.status == 'completed' and job.result == {'ok': True}
+
+def test_renewed_lease_is_not_requeued(app_context):
+    job_id, = enqueue(1)
+    token = JobQueue.claim_next().claim_token
+    expire_lease(job_id)
+
+    assert JobQueue.heartbeat(job_id, token)
+    assert JobQueue.requeue_stale_jobs(60) == 0
+    assert db.session.get(ProcessingJob, job_id).status == 'processing'
+
+    assert not JobQueue.heartbeat(job_id, 'someone-else')
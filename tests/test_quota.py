@@ -0,0 +1,95 @@
+import threading
+from models import User, ProcessingJob, db
+from services.quota_service import QuotaService
+
+LIMIT = User.FREE_WORKSHEET_LIMIT
+
+def add_user(email, **kwargs):
+    db.session.add(User(email=email, worksheets_processed=0, **kwargs))
+    db.session.commit()
+
+def usage(email):
+    db.session.expire_all()
+    return User.query.filter_by(email=email).first().worksheets_processed
+
+def test_reserve_stops_at_the_free_limit(app_context):
+    add_user('free@example.com')
+
+    results = []
+    for _ in range(LIMIT + 2):
+        results.append(QuotaService.reserve('free@example.com'))
+        db.session.commit()
+
+    assert results == list(range(1, LIMIT + 1)) + [None, None]
+    assert usage('free@example.com') == LIMIT
+
+def test_premium_users_are_not_limited(app_context):
+    add_user('premium@example.com', subscription_status='active')
+
+    for _ in range(LIMIT + 2):
+        assert QuotaService.reserve('premium@example.com') is not None
+        db.session.commit()
+
+    assert usage('premium@example.com') == LIMIT + 2
+
+def test_parallel_reserves_never_exceed_the_limit(app):
+    with app.app_context():
+        add_user('race@example.com')
+        db.session.remove()
+
+    accepted = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(LIMIT * 4)
+
+    def reserve():
+        with app.app_context():
+            barrier.wait()
+            result = QuotaService.reserve('race@example.com')
+            db.session.commit()
+            if result is not None:
+                with lock:
+                    accepted.append(result)
+            db.session.remove()
+
+    threads = [threading.Thread(target=reserve) for _ in range(LIMIT * 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        assert len(accepted) == LIMIT
+        assert usage('race@example.com') == LIMIT
+
+def test_reserve_is_not_committed(app_context):
+    add_user('rollback@example.com')
+
+    assert QuotaService.reserve('rollback@example.com') == 1
+    db.session.rollback()
+
+    assert usage('rollback@example.com') == 0
+
+def test_release_gives_slots_back(app_context):
+    add_user('release@example.com')
+    QuotaService.reserve('release@example.com', count=2)
+    db.session.commit()
+
+    QuotaService.release('release@example.com')
+    db.session.commit()
+
+    assert usage('release@example.com') == 1
+
+def test_settle_job_releases_the_reservation_once(app_context):
+    add_user('settle@example.com')
+    QuotaService.reserve('settle@example.com', count=2)
+    job = ProcessingJob(kind='test', user_email='settle@example.com', status='failed', payload={'quota_reserved': 2})
+    db.session.add(job)
+    db.session.commit()
+
+    QuotaService.settle_job(job)
+    db.session.commit()
+    QuotaService.settle_job(job)
+    db.session.commit()
+
+    assert job.payload['quota_reserved'] == 0
+    assert usage('settle@example.com') == 0
@@ -0,0 +1,52 @@
+from models import Worksheet, Task, TaskResponse, TaskStats, WorksheetStats, db
+from services.response_buffer import ResponseBuffer
+
+CORRECT = {'is_correct': True, 'score': 1.0}
+WRONG = {'is_correct': False, 'score': 0.0}
+
+def make_task():
+    worksheet = Worksheet(filename='w.txt', original_filename='w.txt', file_type='txt', processing_status='completed')
+    db.session.add(worksheet)
+    db.session.flush()
+    task = Task(worksheet_id=worksheet.id, task_type='free_text', question='Q', task_data={})
+    db.session.add(task)
+    db.session.commit()
+    return task.id, worksheet.id
+
+def test_flush_writes_responses_and_totals(app):
+    with app.app_context():
+        task_id, worksheet_id = make_task()
+        db.session.remove()
+
+    buffer = ResponseBuffer(app, flush_interval=60)
+    buffer.add(task_id, worksheet_id, 's1', 'a', CORRECT)
+    buffer.add(task_id, worksheet_id, 's2', 'b', WRONG)
+    assert buffer.flush() == 2
+    buffer.add(task_id, worksheet_id, 's3', 'a', CORRECT)
+    assert buffer.flush() == 1
+
+    with app.app_context():
+        assert TaskResponse.query.count() == 3
+        stats = db.session.get(TaskStats, task_id)
+        assert (stats.attempts, stats.correct, stats.score_total) == (3, 2, 2.0)
+        assert db.session.get(WorksheetStats, worksheet_id).attempts == 3
+
+def test_responses_for_deleted_tasks_do_not_block_the_buffer(app):
+    with app.app_context():
+        task_id, worksheet_id = make_task()
+        deleted_id, _ = make_task()
+        Task.query.filter_by(id=deleted_id).delete()
+        db.session.commit()
+        db.session.remove()
+
+    buffer = ResponseBuffer(app, flush_interval=60)
+    buffer.add(deleted_id, worksheet_id, 's1', 'a', CORRECT)
+    buffer.add(task_id, worksheet_id, 's1', 'a', CORRECT)
+
+    assert buffer.flush() == 1
+    assert buffer.pending() == 0
+    assert buffer.stats['dropped'] == 1
+
+    with app.app_context():
+        assert [response.task_id for response in TaskResponse.query.all()] == [task_id]
+        assert db.session.get(TaskStats, deleted_id) is None
@@ -0,0 +1,47 @@
+import json
+from services.task_stream_parser import TaskStreamParser
+
+TASKS = [
+    {'task_type': 'fill_blank', 'question': 'Braces {inside} and [brackets] in "quotes"', 'task_data': {'correct_answers': ['a']}},
+    {'task_type': 'multiple_choice', 'question': 'Escaped \\ backslash \\"', 'task_data': {'options': ['x', 'y'], 'correct_answer': 0}},
+    {'task_type': 'short_answer', 'question': 'Ünïcödé — ok?', 'task_data': {'key_points': [], 'nested': {'deep': [1, {'x': '}'}]}}},
+]
+RESPONSE = json.dumps({'title': 'Worksheet', 'tasks': TASKS}, ensure_ascii=False, indent=2) + '\n'
+
+def parse(chunks):
+    parser = TaskStreamParser()
+    tasks = []
+    for chunk in chunks:
+        tasks.extend(parser.feed(chunk))
+    return tasks, parser
+
+def test_whole_response_at_once():
+    tasks, parser = parse([RESPONSE])
+    assert tasks == TASKS
+    assert parser.finished
+
+def test_every_split_point_gives_the_same_tasks():
+    for cut in range(1, len(RESPONSE)):
+        assert parse([RESPONSE[:cut], RESPONSE[cut:]])[0] == TASKS, cut
+
+def test_tasks_are_emitted_as_soon_as_they_close():
+    parser = TaskStreamParser()
+    emitted = [len(parser.feed(char)) for char in RESPONSE]
+    assert sum(emitted) == len(TASKS)
+
+    # The first task is available before the second one starts arriving
+    first_done = emitted.index(1)
+    assert RESPONSE[:first_done + 1].rstrip().endswith('}')
+    assert json.dumps(TASKS[1]['question'], ensure_ascii=False) not in RESPONSE[:first_done + 1]
+
+    # Text of emitted tasks is not kept around
+    assert len(parser.buffer) < 10
+
+def test_malformed_task_is_skipped():
+    tasks, _ = parse(['{"tasks": [{"question": "ok"}, {"question": bad}, {"question": "also ok"}]}'])
+    assert tasks == [{'question': 'ok'}, {'question': 'also ok'}]
+
+def test_text_after_the_array_is_ignored():
+    tasks, parser = parse(['{"tasks": [{"a": 1}]', ', "more": [{"b": 2}]}'])
+    assert tasks == [{'a': 1}]
+    assert parser.feed('{"c": 3}') == []
@@ -0,0 +1,35 @@
+from models import Worksheet, db
+from services.task_converter import TaskConverter
+
+def make_worksheet(app, status):
+    with app.app_context():
+        worksheet = Worksheet(filename='w.txt', original_filename='w.txt', file_type='txt', processing_status='pending')
+        db.session.add(worksheet)
+        db.session.commit()
+        task = {'task_type': 'free_text', 'question': 'Q', 'task_data': {'correct_answer': 'a'}, 'order_index': 0}
+        TaskConverter.save_tasks_to_database(worksheet.id, [task], status=status)
+        worksheet_id = worksheet.id
+        db.session.remove()
+    return worksheet_id
+
+def test_completed_tasks_are_publicly_cacheable(app):
+    worksheet_id = make_worksheet(app, 'completed')
+    client = app.test_client()
+
+    for _ in range(2):
+        response = client.get(f'/api/tasks/{worksheet_id}')
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'].startswith('public, max-age=')
+
+def test_tasks_still_generating_are_not_cached(app):
+    worksheet_id = make_worksheet(app, 'processing')
+    client = app.test_client()
+
+    response = client.get(f'/api/tasks/{worksheet_id}')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert len(response.get_json()['tasks']) == 1
+
+    # Polling still revalidates cheaply against the ETag
+    response = client.get(f'/api/tasks/{worksheet_id}', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
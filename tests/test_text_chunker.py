@@ -0,0 +1,35 @@
+from services.text_chunker import TextChunker
+
+def test_short_text_is_one_chunk():
+    assert TextChunker(100).split('short text') == ['short text']
+
+def test_chunks_respect_the_size_limit_and_keep_every_section():
+    sections = [f'Section {i} ' + 'word ' * 20 for i in range(12)]
+    text = '\n\n'.join(sections)
+
+    chunks = TextChunker(300).split(text)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert '\n\n'.join(chunks).split('\n\n') == [section.strip() for section in sections]
+
+def test_pages_are_packed_into_chunks_as_sections():
+    chunks = TextChunker(30).split('first page text\fsecond page text\fthird page')
+    assert chunks == ['first page text', 'second page text\n\nthird page']
+
+def test_oversized_lines_are_cut():
+    chunks = TextChunker(50).split('x' * 120)
+    assert chunks == ['x' * 50, 'x' * 50, 'x' * 20]
+
+def test_allocate_tasks_adds_up_and_follows_length():
+    chunks = ['a' * 600, 'b' * 300, 'c' * 100]
+
+    counts = TextChunker.allocate_tasks(chunks, 15)
+
+    assert sum(counts) == 15
+    assert counts[0] > counts[1] > counts[2]
+
+def test_allocate_tasks_uses_largest_remainders():
+    # Shares are 3.33 each; the remainder goes to the first chunk in a stable sort
+    assert TextChunker.allocate_tasks(['a' * 10] * 3, 10) == [4, 3, 3]
+    assert TextChunker.allocate_tasks(['a' * 10] * 4, 2) == [1, 1, 0, 0]
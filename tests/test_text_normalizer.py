@@ -0,0 +1,31 @@
+from services.text_normalizer import normalize_text, content_hash, PAGE_BREAK
+
+def test_unicode_invisible_characters_and_whitespace():
+    # Soft hyphen, zero-width space, ligature, CRLF and a tab
+    assert normalize_text('Photo\u00adsyn\u200bthesis  uses\r\n\tsun\ufb01ght\r') == 'Photosynthesis uses sunfight'
+    # Byte order mark, full-width letters and a circled digit
+    assert normalize_text('\ufeff\uff21\uff22\uff23 \u2460') == 'ABC 1'
+    assert normalize_text(None) == ''
+
+def test_page_number_lines_are_dropped():
+    text = 'Page 3 of 10\nQuestion one\n3/10\n- 3 -\nQuestion two\npage 4'
+    assert normalize_text(text) == 'Question one Question two'
+
+def test_bare_numbers_only_count_as_page_numbers_at_page_edges():
+    assert normalize_text('7\nWhat is 6 + 36?\n42\nThe answer\n8') == 'What is 6 + 36? 42 The answer'
+
+def test_headers_and_footers_repeated_on_most_pages_are_dropped():
+    pages = [
+        f'Science Unit 2 - Sheet {n}\nQuestion {n}a\nQuestion {n}b\nMrs Smith, Class 5a'
+        for n in range(1, 5)
+    ]
+    assert normalize_text(PAGE_BREAK.join(pages)) == ' '.join(f'Question {n}a Question {n}b' for n in range(1, 5))
+
+    # Two pages are not enough to tell a header from content
+    assert normalize_text(PAGE_BREAK.join(pages[:2])).startswith('Science Unit 2 - Sheet 1')
+
+def test_trivially_different_exports_share_a_content_hash():
+    pdf_export = 'Worksheet 1\n\nName:   ____\r\n\ufb01ll in the blanks\fPage 2\nThe end'
+    docx_export = 'Worksheet 1\nName: ____\nfill in the blanks\nThe end'
+    assert content_hash(pdf_export) == content_hash(docx_export)
+    assert content_hash(docx_export) != content_hash(docx_export.replace('end', 'start'))
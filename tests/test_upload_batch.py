@@ -0,0 +1,51 @@
+import io
+import uuid
+from datetime import datetime, timedelta
+from models import User, EmailVerification, ProcessingJob, db
+
+LIMIT = User.FREE_WORKSHEET_LIMIT
+
+def verify(email):
+    db.session.add(EmailVerification(email=email, token=uuid.uuid4().hex, verified=True,
+                                      expires_at=datetime.utcnow() + timedelta(days=1)))
+    db.session.commit()
+
+def post_batch(client, count, email=None):
+    data = {'files': [(io.BytesIO(f'worksheet {i}'.encode()), f'sheet-{i}.pdf') for i in range(count)]}
+    if email:
+        data['email'] = email
+    return client.post('/api/upload/batch', data=data, content_type='multipart/form-data')
+
+def test_anonymous_batch_is_rejected(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    response = post_batch(app.test_client(), 1)
+
+    assert response.status_code == 401
+    with app.app_context():
+        assert ProcessingJob.query.count() == 0
+
+def test_unverified_batch_is_rejected(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    response = post_batch(app.test_client(), 1, email='new@example.com')
+
+    assert response.status_code == 403
+    with app.app_context():
+        assert ProcessingJob.query.count() == 0
+
+def test_batch_reserves_the_quota_of_a_verified_email(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    with app.app_context():
+        verify('teacher@example.com')
+        db.session.remove()
+    client = app.test_client()
+
+    assert post_batch(client, LIMIT + 1, email='teacher@example.com').status_code == 403
+
+    response = post_batch(client, LIMIT, email='teacher@example.com')
+    assert response.status_code == 202
+    with app.app_context():
+        job = db.session.get(ProcessingJob, response.get_json()['job_id'])
+        assert job.payload['quota_reserved'] == LIMIT
+        assert User.query.filter_by(email='teacher@example.com').first().worksheets_processed == LIMIT
+
+    assert post_batch(client, 1, email='teacher@example.com').status_code == 403
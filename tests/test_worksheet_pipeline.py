@@ -0,0 +1,73 @@
+from models import Worksheet, db
+from services.task_converter import TaskConverter
+from services.worksheet_pipeline import WorksheetPipeline
+
+class RecordingGenerator:
+    def __init__(self):
+        self.calls = []
+
+    def generate_tasks_from_text(self, text, num_tasks=15):
+        self.calls.append((text, num_tasks))
+        return [
+            {'task_type': 'free_text', 'question': f'new {i}', 'task_data': {'correct_answer': ''}}
+            for i in range(num_tasks)
+        ]
+
+def sheet(problems, header='Class 5a'):
+    return '\n'.join([header] + [f'{a} + {b} = ___' for a, b in problems])
+
+def arithmetic_task(a, b):
+    return {
+        'task_type': 'free_text',
+        'question': f'What is {a} + {b}?',
+        'task_data': {'correct_answer': str(a + b)}
+    }
+
+def make_source(problems):
+    source = Worksheet(
+        filename='source.txt', original_filename='source.txt', file_type='txt',
+        extracted_text=sheet(problems), processing_status='completed'
+    )
+    db.session.add(source)
+    db.session.commit()
+    TaskConverter.save_tasks_to_database(source.id, [dict(arithmetic_task(a, b), order_index=i) for i, (a, b) in enumerate(problems)], status='completed')
+    return source
+
+PROBLEMS = [(a, a + 10) for a in range(10, 50)]
+
+def test_header_change_reuses_every_task(app_context):
+    source = make_source(PROBLEMS)
+    generator = RecordingGenerator()
+
+    tasks = WorksheetPipeline._reuse_near_duplicate(generator, source, sheet(PROBLEMS, header='Class 5b'), 15)
+
+    assert [task['question'] for task in tasks] == [arithmetic_task(a, b)['question'] for a, b in PROBLEMS[:15]]
+    assert [task['order_index'] for task in tasks] == list(range(15))
+    assert generator.calls == []
+
+def test_tasks_touching_changed_lines_are_regenerated_from_them(app_context):
+    source = make_source(PROBLEMS[:15])
+    generator = RecordingGenerator()
+
+    # One short changed line is far below the section size, but its task is wrong now
+    changed = PROBLEMS[:15]
+    changed[3] = (90, 23)
+    tasks = WorksheetPipeline._reuse_near_duplicate(generator, source, sheet(changed), 15)
+
+    questions = [task['question'] for task in tasks]
+    assert 'What is 13 + 23?' not in questions
+    assert len(tasks) == 15
+    assert generator.calls == [('90 + 23 = ___', 1)]
+
+def test_many_short_changes_count_as_substantial(app_context):
+    source = make_source(PROBLEMS)
+    generator = RecordingGenerator()
+
+    changed = [(a + 100, b) if i < 10 else (a, b) for i, (a, b) in enumerate(PROBLEMS)]
+    tasks = WorksheetPipeline._reuse_near_duplicate(generator, source, sheet(changed), 15)
+
+    kept = [task['question'] for task in tasks if not task['question'].startswith('new')]
+    assert kept == [arithmetic_task(a, b)['question'] for a, b in PROBLEMS[10:]][:len(kept)]
+    assert len(tasks) == 15
+    (text, count), = generator.calls
+    assert text.count('\n') == 9 and count == 15 - len(kept)
@@ -0,0 +1,55 @@
+"""
+Standalone job worker: python worker.py [--processes N] [--async-jobs N]
+
+Runs worksheet conversion jobs from the processing_job table so web workers
+never block on text extraction or AI generation. With --async-jobs each
+process runs up to N jobs at once on an event loop instead of one at a time.
+"""
+import os
+import argparse
+import logging
+import multiprocessing
+
+# Dedicated worker processes replace the threads embedded in the web app
+os.environ.setdefault('JOB_EMBEDDED_WORKERS', '0')
+
+logger = logging.getLogger(__name__)
+
+def run_worker(async_jobs=0):
+    """Run a single worker loop in this process"""
+    from app import app, db
+    from services.job_queue import JobWorker, AsyncJobWorker
+
+    # Never share pooled connections inherited from a parent process
+    with app.app_context():
+        db.engine.dispose()
+
+    if async_jobs > 0:
+        AsyncJobWorker(app, concurrency=async_jobs).run_forever()
+    else:
+        JobWorker(app).run_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description='Run worksheet conversion workers')
+    parser.add_argument('--processes', type=int, default=int(os.environ.get('JOB_WORKER_PROCESSES', 2)),
+                        help='number of worker processes to start')
+    parser.add_argument('--async-jobs', type=int, default=int(os.environ.get('JOB_ASYNC_CONCURRENCY', 0)),
+                        help='jobs each process runs concurrently on an event loop (0 runs one job at a time)')
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(args.async_jobs)
+        return
+
+    processes = []
+    for _ in range(args.processes):
+        process = multiprocessing.Process(target=run_worker, args=(args.async_jobs,))
+        process.start()
+        processes.append(process)
+
+    logger.info(f"Started {len(processes)} worker processes")
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()